@@ -14,7 +14,7 @@ import os
 import sys
 import argparse
 from Bio import SeqIO
-from oggmap import broccoli2orthomap, cds2aa, eggnog2orthomap, gtf2t2g, ncbitax, of2orthomap, orthomcl2orthomap, plaza2orthomap, qlin
+from oggmap import broccoli2orthomap, cds2aa, eggnog2orthomap, gtf2t2g, inputs, ncbitax, of2orthomap, orthomcl2orthomap, plaza2orthomap, qlin
 
 
 def define_parser():
@@ -72,6 +72,9 @@ def define_parser():
 
     #update ncbi taxonomy database:
     ncbitax -u -outdir taxadb -t taxa -dbname taxadb.sqlite
+
+    #list taxIDs that changed compared to an old ncbi taxonomy database:
+    ncbitax -diff taxadb.old.sqlite -dbname taxadb.sqlite -out taxadb.diff.tsv
     '''
     of2orthomap_example = '''of2orthomap example:
 
@@ -86,6 +89,23 @@ def define_parser():
       -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
       -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
       -dbname taxadb.sqlite
+
+    # extract orthomaps of all species with one pass over the OrthoFinder results
+    # (written as <seqname>.orthomap.tsv):
+    $ of2orthomap -seqname all \\
+      -sl ensembl_113_orthofinder_last_species_list.tsv \\
+      -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
+      -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
+      -out orthomap.tsv \\
+      -dbname taxadb.sqlite
+
+    # convert the OrthoFinder results once into an indexed binary cache, which is re-used by later runs:
+    $ of2orthomap -seqname 7955.danio_rerio.pep -qt 7955 \\
+      -sl ensembl_113_orthofinder_last_species_list.tsv \\
+      -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
+      -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
+      -cache oggmap_cache \\
+      -dbname taxadb.sqlite
     '''
     orthomcl2orthomap_example = '''orthomcl2orthomap example:
 
@@ -139,6 +159,14 @@ def define_parser():
     # using query species name
     $ qlin -q "Mus musculus" \\
       -dbname taxadb.sqlite
+
+    # batch mode: resolve many taxIDs or names (one per line) and
+    # add the LCA with Mus musculus as phylostratum
+    $ qlin -i species.txt \\
+      -lca 10090 \\
+      -format jsonl \\
+      -out species.lineages.jsonl \\
+      -dbname taxadb.sqlite
     '''
     broccoli2orthomap_example = '''broccoli2orthomap example:
 
@@ -246,11 +274,13 @@ def main():
                                  sl=args.sl,
                                  oc=args.oc,
                                  og=args.og,
-                                 out=args.out,
+                                 out=of2orthomap.get_default_out(args.out, args.format),
                                  quiet=False,
                                  continuity=True,
                                  overwrite=args.overwrite,
-                                 dbname=args.dbname)
+                                 dbname=args.dbname,
+                                 ranks=args.ranks,
+                                 out_format=args.format)
     if args.subcommand == 'cds2aa':
         if args.o is None:
             sys.stderr.write(str(args))
@@ -263,7 +293,7 @@ def main():
             record_iter = SeqIO.parse(sys.stdin,
                                       "fasta")
         else:
-            record_iter = SeqIO.parse(args.i,
+            record_iter = SeqIO.parse(inputs.open_text(args.i),
                                       "fasta")
         if args.r:
             record_gene_len_dict = cds2aa.get_gene_len_dict(record_iter,
@@ -296,9 +326,14 @@ def main():
         eggnog2orthomap.get_eggnog_orthomap(args.qt,
                                             args.og,
                                             subset=args.subset,
-                                            out=args.out,
+                                            level=args.level,
+                                            out=of2orthomap.get_default_out(args.out, args.format),
                                             overwrite=args.overwrite,
-                                            dbname=args.dbname)
+                                            dbname=args.dbname,
+                                            ranks=args.ranks,
+                                            processes=args.processes,
+                                            out_format=args.format,
+                                            cache=args.cache)
     if args.subcommand == 'gtf2t2g':
         print(args)
         if not args.i:
@@ -323,6 +358,18 @@ def main():
                           q=args.q)
         output.close()
     if args.subcommand == 'ncbitax':
+        # the diff may be written to stdout, so the arguments are not printed
+        if args.diff:
+            if not args.dbname or not os.path.exists(args.dbname):
+                print('\nError <-dbname>: Please specify taxadb.sqlite file')
+                sys.exit()
+            if not os.path.exists(args.diff):
+                print('\nError <-diff>: Please specify old taxadb.sqlite file')
+                sys.exit()
+            ncbitax.write_taxonomy_diff(old_dbname=args.diff,
+                                        new_dbname=args.dbname,
+                                        out=args.out)
+            sys.exit()
         print(args)
         if not args.u:
             parser.print_help()
@@ -344,7 +391,7 @@ def main():
             parser.print_help()
             print('\nError <-seqname>: Please specify query species name in OrthoFinder and taxid')
             sys.exit()
-        if not args.qt:
+        if not args.qt and args.seqname != 'all':
             parser.print_help()
             print('\nError <-qt>: Please specify query species taxid')
             sys.exit()
@@ -360,16 +407,37 @@ def main():
             parser.print_help()
             print('\nError <-og>: Please specify OrthoFinder <Orthogroups.tsv> (see Orthogroups directory)')
             sys.exit()
+        if args.seqname == 'all':
+            of2orthomap.get_orthomaps(seqnames=args.seqname,
+                                      sl=args.sl,
+                                      oc=args.oc,
+                                      og=args.og,
+                                      out=of2orthomap.get_default_out(args.out, args.format),
+                                      quiet=True,
+                                      continuity=True,
+                                      overwrite=args.overwrite,
+                                      dbname=args.dbname,
+                                      ranks=args.ranks,
+                                      processes=args.processes,
+                                      out_format=args.format,
+                                      cache=args.cache)
+            sys.exit()
         of2orthomap.get_orthomap(seqname=args.seqname,
                                  qt=args.qt,
                                  sl=args.sl,
                                  oc=args.oc,
                                  og=args.og,
-                                 out=args.out,
+                                 out=of2orthomap.get_default_out(args.out, args.format),
                                  quiet=False,
                                  continuity=True,
                                  overwrite=args.overwrite,
-                                 dbname=args.dbname)
+                                 dbname=args.dbname,
+                                 ranks=args.ranks,
+                                 previous=args.previous,
+                                 changed=args.changed,
+                                 processes=args.processes,
+                                 out_format=args.format,
+                                 cache=args.cache)
     if args.subcommand == 'orthomcl2orthomap':
         print(args)
         if not args.dbname:
@@ -390,11 +458,13 @@ def main():
         orthomcl2orthomap.get_orthomcl_orthomap(tla=args.tla,
                                                 sl=args.sl,
                                                 og=args.og,
-                                                out=args.out,
+                                                out=of2orthomap.get_default_out(args.out, args.format),
                                                 quiet=False,
                                                 continuity=True,
                                                 overwrite=args.overwrite,
-                                                dbname=args.dbname)
+                                                dbname=args.dbname,
+                                                ranks=args.ranks,
+                                                out_format=args.format)
     if args.subcommand == 'plaza2orthomap':
         print(args)
         if not args.dbname:
@@ -416,16 +486,26 @@ def main():
         plaza2orthomap.get_plaza_orthomap(qt=args.qt,
                                           sl=args.sl,
                                           og=args.og,
-                                          out=args.out,
+                                          out=of2orthomap.get_default_out(args.out, args.format),
                                           quiet=False,
                                           continuity=True,
                                           overwrite=args.overwrite,
-                                          dbname=args.dbname)
+                                          dbname=args.dbname,
+                                          ranks=args.ranks,
+                                          out_format=args.format)
     if args.subcommand == 'qlin':
-        print(args)
         if not args.dbname:
             print('\nError <-dbname> : Please specify taxadb.sqlite file')
             sys.exit()
+        if args.i:
+            qlin.write_qlin_batch(qlin.get_qlin_batch(queries=qlin.read_queries(args.i),
+                                                      lca=args.lca,
+                                                      dbname=args.dbname,
+                                                      ranks=args.ranks),
+                                  out=args.out,
+                                  out_format=args.format)
+            sys.exit()
+        print(args)
         if not args.q and not args.qt:
             parser.print_help()
             print('\nError <-q> <-qt>: Please specify query species name or taxid')
@@ -437,7 +517,8 @@ def main():
         qlin.get_qlin(q=args.q,
                       qt=args.qt,
                       quiet=False,
-                      dbname=args.dbname)
+                      dbname=args.dbname,
+                      ranks=args.ranks)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,444 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+
+"""
+Author: Kristian K Ullrich
+date: February 2025
+email: ullrich@evolbio.mpg.de
+License: GPL-3
+"""
+
+
+import itertools
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from oggmap import qlin
+
+
+def add_youngest_common(query_lineage,
+                        species_list,
+                        ncbi=None):
+    """
+    This function adds the youngest common node between the query species and each species of a species list
+    as columns 'youngest_common' and 'youngest_name' to the species list. The 'lineage' column is added first,
+    if the species list does not contain it yet.
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param species_list: Species list with the species taxIDs as column 'taxID'.
+    :param ncbi: The NCBI taxonomic database.
+    :return: Species list.
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type species_list: pandas.DataFrame
+    :type ncbi: dict
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> from oggmap import aging, qlin
+    >>> query_lineage = qlin.get_query_lineage(qt='7955', dbname='taxadb.sqlite')
+    >>> species_list = aging.add_youngest_common(query_lineage=query_lineage,
+    >>>                                          species_list=pd.DataFrame({'taxID': [10090, 7956, 3702]}),
+    >>>                                          ncbi=qlin.load_taxadb(ncbi=None, dbname='taxadb.sqlite'))
+    """
+    if 'lineage' not in species_list.columns:
+        species_list['lineage'] = qlin.get_lineages(taxids=list(species_list['taxID']),
+                                                    ncbi=ncbi)
+    species_list['youngest_common'] = query_lineage.youngest_common(species_list.lineage)
+    youngest_names = qlin.translate_taxids(taxids=list(species_list.youngest_common),
+                                           ncbi=ncbi)
+    species_list['youngest_name'] = [youngest_names[x] for x in species_list.youngest_common]
+    return species_list
+
+
+def get_youngest_common_counts(qlineage,
+                               species_list):
+    """
+    This function return LCA counts for a given query species lineage.
+
+    :param qlineage: Query lineage information.
+    :param species_list: Species list.
+    :return: DataFrame with LCA counts.
+
+    :type qlineage: list
+    :type species_list: pandas.DataFrame
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> from oggmap import aging
+    >>> aging.get_youngest_common_counts(qlineage=[1, 131567, 2759, 33154],
+    >>>                                  species_list=pd.DataFrame({'youngest_common': [2759, 33154, 33154]}))
+    """
+    counts_df = pd.DataFrame(qlineage,
+                             columns=['lineage'])
+    counts_df.set_index('lineage',
+                        inplace=True)
+    counts_df = pd.concat([counts_df,
+                          species_list['youngest_common'].value_counts()],
+                          join='outer',
+                          axis=1)
+    counts_df.columns = ['counts']
+    counts_df['PStaxID'] = counts_df.index.values
+    counts_df['PSnum'] = list(range(len(counts_df['PStaxID'])))
+    return counts_df
+
+
+def set_species_counts(query_lineage,
+                       youngest_common_counts_df):
+    """
+    This function stores the LCA counts of a species list as `species_count` at the nodes of the query lineage
+    (see `qlin.QueryLineage.topo`).
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param youngest_common_counts_df: DataFrame with LCA counts (see `get_youngest_common_counts`).
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type youngest_common_counts_df: pandas.DataFrame
+    """
+    species_counts = youngest_common_counts_df['counts'].to_dict()
+    for node in qlin.traverse_postorder(query_lineage.topo.root):
+        node.species_count = species_counts[node.taxid]
+
+
+def get_presence_matrix(og_species,
+                        species):
+    """
+    This function returns the presence of species in orthologous groups as sparse boolean matrix with one row
+    per orthologous group and one column per species of a species list. Species not in the species list are
+    ignored and species listed more than once get the same presence in each of their columns.
+
+    :param og_species: Species of each orthologous group, e.g. as list of taxID lists.
+    :param species: Species of the species list.
+    :return: Sparse presence matrix (orthologous groups x species).
+
+    :type og_species: list
+    :type species: list
+    :rtype: scipy.sparse.csr_matrix
+
+    Example
+    -------
+    >>> from oggmap import aging
+    >>> aging.get_presence_matrix(og_species=[[7955, 10090], [7955], [7955, 3702, 10090]],
+    >>>                           species=[7955, 10090, 3702]).toarray()
+    """
+    og_species_counts = np.fromiter((len(x) for x in og_species), dtype=np.int64, count=len(og_species))
+    og_idx = np.repeat(np.arange(len(og_species)), og_species_counts)
+    species_codes, species_unique = pd.factorize(pd.Index(species))
+    species_idx = species_unique.get_indexer(list(itertools.chain.from_iterable(og_species)))
+    og_idx = og_idx[species_idx >= 0]
+    species_idx = species_idx[species_idx >= 0]
+    presence = sparse.csr_matrix((np.ones(len(og_idx), dtype=np.int32), (og_idx, species_idx)),
+                                 shape=(len(og_species), len(species_unique)))
+    presence.sum_duplicates()
+    return presence.astype(bool)[:, species_codes]
+
+
+def get_continuity_matrix(qlineage,
+                          values,
+                          offsets,
+                          ps_map=None):
+    """
+    This function returns the LCA counts of many orthologous groups as sparse matrix with one row per
+    orthologous group and one column per phylostratum of the query lineage.
+
+    The orthologous groups are given as a ragged array in CSR layout like for `qlin.get_oldest_common_many`:
+    group i consists of the youngest common taxIDs `values[offsets[i]:offsets[i + 1]]`.
+
+    :param qlineage: Query lineage information.
+    :param values: Concatenated youngest common taxIDs of all orthologous groups.
+    :param offsets: Start position of each orthologous group in `values` followed by the total length.
+    :param ps_map: Precomputed taxID to phylostratum number dictionary (see `qlin.get_ps_map`).
+    :return: Sparse matrix with LCA counts (orthologous groups x phylostrata).
+
+    :type qlineage: list
+    :type values: list or numpy.ndarray
+    :type offsets: list or numpy.ndarray
+    :type ps_map: dict
+    :rtype: scipy.sparse.csr_matrix
+
+    Example
+    -------
+    >>> from oggmap import aging
+    >>> continuity_matrix = aging.get_continuity_matrix(qlineage=[1, 131567, 2759, 33154],
+    >>>                                                 values=[33154, 2759, 33154, 131567],
+    >>>                                                 offsets=[0, 2, 4])
+    """
+    if ps_map is None:
+        ps_map = qlin.get_ps_map(qlineage)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    values_ps = qlin.map_ps(values,
+                            ps_map)
+    og_idx = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    continuity_matrix = sparse.csr_matrix((np.ones(len(values_ps), dtype=np.int32), (og_idx, values_ps)),
+                                          shape=(len(offsets) - 1, len(qlineage)))
+    continuity_matrix.sum_duplicates()
+    return continuity_matrix
+
+
+def get_continuity_scores(continuity_matrix,
+                          youngest_common_counts_df):
+    """
+    This function calculates the continuity scores of many orthologous groups in one vectorized pass.
+
+    The continuity score of an orthologous group is the fraction of phylostrata from its oldest LCA to the query
+    species that contain LCA counts, considering only phylostrata that have LCA counts in the species list
+    (see `of2orthomap.get_continuity_score`).
+
+    :param continuity_matrix: Sparse matrix with LCA counts (see `get_continuity_matrix`).
+    :param youngest_common_counts_df: DataFrame with LCA counts of the species list.
+    :return: Continuity score of each orthologous group.
+
+    :type continuity_matrix: scipy.sparse.csr_matrix
+    :type youngest_common_counts_df: pandas.DataFrame
+    :rtype: numpy.ndarray
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> from oggmap import aging
+    >>> qlineage = [1, 131567, 2759, 33154]
+    >>> youngest_common_counts_df = aging.get_youngest_common_counts(
+    >>>     qlineage=qlineage,
+    >>>     species_list=pd.DataFrame({'youngest_common': [131567, 2759, 33154]}))
+    >>> aging.get_continuity_scores(aging.get_continuity_matrix(qlineage=qlineage,
+    >>>                                                         values=[33154, 2759, 33154, 131567],
+    >>>                                                         offsets=[0, 2, 4]),
+    >>>                             youngest_common_counts_df)
+    """
+    ps_valid = youngest_common_counts_df['counts'].notna().to_numpy()
+    ps_valid_younger = np.cumsum(ps_valid[::-1])[::-1]
+    og_ps_counts = np.diff(continuity_matrix.indptr)
+    og_scores = np.zeros(continuity_matrix.shape[0], dtype=np.float64)
+    non_empty = og_ps_counts > 0
+    og_oldest_ps = continuity_matrix.indices[continuity_matrix.indptr[:-1][non_empty]]
+    og_scores[non_empty] = og_ps_counts[non_empty] / ps_valid_younger[og_oldest_ps]
+    return og_scores
+
+
+def age_orthogroups(query_lineage,
+                    presence,
+                    species_youngest_common,
+                    youngest_common_counts_df=None,
+                    continuity=True):
+    """
+    This function assigns the gene age (phylostratum) of many orthologous groups at once, given the presence of
+    the species of a species list in each orthologous group.
+
+    The youngest common nodes between the query species and all species present in an orthologous group are
+    collected as ragged array from the sparse presence matrix, and the oldest of them is retained as the
+    orthologous group ancestral state with `qlin.get_oldest_common_many`. Orthologous groups without any
+    species get the phylostratum number -1.
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param presence: Sparse presence matrix (orthologous groups x species, see `get_presence_matrix`).
+    :param species_youngest_common: Youngest common taxID between the query species and each species.
+    :param youngest_common_counts_df: DataFrame with LCA counts of the species list
+                                      (see `get_youngest_common_counts`), needed for the continuity score.
+    :param continuity: Specify if continuity score should be calculated.
+    :return: A list of results such as:
+             phylostratum number of each orthologous group, continuity score of each orthologous group (or None)
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type presence: scipy.sparse.csr_matrix
+    :type species_youngest_common: list or numpy.ndarray
+    :type youngest_common_counts_df: pandas.DataFrame
+    :type continuity: bool
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import aging, qlin
+    >>> query_lineage = qlin.get_query_lineage(qt='7955', dbname='taxadb.sqlite')
+    >>> og_ps, og_continuity = aging.age_orthogroups(
+    >>>     query_lineage=query_lineage,
+    >>>     presence=aging.get_presence_matrix(og_species=[[7955, 10090], [7955]],
+    >>>                                        species=[7955, 10090]),
+    >>>     species_youngest_common=[7955, 117571],
+    >>>     continuity=False)
+    """
+    qlineage = query_lineage.qlineage
+    qlineage_ps_map = query_lineage.ps_map
+    presence = sparse.csr_matrix(presence)
+    presence.eliminate_zeros()
+    og_youngest_common = np.asarray(species_youngest_common, dtype=np.int64)[presence.indices]
+    og_ps = qlin.get_oldest_common_many(qlineage,
+                                        og_youngest_common,
+                                        presence.indptr,
+                                        ps_map=qlineage_ps_map)
+    og_continuity = None
+    if continuity:
+        og_continuity = get_orthogroup_continuity(query_lineage,
+                                                  presence,
+                                                  species_youngest_common,
+                                                  youngest_common_counts_df)
+    return [og_ps,
+            og_continuity]
+
+
+def get_orthogroup_continuity(query_lineage,
+                              presence,
+                              species_youngest_common,
+                              youngest_common_counts_df):
+    """
+    This function returns the continuity score of many orthologous groups at once, given the presence of the
+    species of a species list in each orthologous group (see `age_orthogroups`).
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param presence: Sparse presence matrix (orthologous groups x species, see `get_presence_matrix`).
+    :param species_youngest_common: Youngest common taxID between the query species and each species.
+    :param youngest_common_counts_df: DataFrame with LCA counts of the species list
+                                      (see `get_youngest_common_counts`).
+    :return: Continuity score of each orthologous group.
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type presence: scipy.sparse.csr_matrix
+    :type species_youngest_common: list or numpy.ndarray
+    :type youngest_common_counts_df: pandas.DataFrame
+    :rtype: numpy.ndarray
+
+    Example
+    -------
+    >>> from oggmap import aging, qlin
+    >>> query_lineage = qlin.get_query_lineage(qt='7955', dbname='taxadb.sqlite')
+    >>> species_list = aging.add_youngest_common(query_lineage,
+    >>>                                          pd.DataFrame({'taxID': [7955, 10090]}))
+    >>> og_continuity = aging.get_orthogroup_continuity(
+    >>>     query_lineage=query_lineage,
+    >>>     presence=aging.get_presence_matrix(og_species=[[7955, 10090], [7955]],
+    >>>                                        species=[7955, 10090]),
+    >>>     species_youngest_common=species_list['youngest_common'],
+    >>>     youngest_common_counts_df=aging.get_youngest_common_counts(query_lineage.qlineage,
+    >>>                                                                species_list))
+    """
+    presence = sparse.csr_matrix(presence)
+    presence.eliminate_zeros()
+    og_youngest_common = np.asarray(species_youngest_common, dtype=np.int64)[presence.indices]
+    return get_continuity_scores(get_continuity_matrix(query_lineage.qlineage,
+                                                       og_youngest_common,
+                                                       presence.indptr,
+                                                       ps_map=query_lineage.ps_map),
+                                 youngest_common_counts_df).astype(np.float32)
+
+
+def get_orthomap_df(query_lineage,
+                    og_names,
+                    og_ps,
+                    og_genes,
+                    og_continuity=None):
+    """
+    This function builds the orthomap of the query species in columnar form: one row per query gene with the
+    orthologous group and its phylostratum as categorical columns, 'PSnum' as int8 and 'PScontinuity' as
+    float32. Genes of orthologous groups with phylostratum number -1 are dropped.
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param og_names: Names of the orthologous groups.
+    :param og_ps: Phylostratum number of each orthologous group (see `age_orthogroups`).
+    :param og_genes: Query genes of each orthologous group.
+    :param og_continuity: Continuity score of each orthologous group.
+    :return: Orthomap.
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type og_names: list
+    :type og_ps: numpy.ndarray
+    :type og_genes: list
+    :type og_continuity: numpy.ndarray
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> from oggmap import aging, qlin
+    >>> query_lineage = qlin.get_query_lineage(qt='7955', dbname='taxadb.sqlite')
+    >>> aging.get_orthomap_df(query_lineage=query_lineage,
+    >>>                       og_names=['OG0000000', 'OG0000001'],
+    >>>                       og_ps=[2, 31],
+    >>>                       og_genes=[['g1', 'g2'], ['g3']])
+    """
+    og_ps = np.asarray(og_ps, dtype=np.int64)
+    og_keep = np.flatnonzero(og_ps >= 0)
+    og_gene_counts = np.fromiter((len(og_genes[x]) for x in og_keep), dtype=np.int64, count=len(og_keep))
+    gene_og = np.repeat(og_keep, og_gene_counts)
+    gene_ps = og_ps[gene_og]
+    gene_ids = np.empty(len(gene_og), dtype=object)
+    gene_ids[:] = list(itertools.chain.from_iterable(og_genes[x] for x in og_keep))
+    og_codes, og_categories = pd.factorize(pd.Index(og_names, dtype=object))
+    ps_name_codes, ps_name_categories = pd.factorize(pd.Index([str(x) for x in query_lineage.names], dtype=object))
+    omap_df = pd.DataFrame({'seqID': gene_ids,
+                            'Orthogroup': pd.Categorical.from_codes(og_codes[gene_og],
+                                                                    categories=og_categories),
+                            'PSnum': np.asarray(query_lineage.psnum, dtype=np.int8)[gene_ps],
+                            'PStaxID': pd.Categorical.from_codes(gene_ps,
+                                                                 categories=[str(x) for x in query_lineage.taxids]),
+                            'PSname': pd.Categorical.from_codes(ps_name_codes[gene_ps],
+                                                                categories=ps_name_categories)})
+    if og_continuity is not None:
+        omap_df['PScontinuity'] = np.asarray(og_continuity, dtype=np.float32)[gene_og]
+    return omap_df
+
+
+def get_orthomap(query_lineage,
+                 species_list,
+                 og_names,
+                 presence,
+                 og_genes,
+                 continuity=True):
+    """
+    This function returns the orthomap of a query species from parsed orthologous groups. It is the shared
+    aging engine of all `*2orthomap` front ends, which only parse their input into a species list, a sparse
+    presence matrix and the query genes of each orthologous group.
+
+    :param query_lineage: Query species lineage (see `qlin.get_query_lineage`).
+    :param species_list: Species list with the column 'youngest_common' (see `add_youngest_common`), one row
+                         per column of the presence matrix.
+    :param og_names: Names of the orthologous groups.
+    :param presence: Sparse presence matrix (orthologous groups x species, see `get_presence_matrix`).
+    :param og_genes: Query genes of each orthologous group.
+    :param continuity: Specify if continuity score should be calculated.
+    :return: A list of results such as:
+             orthomap (see `get_orthomap_df`), youngest_common_counts
+
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type species_list: pandas.DataFrame
+    :type og_names: list
+    :type presence: scipy.sparse.csr_matrix
+    :type og_genes: list
+    :type continuity: bool
+    :rtype: list
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> from oggmap import aging, qlin
+    >>> ncbi = qlin.load_taxadb(ncbi=None, dbname='taxadb.sqlite')
+    >>> query_lineage = qlin.get_query_lineage(qt='7955', ncbi=ncbi)
+    >>> species_list = aging.add_youngest_common(query_lineage=query_lineage,
+    >>>                                          species_list=pd.DataFrame({'taxID': [7955, 10090, 3702]}),
+    >>>                                          ncbi=ncbi)
+    >>> query_orthomap, youngest_common_counts = aging.get_orthomap(
+    >>>     query_lineage=query_lineage,
+    >>>     species_list=species_list,
+    >>>     og_names=['OG0000000', 'OG0000001'],
+    >>>     presence=aging.get_presence_matrix(og_species=[[7955, 10090], [7955, 3702]],
+    >>>                                        species=list(species_list.taxID)),
+    >>>     og_genes=[['g1', 'g2'], ['g3']])
+    """
+    youngest_common_counts_df = get_youngest_common_counts(query_lineage.qlineage,
+                                                           species_list)
+    set_species_counts(query_lineage,
+                       youngest_common_counts_df)
+    og_ps, og_continuity = age_orthogroups(query_lineage,
+                                           presence,
+                                           species_list['youngest_common'],
+                                           youngest_common_counts_df=youngest_common_counts_df,
+                                           continuity=continuity)
+    omap_df = get_orthomap_df(query_lineage,
+                              og_names,
+                              og_ps,
+                              og_genes,
+                              og_continuity=og_continuity)
+    return [omap_df,
+            youngest_common_counts_df]
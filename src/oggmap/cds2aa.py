@@ -14,6 +14,7 @@ import sys
 import argparse
 from Bio import SeqIO
 from Bio.Data import CodonTable
+from oggmap import inputs
 
 
 def define_parser():
@@ -59,7 +60,7 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     :type parser: argparse.ArgumentParser
     """
     parser.add_argument('-i',
-                        help='specify fasta input file')
+                        help='specify fasta input file (plain or compressed)')
     parser.add_argument('-o',
                         help='specify output file [optional]')
     parser.add_argument('-t',
@@ -1476,7 +1477,7 @@ def main():
         record_iter = SeqIO.parse(sys.stdin,
                                   "fasta")
     else:
-        record_iter = SeqIO.parse(args.i,
+        record_iter = SeqIO.parse(inputs.open_text(args.i),
                                   "fasta")
     if args.r:
         record_gene_len_dict = get_gene_len_dict(record_iter=record_iter,
@@ -11,9 +11,13 @@ License: GPL-3
 
 import os
 import sys
+import shutil
 import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from oggmap import of2orthomap, qlin
+from oggmap import aging, inputs, of2orthomap, qlin
 
 
 def define_parser():
@@ -33,6 +37,18 @@ def define_parser():
     $ eggnog2orthomap -qt 10090 \\
       -og e6.og2seqs_and_species.tsv \\
       -dbname taxadb.sqlite
+
+    # index <e6.og2seqs_and_species.tsv> once by taxID, so that later runs only read the lines of the query:
+    $ eggnog2orthomap -qt 10090 \\
+      -og e6.og2seqs_and_species.tsv \\
+      -cache oggmap_cache \\
+      -dbname taxadb.sqlite
+
+    # keep only orthologous groups of one taxonomic level, e.g. Vertebrata:
+    $ eggnog2orthomap -qt 10090 \\
+      -og e6.og2seqs_and_species.tsv \\
+      -level 7742 \\
+      -dbname taxadb.sqlite
     '''
     parser = argparse.ArgumentParser(
         prog='eggnog2orthomap',
@@ -59,13 +75,29 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     parser.add_argument('-subset',
                         help='specify file of orthologous groups to include '
                              '<e6.og2parents_and_children.new.tsv>')
+    parser.add_argument('-level',
+                        help='specify comma-separated taxonomic levels (taxIDs) of orthologous groups to include, '
+                             'e.g. 7742 (default: all)')
     parser.add_argument('-out',
-                        help='specify output file <orthomap.tsv> (default: orthomap.tsv)',
-                        default='orthomap.tsv')
+                        help='specify output file <orthomap.tsv> (default: orthomap.<-format>)')
     parser.add_argument('-overwrite',
                         help='specify if existing output file should be overwritten (default: True)',
                         default=True,
                         type=bool)
+    parser.add_argument('-ranks',
+                        help='project query lineage onto a comma-separated rank set, '
+                             'e.g. phylum,class,order,family,genus')
+    parser.add_argument('-format',
+                        help='specify output file format (default: tsv)',
+                        choices=['tsv', 'parquet', 'feather'],
+                        default='tsv')
+    parser.add_argument('-processes',
+                        help='number of worker processes to parse <e6.og2seqs_and_species.tsv> (default: 1)',
+                        default=1,
+                        type=int)
+    parser.add_argument('-cache',
+                        help='specify directory of a taxID index of <e6.og2seqs_and_species.tsv>, '
+                             'which is created on first use')
     parser.add_argument('-dbname',
                         help='taxadb.sqlite file')
 
@@ -73,47 +105,76 @@ def add_argparse_args(parser: argparse.ArgumentParser):
 def get_eggnog_orthomap(qt,
                         og,
                         subset=None,
+                        level=None,
                         out=None,
                         quiet=False,
                         continuity=True,
                         overwrite=True,
                         ncbi=None,
-                        dbname=None):
+                        dbname=None,
+                        query_lineage=None,
+                        ranks=None,
+                        processes=1,
+                        out_format='tsv',
+                        cache=None):
     """
     This function return an orthomap for a given query species and eggnog input data.
 
     :param qt: Query species taxID.
-    :param og: Path to eggnog <e6.og2seqs_and_species.tsv> file.
+    :param og: Path to eggnog <e6.og2seqs_and_species.tsv> file (plain or compressed, see `inputs.open_input`).
     :param subset: Path to file containing orthologous groups to include.
+    :param level: Taxonomic levels (taxIDs) of the orthologous groups to include, e.g. [7742] (default: all).
+                  EggNOG has nested orthologous groups at many levels, so that a query gene is otherwise aged
+                  once per level.
     :param out: Path to output file.
     :param quiet: Specify if output should be quiet.
     :param continuity: Specify if continuity score should be calculated.
     :param overwrite: Specify if output should be overwritten.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
+    :param query_lineage: Precomputed query lineage (see `qlin.get_query_lineage`) to be used instead of
+                          querying the lineage of the query species again.
+    :param ranks: Project the query lineage onto these ranks, e.g. ['phylum', 'class', 'order', 'family', 'genus']
+                  (see `qlin.QueryLineage.project`).
+    :param processes: Number of worker processes to parse <e6.og2seqs_and_species.tsv> in line-aligned byte ranges
+                      (or decompression threads for a compressed file).
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather' (see `of2orthomap.write_orthomap`).
+    :param cache: Directory of the taxID index of an uncompressed <e6.og2seqs_and_species.tsv>
+                  (see `get_eggnog_index`).
     :return: A list of results such as:
              orthomap, species_list, youngest_common_counts
 
     :type qt: str
     :type og: str
     :type subset: str
+    :type level: list or str or int
     :type out: str
     :type quiet: bool
     :type continuity: bool
     :type overwrite: bool
     :type ncbi: dict
     :type dbname: str
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type ranks: list or str
+    :type processes: int
+    :type out_format: str
+    :type cache: str
     :rtype: list
 
     Example
     -------
     >>>
     """
-    outhandle = None
     subset_dict = None
-    og_continuity_score = None
     ncbi = qlin.load_taxadb(ncbi=ncbi,
-                            dbname=dbname)
+                            dbname=dbname,
+                            cache=True)
+    if query_lineage is None:
+        query_lineage = qlin.get_query_lineage(qt=qt,
+                                               quiet=True,
+                                               ncbi=ncbi)
+    if ranks is not None:
+        query_lineage = query_lineage.project(ranks)
     qname,\
         qtid,\
         qlineage,\
@@ -121,11 +182,7 @@ def get_eggnog_orthomap(qt,
         qlineagezip,\
         qlineagenames,\
         qlineagerev,\
-        qk = qlin.get_qlin(qt=qt,
-                           quiet=True,
-                           ncbi=ncbi)
-    query_lineage_topo = qlin.get_lineage_topo(qt=qt,
-                                               ncbi=ncbi)
+        qk = query_lineage.to_list()
     if subset is not None:
         subset_dict = {}
         with open(subset,
@@ -133,148 +190,351 @@ def get_eggnog_orthomap(qt,
             for subset_tmp in subset_ogs:
                 sog_name = subset_tmp.strip().split('\t')[0]
                 subset_dict[sog_name] = []
-    ogs_dict = {}
-    species_list = []
-    with open(og,
-              'r') as ogs:
-        for og_line in ogs:
-            col1_taxonomic_level,\
-                col2_og_name,\
-                col3_number_of_species,\
-                col4_number_of_members,\
-                col5_comma_separated_list_of_species,\
-                col6_comma_separated_list_of_members = og_line.strip().split('\t')
-            col5_comma_separated_list_of_species = col5_comma_separated_list_of_species.split(',')
-            if subset is not None:
-                if col2_og_name not in subset_dict:
-                    continue
-                else:
-                    if str(qtid) in col5_comma_separated_list_of_species:
-                        col6_comma_separated_list_of_members = col6_comma_separated_list_of_members.split(',')
-                        q_genes = [x for x in col6_comma_separated_list_of_members if x.split('.')[0] == str(qtid)]
-                        ogs_dict[col2_og_name] = [col2_og_name,
-                                                  col5_comma_separated_list_of_species,
-                                                  q_genes]
-                        species_list += col5_comma_separated_list_of_species
-            else:
-                if str(qtid) in col5_comma_separated_list_of_species:
-                    col6_comma_separated_list_of_members = col6_comma_separated_list_of_members.split(',')
-                    q_genes = [x for x in col6_comma_separated_list_of_members if x.split('.')[0] == str(qtid)]
-                    ogs_dict[col2_og_name] = [col2_og_name,
-                                              col5_comma_separated_list_of_species,
-                                              q_genes]
-                    species_list += col5_comma_separated_list_of_species
+    if level is not None:
+        if isinstance(level, str):
+            level = level.split(',')
+        elif isinstance(level, int):
+            level = [level]
+        level = [int(x) for x in level]
+    if cache is not None and inputs.get_compression(og) is None:
+        og_index = get_eggnog_index(og,
+                                    cache,
+                                    processes=processes)
+        # only the lines that contain the query species are read
+        ogs_dict, species_list = _parse_eggnog_lines(read_eggnog_index(og_index,
+                                                                       og,
+                                                                       qtid),
+                                                     qtid,
+                                                     subset_dict,
+                                                     level)
+    elif processes > 1 and inputs.get_compression(og) is None:
+        ogs_dict = {}
+        species_list = []
+        with ProcessPoolExecutor(processes) as pool:
+            # results are collected in the order of the byte ranges
+            for ogs_dict_range, species_list_range in pool.map(
+                    _read_eggnog_range,
+                    *zip(*[[og, x, y, qtid, subset_dict, level]
+                           for x, y in of2orthomap.get_byte_ranges(og, processes * 4, header=False)])):
+                ogs_dict.update(ogs_dict_range)
+                species_list += species_list_range
+    else:
+        with inputs.open_input(og,
+                               threads=processes) as ogs:
+            ogs_dict, species_list = _parse_eggnog_lines(ogs,
+                                                         qtid,
+                                                         subset_dict,
+                                                         level)
     species_list = list(set(species_list))
     if len(species_list) == 0:
+        if level is not None:
+            print('\nError <-level>: query species taxID not in eggnog results at the taxonomic levels, '
+                  'please check taxID and levels.')
+            sys.exit()
         print('\nError <-qt>: query species taxID not in eggnog results, please check taxID.')
         sys.exit()
-    species_names = [qlin.get_qlin(qt=x,
-                                   quiet=True,
-                                   ncbi=ncbi)[0] for x in species_list]
+    species_names = qlin.translate_taxids(taxids=list(species_list),
+                                          ncbi=ncbi)
+    species_names = [species_names[int(x)] for x in species_list]
     species_list_df = pd.DataFrame(species_names,
                                    columns=['species'])
     species_list_df['taxID'] = [int(x) for x in species_list]
-    species_list_df['lineage'] = species_list_df.apply(lambda x: qlin.ncbi_get_lineage(qt=x.iloc[1],
-                                                                                       ncbi=ncbi),
-                                                       axis=1)
-    species_list_df['youngest_common'] = [qlin.get_youngest_common(qlineage,
-                                                                   x) for x in species_list_df.lineage]
-    species_list_df['youngest_name'] = [list(x.values())[0] for x in [qlin.ncbi_get_taxid_translator(qt_vec=[x],
-                                                                                                     ncbi=ncbi)
-                                                                      for x in list(species_list_df.youngest_common)]]
+    species_list_df = aging.add_youngest_common(query_lineage,
+                                                species_list_df,
+                                                ncbi=ncbi)
     if not quiet:
         print(qname)
         print(qt)
         print(species_list_df)
-    youngest_common_counts_df = of2orthomap.get_youngest_common_counts(qlineage,
-                                                                       species_list_df)
-    for node in qlin.traverse_postorder(query_lineage_topo.root):
-        if node.name:
-            nsplit = node.name.split('/')
-            if len(nsplit) == 3:
-                node.species_count = list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-                    [int(nsplit[1])])].counts)[0]
-    #for node in query_lineage_topo.traverse('postorder'):
-    #    nsplit = node.name.split('/')
-    #    if len(nsplit) == 3:
-    #        node.add_feature('species_count',
-    #                         list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-    #                             [int(nsplit[1])])].counts)[0])
-    og_dict = {}
-    continuity_dict = {}
-    for og in ogs_dict.keys():
-        og_tmp = ogs_dict[og]
-        og_hits = [int(x) for x in og_tmp[1]]
-        # get list of the youngest common between query and all other species
-        og_hits_youngest_common = list(species_list_df.youngest_common[
-                                           [x for x, y in enumerate(species_list_df.taxID)
-                                            if y in og_hits]])
-        # evaluate all youngest common nodes to retain the oldest of them and assign as the orthogroup
-        # ancestral state (gene age)
-        if len(og_hits_youngest_common) > 0:
-            og_oldest_common = qlin.get_oldest_common(qlineage,
-                                                      og_hits_youngest_common)
-            og_dict[og_tmp[0]] = og_oldest_common
-            if continuity:
-                continuity_dict[og_tmp[0]] = \
-                    of2orthomap.get_youngest_common_counts(qlineage,
-                                                           pd.DataFrame(og_hits_youngest_common,
-                                                                        columns=['youngest_common'])).counts
-    if continuity:
-        youngest_common_counts_df = youngest_common_counts_df.join(pd.DataFrame.from_dict(continuity_dict))
-    omap = []
     if out:
         if os.path.exists(out) and not overwrite:
             print('\nError <-overwrite>: output file exists, please set to True if it should be overwritten\n')
             sys.exit()
-        outhandle = open(out, 'w')
-        if continuity:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\tPScontinuity\n')
-        else:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\n')
-    for og in ogs_dict.keys():
-        og_tmp = ogs_dict[og]
-        og_ps = qlineagenames[qlineagenames['PStaxID'] ==
-                              str(og_dict[og_tmp[0]])].values.tolist()[0]
-        og_ps_join = '\t'.join(og_ps)
-        if continuity:
-            og_continuity_score = of2orthomap.get_continuity_score(og_tmp[0],
-                                                                   youngest_common_counts_df)
-            if out:
-                if continuity:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_tmp[0] + '\t' + og_ps_join + '\t' +
-                                     str(og_continuity_score) + '\n') for x in og_tmp[2]]
-                else:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_tmp[0] + '\t' + og_ps_join + '\n')
-                     for x in og_tmp[2]]
-        if continuity:
-            omap += [[x.replace(' ', ''), og_tmp[0], og_ps[0], og_ps[1], og_ps[2], og_continuity_score]
-                     for x in og_tmp[2]]
-        else:
-            omap += [[x.replace(' ', ''), og_tmp[0], og_ps[0], og_ps[1], og_ps[2]]
-                     for x in og_tmp[2]]
+    og_names = [x[0] for x in ogs_dict.values()]
+    og_presence = aging.get_presence_matrix(og_species=[[int(y) for y in x[1]] for x in ogs_dict.values()],
+                                            species=list(species_list_df.taxID))
+    og_genes = [[y.replace(' ', '') for y in x[2]] for x in ogs_dict.values()]
+    omap_df, youngest_common_counts_df = aging.get_orthomap(query_lineage=query_lineage,
+                                                            species_list=species_list_df,
+                                                            og_names=og_names,
+                                                            presence=og_presence,
+                                                            og_genes=og_genes,
+                                                            continuity=continuity)
     if out:
-        outhandle.close()
-    omap_df = pd.DataFrame(omap)
-    if continuity:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname',
-                           'PScontinuity']
-    else:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname']
-    omap_df['PSnum'] = [int(x) for x in list(omap_df['PSnum'])]
+        of2orthomap.write_orthomap(omap_df,
+                                   out,
+                                   out_format=out_format)
     return [omap_df,
             species_list_df,
             youngest_common_counts_df]
 
 
+def _parse_eggnog_lines(og_lines,
+                        qtid,
+                        subset_dict=None,
+                        level=None):
+    """
+    A helper function to parse eggnog <e6.og2seqs_and_species.tsv> lines and keep the orthologous groups
+    that contain the query species.
+
+    :param og_lines: Lines as bytes.
+    :param qtid: Query species taxID.
+    :param subset_dict: Orthologous groups to include (default: all).
+    :param level: Taxonomic levels (taxIDs) of the orthologous groups to include (default: all).
+    :return: A list of results such as:
+             dictionary of orthologous group to [name, species, query genes], species
+
+    :type og_lines: iterable
+    :type qtid: int
+    :type subset_dict: dict
+    :type level: list
+    :rtype: list
+    """
+    ogs_dict = {}
+    species_list = []
+    qtid_bytes = str(qtid).encode('utf-8')
+    level_bytes = None
+    if level is not None:
+        level_bytes = tuple([str(x).encode('utf-8') + b'\t' for x in level])
+    for og_line in og_lines:
+        # the taxonomic level is the first column, so that other levels are skipped without splitting
+        if level_bytes is not None and not og_line.startswith(level_bytes):
+            continue
+        # lines without the query taxID anywhere are skipped before decoding and splitting
+        if qtid_bytes not in og_line:
+            continue
+        col1_taxonomic_level,\
+            col2_og_name,\
+            col3_number_of_species,\
+            col4_number_of_members,\
+            col5_comma_separated_list_of_species,\
+            col6_comma_separated_list_of_members = og_line.decode('utf-8').strip().split('\t')
+        col5_comma_separated_list_of_species = col5_comma_separated_list_of_species.split(',')
+        if subset_dict is not None:
+            if col2_og_name not in subset_dict:
+                continue
+            else:
+                if str(qtid) in col5_comma_separated_list_of_species:
+                    col6_comma_separated_list_of_members = col6_comma_separated_list_of_members.split(',')
+                    q_genes = [x for x in col6_comma_separated_list_of_members if x.split('.')[0] == str(qtid)]
+                    ogs_dict[col2_og_name] = [col2_og_name,
+                                              col5_comma_separated_list_of_species,
+                                              q_genes]
+                    species_list += col5_comma_separated_list_of_species
+        else:
+            if str(qtid) in col5_comma_separated_list_of_species:
+                col6_comma_separated_list_of_members = col6_comma_separated_list_of_members.split(',')
+                q_genes = [x for x in col6_comma_separated_list_of_members if x.split('.')[0] == str(qtid)]
+                ogs_dict[col2_og_name] = [col2_og_name,
+                                          col5_comma_separated_list_of_species,
+                                          q_genes]
+                species_list += col5_comma_separated_list_of_species
+    return [ogs_dict,
+            species_list]
+
+
+def _read_eggnog_range(og,
+                       start,
+                       end,
+                       qtid,
+                       subset_dict=None,
+                       level=None):
+    """
+    A helper function to parse the eggnog <e6.og2seqs_and_species.tsv> lines of one byte range in a worker
+    process (see `of2orthomap.get_byte_ranges`).
+
+    :param og: Path to eggnog <e6.og2seqs_and_species.tsv> file.
+    :param start: Start of the byte range.
+    :param end: End of the byte range.
+    :param qtid: Query species taxID.
+    :param subset_dict: Orthologous groups to include (default: all).
+    :param level: Taxonomic levels (taxIDs) of the orthologous groups to include (default: all).
+    :return: A list of results such as:
+             dictionary of orthologous group to [name, species, query genes], species
+
+    :type og: str
+    :type start: int
+    :type end: int
+    :type qtid: int
+    :type subset_dict: dict
+    :type level: list
+    :rtype: list
+    """
+    return _parse_eggnog_lines(of2orthomap.read_byte_range(og, start, end),
+                               qtid,
+                               subset_dict,
+                               level)
+
+
+def get_eggnog_index(og,
+                     cache,
+                     processes=1):
+    """
+    This function returns the path of a taxID index of an uncompressed eggnog <e6.og2seqs_and_species.tsv> file,
+    which is created on first use in a sub-directory of `cache` named by the stamp of the file
+    (see `inputs.get_file_stamp`).
+
+    The index contains the byte offset <line_starts.npy> and length <line_lengths.npy> of each line, and for each
+    taxID of the sorted <taxids.npy> the lines that contain it as <taxid_lines.npy> with offsets
+    <taxid_offsets.npy>, so that the lines of one species can be read directly (see `read_eggnog_index`).
+
+    :param og: Path to uncompressed eggnog <e6.og2seqs_and_species.tsv> file.
+    :param cache: Cache directory.
+    :param processes: Number of worker processes to index the file in line-aligned byte ranges.
+    :return: Path to the index of this eggnog file.
+
+    :type og: str
+    :type cache: str
+    :type processes: int
+    :rtype: str
+
+    Example
+    -------
+    >>> from oggmap import eggnog2orthomap
+    >>> og_index = eggnog2orthomap.get_eggnog_index(og='e6.og2seqs_and_species.tsv',
+    >>>                                             cache='oggmap_cache')
+    """
+    cache_path = os.path.join(cache, 'eggnog_' + inputs.get_file_stamp(og)[:32])
+    if os.path.exists(cache_path):
+        return cache_path
+    os.makedirs(cache,
+                exist_ok=True)
+    # the index is written to a temporary directory first, so that an interrupted run leaves no partial index
+    cache_tmp = tempfile.mkdtemp(dir=cache)
+    # ranges of at most 64 MiB are read at once
+    byte_ranges = of2orthomap.get_byte_ranges(og,
+                                              max(processes * 4, (os.path.getsize(og) >> 26) + 1),
+                                              header=False)
+    if processes > 1:
+        with ProcessPoolExecutor(processes) as pool:
+            og_ranges = list(pool.map(_index_eggnog_range, *zip(*[[og, x, y] for x, y in byte_ranges])))
+    else:
+        og_ranges = [_index_eggnog_range(og, x, y) for x, y in byte_ranges]
+    # byte offsets are int64, taxIDs and line indices int32
+    line_starts = np.concatenate([np.zeros(0, dtype=np.int64)] + [x[0] for x in og_ranges])
+    line_lengths = np.concatenate([np.zeros(0, dtype=np.int32)] + [x[1] for x in og_ranges])
+    taxids = np.unique(np.concatenate([np.zeros(0, dtype=np.int32)] + [np.unique(x[3]) for x in og_ranges]))
+    taxid_counts = np.zeros(len(taxids), dtype=np.int64)
+    for og_range in og_ranges:
+        taxid_counts += np.bincount(np.searchsorted(taxids, og_range[3]), minlength=len(taxids))
+    taxid_offsets = np.zeros(len(taxids) + 1, dtype=np.int64)
+    np.cumsum(taxid_counts, out=taxid_offsets[1:])
+    # the lines of each taxID are filled in range by range with a counting sort, so that only the taxIDs of
+    # one range are sorted at once
+    taxid_lines = np.lib.format.open_memmap(os.path.join(cache_tmp, 'taxid_lines.npy'),
+                                            mode='w+',
+                                            dtype=np.int32,
+                                            shape=(int(taxid_offsets[-1]),))
+    taxid_next = taxid_offsets[:-1].copy()
+    line_offset = 0
+    for range_starts, range_lengths, range_species_counts, range_taxids in og_ranges:
+        range_codes = np.searchsorted(taxids, range_taxids)
+        range_order = np.argsort(range_codes, kind='stable')
+        range_codes = range_codes[range_order]
+        range_counts = np.bincount(range_codes, minlength=len(taxids))
+        range_ranks = np.arange(len(range_codes)) - (np.cumsum(range_counts) - range_counts)[range_codes]
+        range_lines = np.repeat(np.arange(line_offset, line_offset + len(range_starts), dtype=np.int32),
+                                range_species_counts)
+        taxid_lines[taxid_next[range_codes] + range_ranks] = range_lines[range_order]
+        taxid_next += range_counts
+        line_offset += len(range_starts)
+    taxid_lines.flush()
+    del taxid_lines
+    np.save(os.path.join(cache_tmp, 'line_starts.npy'), line_starts)
+    np.save(os.path.join(cache_tmp, 'line_lengths.npy'), line_lengths)
+    np.save(os.path.join(cache_tmp, 'taxids.npy'), taxids)
+    np.save(os.path.join(cache_tmp, 'taxid_offsets.npy'), taxid_offsets)
+    try:
+        os.rename(cache_tmp, cache_path)
+    except OSError:
+        # another process created the same index in the meantime
+        shutil.rmtree(cache_tmp)
+    return cache_path
+
+
+def _index_eggnog_range(og,
+                        start,
+                        end):
+    """
+    A helper function to index the eggnog <e6.og2seqs_and_species.tsv> lines of one byte range in a worker
+    process (see `get_eggnog_index`).
+
+    :param og: Path to uncompressed eggnog <e6.og2seqs_and_species.tsv> file.
+    :param start: Start of the byte range.
+    :param end: End of the byte range.
+    :return: A list of results such as:
+             line byte offsets, line lengths, number of species per line, concatenated species taxIDs
+
+    :type og: str
+    :type start: int
+    :type end: int
+    :rtype: list
+    """
+    with open(og,
+              'rb') as og_handle:
+        og_handle.seek(start)
+        og_lines = og_handle.read(end - start).split(b'\n')
+    if og_lines[-1] == b'':
+        og_lines.pop()
+    line_lengths = np.array([len(x) + 1 for x in og_lines], dtype=np.int64)
+    line_starts = start + np.cumsum(line_lengths) - line_lengths
+    og_fields = [x.split(b'\t', 5) for x in og_lines]
+    # lines without species are skipped like by the parser
+    line_keep = np.array([len(x) == 6 and x[4].strip() != b'' for x in og_fields], dtype=bool)
+    line_species = [og_fields[x][4] for x in np.flatnonzero(line_keep)]
+    line_species_counts = np.array([x.count(b',') + 1 for x in line_species], dtype=np.int32)
+    line_taxids = np.array(b','.join(line_species).decode('utf-8').split(',') if line_species else [],
+                           dtype=np.int32)
+    return [line_starts[line_keep],
+            line_lengths[line_keep].astype(np.int32),
+            line_species_counts,
+            line_taxids]
+
+
+def read_eggnog_index(og_index,
+                      og,
+                      qtid):
+    """
+    This function returns the lines of an eggnog <e6.og2seqs_and_species.tsv> file that contain a species, read
+    directly at the byte offsets of a taxID index (see `get_eggnog_index`) in the order of the file.
+
+    :param og_index: Path to the index of the eggnog file.
+    :param og: Path to uncompressed eggnog <e6.og2seqs_and_species.tsv> file.
+    :param qtid: Species taxID.
+    :return: Lines as bytes.
+
+    :type og_index: str
+    :type og: str
+    :type qtid: int
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import eggnog2orthomap
+    >>> og_lines = eggnog2orthomap.read_eggnog_index(og_index=og_index,
+    >>>                                              og='e6.og2seqs_and_species.tsv',
+    >>>                                              qtid=10090)
+    """
+    taxids = np.load(os.path.join(og_index, 'taxids.npy'))
+    taxid_idx = np.searchsorted(taxids, int(qtid))
+    if taxid_idx == len(taxids) or taxids[taxid_idx] != int(qtid):
+        return []
+    taxid_offsets = np.load(os.path.join(og_index, 'taxid_offsets.npy'))
+    taxid_lines = np.load(os.path.join(og_index, 'taxid_lines.npy'),
+                          mmap_mode='r')[taxid_offsets[taxid_idx]:taxid_offsets[taxid_idx + 1]]
+    line_starts = np.load(os.path.join(og_index, 'line_starts.npy'),
+                          mmap_mode='r')
+    line_lengths = np.load(os.path.join(og_index, 'line_lengths.npy'),
+                           mmap_mode='r')
+    og_lines = []
+    with open(og,
+              'rb') as og_handle:
+        for line_idx in np.unique(taxid_lines).tolist():
+            og_handle.seek(line_starts[line_idx])
+            og_lines.append(og_handle.read(line_lengths[line_idx]))
+    return og_lines
+
+
 def main():
     """
     The main function that is being called when `eggnog2orthomap` is used via the terminal.
@@ -296,9 +556,14 @@ def main():
     get_eggnog_orthomap(args.qt,
                         args.og,
                         subset=args.subset,
-                        out=args.out,
+                        level=args.level,
+                        out=of2orthomap.get_default_out(args.out, args.format),
                         overwrite=args.overwrite,
-                        dbname=args.dbname)
+                        dbname=args.dbname,
+                        ranks=args.ranks,
+                        processes=args.processes,
+                        out_format=args.format,
+                        cache=args.cache)
 
 
 if __name__ == '__main__':
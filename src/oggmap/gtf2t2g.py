@@ -13,8 +13,8 @@ License: GPL-3
 import os
 import sys
 import argparse
-import gzip
 import pandas as pd
+from oggmap import inputs
 
 
 def define_parser():
@@ -55,7 +55,7 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     :type parser: argparse.ArgumentParser
     """
     parser.add_argument('-i',
-                        help='specify GTF input file')
+                        help='specify GTF input file (plain or compressed)')
     parser.add_argument('-o',
                         help='specify output file [optional]')
     parser.add_argument('-g',
@@ -138,7 +138,7 @@ def parse_gtf(gtf,
     """
     This function parses a GTF file to extract transcript and gene IDs.
 
-    :param gtf: Path to GTF file.
+    :param gtf: Path to GTF file (plain or compressed, see `inputs.open_input`).
     :param g: Specify if gene names should be appended if they exist.
     :param b: Specify if gene biotype should be appended if they exist.
     :param p: Specify if protein id should be appended if they exist.
@@ -168,12 +168,7 @@ def parse_gtf(gtf,
     >>>     g=True, b=True, p=True, v=True, s=True, q=True)
     >>> query_species_t2g
     """
-    if gtf.endswith('gz'):
-        gtf_handle = gzip.open(gtf,
-                               'rt')
-    else:
-        gtf_handle = open(gtf,
-                          'rt')
+    gtf_handle = inputs.open_text(gtf)
     t2g = {}
     t2p = {}
     tc = 0
@@ -0,0 +1,254 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+
+"""
+Author: Kristian K Ullrich
+date: February 2025
+email: ullrich@evolbio.mpg.de
+License: GPL-3
+"""
+
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+import hashlib
+import shutil
+import zipfile
+import tempfile
+import subprocess
+import pandas as pd
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+BUFFER_SIZE = 1 << 20
+MAGIC_BYTES = [(b'\x1f\x8b', 'gz'),
+               (b'BZh', 'bz2'),
+               (b'\xfd7zXZ\x00', 'xz'),
+               (b'\x28\xb5\x2f\xfd', 'zst'),
+               (b'PK\x03\x04', 'zip')]
+TABLE_MAGIC_BYTES = [(b'PAR1', 'parquet'),
+                     (b'ARROW1', 'feather')]
+
+
+class _PipeReader(io.BufferedReader):
+    """
+    A buffered reader on the stdout of an external decompression process, that waits for the process
+    on close. If the output was read to the end, an OSError is raised when the process failed, e.g. on a
+    truncated or corrupt file.
+    """
+    def __init__(self, process, stderr):
+        super().__init__(process.stdout, BUFFER_SIZE)
+        self._process = process
+        self._stderr = stderr
+
+    def close(self):
+        if not self.closed:
+            at_eof = not self.peek(1)
+            super().close()
+            if not at_eof:
+                # closed before the end of the output, the process is not needed any longer
+                self._process.kill()
+            self._process.wait()
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode('utf-8', 'replace').strip()
+            self._stderr.close()
+            if at_eof and self._process.returncode != 0:
+                raise OSError('%s failed with exit status %d: %s' % (self._process.args[0],
+                                                                    self._process.returncode,
+                                                                    stderr))
+
+
+def get_compression(path):
+    """
+    This function returns the compression format of a file based on its leading magic bytes.
+
+    :param path: Path to file.
+    :return: Compression format ('gz', 'bz2', 'xz', 'zst', 'zip') or None if uncompressed.
+
+    :type path: str
+    :rtype: str
+
+    Example
+    -------
+    >>> from oggmap import inputs
+    >>> inputs.get_compression(path='ensembl_113_orthofinder_last_Orthogroups.tsv.zip')
+    """
+    return _match_magic_bytes(path,
+                              MAGIC_BYTES)
+
+
+def _match_magic_bytes(path,
+                       magic_list):
+    """
+    A helper function to match the leading bytes of a file against a list of (magic bytes, format).
+
+    :param path: Path to file.
+    :param magic_list: List of (magic bytes, format).
+    :return: Format or None if there is no match.
+
+    :type path: str
+    :type magic_list: list
+    :rtype: str
+    """
+    with open(path,
+              'rb') as handle:
+        magic = handle.read(6)
+    for magic_bytes, magic_format in magic_list:
+        if magic.startswith(magic_bytes):
+            return magic_format
+    return None
+
+
+def open_input(path,
+               threads=1):
+    """
+    This function opens a plain or compressed (gzip, bzip2, xz, zstd or zip) text file for reading as
+    binary stream with a large buffer. The compression format is detected by magic bytes and not by
+    file extension, and iterating the returned stream always yields lines as bytes.
+
+    For zip archives the member named like the archive without '.zip' is opened, or the first member
+    if there is none. With more than one thread, gzip and zstd files are decompressed by an external
+    `pigz` or `zstd` process if available, so that decompression runs in parallel with parsing.
+    zstd files require either the `zstandard` module or the `zstd` executable.
+
+    :param path: Path to file.
+    :param threads: Number of threads for external decompression.
+    :return: Binary stream.
+
+    :type path: str
+    :type threads: int
+    :rtype: io.BufferedReader
+
+    Example
+    -------
+    >>> from oggmap import inputs
+    >>> with inputs.open_input(path='ensembl_113_orthofinder_last_Orthogroups.tsv.zip') as og_lines:
+    >>>     og_species = next(og_lines).decode('utf-8').strip().split('\\t')
+    """
+    compression = get_compression(path)
+    if compression is None:
+        return open(path,
+                    'rb',
+                    buffering=BUFFER_SIZE)
+    if compression == 'zip':
+        with zipfile.ZipFile(path) as zip_handle:
+            members = [x for x in zip_handle.namelist() if not x.endswith('/')]
+            member = '.'.join(os.path.basename(path).split('.')[:-1])
+            # the member stays readable after the archive is closed
+            return io.BufferedReader(zip_handle.open(member if member in members else members[0]),
+                                     BUFFER_SIZE)
+    tool = {'gz': 'pigz', 'zst': 'zstd'}.get(compression)
+    if tool is not None and (threads > 1 or (compression == 'zst' and zstandard is None)) and shutil.which(tool):
+        # zstd decompresses single-threaded but still runs in parallel with parsing
+        tool_args = ['-p', str(threads)] if tool == 'pigz' else ['-q']
+        # stderr goes to a file, so that the process can not block on a full pipe
+        tool_stderr = tempfile.TemporaryFile()
+        return _PipeReader(subprocess.Popen([tool, '-dc'] + tool_args + [path],
+                                            stdout=subprocess.PIPE,
+                                            stderr=tool_stderr,
+                                            bufsize=0),
+                           tool_stderr)
+    if compression == 'gz':
+        return io.BufferedReader(gzip.open(path,
+                                           'rb'),
+                                 BUFFER_SIZE)
+    if compression == 'bz2':
+        return io.BufferedReader(bz2.open(path,
+                                          'rb'),
+                                 BUFFER_SIZE)
+    if compression == 'xz':
+        return io.BufferedReader(lzma.open(path,
+                                           'rb'),
+                                 BUFFER_SIZE)
+    if zstandard is None:
+        raise ImportError('reading zstd files requires the zstandard module or the zstd executable')
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path,
+                                                                              'rb'),
+                                                                         read_size=BUFFER_SIZE,
+                                                                         closefd=True),
+                             BUFFER_SIZE)
+
+
+def open_text(path,
+              threads=1):
+    """
+    This function opens a plain or compressed text file (see `open_input`) for reading as text stream.
+
+    :param path: Path to file.
+    :param threads: Number of threads for external decompression.
+    :return: Text stream.
+
+    :type path: str
+    :type threads: int
+    :rtype: io.TextIOWrapper
+
+    Example
+    -------
+    >>> from oggmap import inputs
+    >>> with inputs.open_text(path='Danio_rerio.GRCz11.113.gtf.gz') as gtf_handle:
+    >>>     gtf_header = next(gtf_handle)
+    """
+    return io.TextIOWrapper(open_input(path,
+                                       threads=threads),
+                            encoding='utf-8')
+
+
+def get_file_stamp(path):
+    """
+    This function returns a SHA-256 stamp of a file computed from its size, modification time and first block.
+    The file is not read as a whole, so that very large files can be recognized in constant time.
+
+    :param path: Path to file.
+    :return: Hexadecimal stamp.
+
+    :type path: str
+    :rtype: str
+
+    Example
+    -------
+    >>> from oggmap import inputs
+    >>> inputs.get_file_stamp(path='e6.og2seqs_and_species.tsv')
+    """
+    file_stat = os.stat(path)
+    file_stamp = hashlib.sha256(('%d\t%d\t' % (file_stat.st_size, file_stat.st_mtime_ns)).encode('utf-8'))
+    with open(path,
+              'rb') as handle:
+        file_stamp.update(handle.read(BUFFER_SIZE))
+    return file_stamp.hexdigest()
+
+
+def read_table(path,
+               sep='\t'):
+    """
+    This function reads a table such as an orthomap, which can be a Parquet or Feather file (requires `pyarrow`)
+    or a plain or compressed text file (see `open_input`). The file format is detected by magic bytes.
+
+    :param path: Path to file.
+    :param sep: Column separator of text files.
+    :return: Table.
+
+    :type path: str
+    :type sep: str
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> from oggmap import inputs
+    >>> query_orthomap = inputs.read_table(path='Danio_rerio.orthomap.parquet')
+    """
+    table_format = _match_magic_bytes(path,
+                                      TABLE_MAGIC_BYTES)
+    if table_format == 'parquet':
+        return pd.read_parquet(path)
+    if table_format == 'feather':
+        return pd.read_feather(path)
+    with open_input(path) as handle:
+        return pd.read_csv(handle,
+                           sep=sep)
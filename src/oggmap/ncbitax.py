@@ -12,8 +12,10 @@ License: GPL-3
 
 import os
 import sys
+import sqlite3
 import argparse
 from taxadb2 import app
+from oggmap import qlin
 
 
 def define_parser():
@@ -28,6 +30,15 @@ def define_parser():
 
     #update ncbi taxonomy database:
     ncbitax -u -outdir taxadb -t taxa -dbname taxadb.sqlite
+
+    #update ncbi taxonomy database and build the closure table for clade queries:
+    ncbitax -u -outdir taxadb -t taxa -dbname taxadb.sqlite -closure
+
+    #update ncbi taxonomy database and write the binary taxonomy for parallel jobs:
+    ncbitax -u -outdir taxadb -t taxa -dbname taxadb.sqlite -binary
+
+    #list taxIDs that changed compared to an old ncbi taxonomy database:
+    ncbitax -diff taxadb.old.sqlite -dbname taxadb.sqlite -out taxadb.diff.tsv
     '''
     parser = argparse.ArgumentParser(
         prog='ncbitax',
@@ -66,6 +77,16 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     parser.add_argument('-force',
                         help='force option for taxadb2 download (default: False)',
                         action='store_true')
+    parser.add_argument('-closure',
+                        help='build the ancestor/descendant closure table (default: False)',
+                        action='store_true')
+    parser.add_argument('-binary',
+                        help='write the memory-mappable binary taxonomy <dbname>.taxonomy (default: False)',
+                        action='store_true')
+    parser.add_argument('-diff',
+                        help='specify old taxadb.sqlite file to list taxIDs that changed in <-dbname>')
+    parser.add_argument('-out',
+                        help='specify output file for <-diff> (default: stdout)')
     parser.add_argument('-verbose',
                         help='increase verbosity (default: False)',
                         action='store_true')
@@ -105,6 +126,171 @@ def update_ncbi(args):
     args.verbose = False
     os.chdir(os.path.abspath(current_dir))
     app.create_db(args)
+    if os.path.exists(os.path.join(args.input, 'delnodes.dmp')):
+        add_deleted_taxids(dbname=args.dbname,
+                           delnodes=os.path.join(args.input, 'delnodes.dmp'))
+    if os.path.exists(os.path.join(args.input, 'names.dmp')):
+        add_name_index(dbname=args.dbname,
+                       names=os.path.join(args.input, 'names.dmp'))
+    else:
+        add_name_index(dbname=args.dbname)
+    if getattr(args, 'closure', False):
+        add_closure_table(dbname=args.dbname)
+    if getattr(args, 'binary', False):
+        add_binary_taxonomy(dbname=args.dbname)
+
+
+def add_deleted_taxids(dbname,
+                       delnodes):
+    """
+    This function adds the deleted taxIDs of the NCBI taxonomy <delnodes.dmp> as the indexed table
+    `deletedtaxid` to a taxadb.sqlite file. Together with the merged taxIDs <merged.dmp>, which `taxadb2`
+    stores in the table `deprecatedtaxid`, any taxID can be resolved to its canonical taxID in one step.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :param delnodes: Path to NCBI taxonomy <delnodes.dmp> file.
+
+    :type dbname: str
+    :type delnodes: str
+
+    Example
+    -------
+    >>> from oggmap import ncbitax
+    >>> ncbitax.add_deleted_taxids(dbname='taxadb.sqlite',
+    >>>                            delnodes='taxadb/delnodes.dmp')
+    """
+    con = sqlite3.connect(dbname)
+    with con:
+        con.execute('CREATE TABLE IF NOT EXISTS deletedtaxid (taxid INTEGER PRIMARY KEY)')
+        with open(delnodes, 'r') as delnodes_lines:
+            con.executemany('INSERT OR IGNORE INTO deletedtaxid (taxid) VALUES (?)',
+                            [(int(x.split('|')[0].strip()),) for x in delnodes_lines if x.strip()])
+    con.close()
+
+
+def add_name_index(dbname,
+                   names=None,
+                   name_classes=('synonym', 'equivalent name', 'genbank synonym')):
+    """
+    This function adds a case-insensitive index on the scientific names of a taxadb.sqlite file and,
+    if the NCBI taxonomy <names.dmp> file is given, the synonyms of the taxIDs as the indexed table
+    `synonym`, so that species names can be resolved in bulk with `qlin.resolve_names`.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :param names: Path to NCBI taxonomy <names.dmp> file.
+    :param name_classes: Name classes of <names.dmp> to be added as synonyms.
+
+    :type dbname: str
+    :type names: str
+    :type name_classes: tuple
+
+    Example
+    -------
+    >>> from oggmap import ncbitax
+    >>> ncbitax.add_name_index(dbname='taxadb.sqlite',
+    >>>                        names='taxadb/names.dmp')
+    """
+    con = sqlite3.connect(dbname)
+    with con:
+        con.execute('CREATE INDEX IF NOT EXISTS taxa_tax_name_nocase ON taxa (tax_name COLLATE NOCASE)')
+        if names:
+            con.execute('CREATE TABLE IF NOT EXISTS synonym (tax_name TEXT COLLATE NOCASE, taxid INTEGER)')
+            con.execute('CREATE UNIQUE INDEX IF NOT EXISTS synonym_tax_name ON synonym (tax_name, taxid)')
+            with open(names, 'r') as names_lines:
+                con.executemany('INSERT OR IGNORE INTO synonym (tax_name, taxid) VALUES (?, ?)',
+                                [(x[1], int(x[0])) for x in
+                                 [[y.strip() for y in z.split('|')] for z in names_lines]
+                                 if len(x) > 3 and x[3] in name_classes])
+    con.close()
+
+
+def add_closure_table(dbname):
+    """
+    This function adds the ancestor/descendant closure table `closure` (ancestor, descendant, depth) of
+    the NCBI taxonomy to a taxadb.sqlite file, where depth is the number of edges from the descendant up
+    to the ancestor (0 for the node itself).
+
+    The table is stored ordered by (ancestor, descendant) and has a covering index on
+    (descendant, depth, ancestor), so that both "all species under this clade" and "all ancestors of
+    these species" are answered by index range scans (see `qlin.get_clade_members`, `qlin.filter_clade`
+    and `qlin.get_youngest_common_many`).
+
+    :param dbname: Path to taxadb.sqlite file.
+
+    :type dbname: str
+
+    Example
+    -------
+    >>> from oggmap import ncbitax
+    >>> ncbitax.add_closure_table(dbname='taxadb.sqlite')
+    """
+    con = sqlite3.connect(dbname)
+    with con:
+        con.execute('DROP TABLE IF EXISTS closure')
+        con.execute('CREATE TABLE closure (ancestor INTEGER NOT NULL, descendant INTEGER NOT NULL, '
+                    'depth INTEGER NOT NULL, PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID')
+        con.execute('INSERT INTO closure '
+                    'WITH RECURSIVE lineage(ancestor, descendant, depth) AS ('
+                    'SELECT ncbi_taxid, ncbi_taxid, 0 FROM taxa '
+                    'UNION ALL '
+                    'SELECT taxa.parent_taxid, lineage.descendant, lineage.depth + 1 '
+                    'FROM lineage JOIN taxa ON taxa.ncbi_taxid = lineage.ancestor '
+                    'WHERE taxa.parent_taxid != taxa.ncbi_taxid) '
+                    'SELECT ancestor, descendant, depth FROM lineage')
+        con.execute('CREATE INDEX closure_descendant ON closure (descendant, depth, ancestor)')
+    con.close()
+
+
+def add_binary_taxonomy(dbname):
+    """
+    This function writes a compact binary copy of a taxadb.sqlite file to the directory <dbname>.taxonomy:
+    the parent, rank code and depth arrays indexed by taxID, the scientific names as offsets into one
+    byte blob and the merged and deleted taxIDs, all as uncompressed NumPy arrays.
+
+    `qlin.load_taxadb(snapshot=True)` memory-maps these arrays, so that taxonomy-dependent jobs start
+    without reading the database and parallel worker processes share one page-cached copy.
+    The binary taxonomy must be written again after the database has changed.
+
+    :param dbname: Path to taxadb.sqlite file.
+
+    :type dbname: str
+
+    Example
+    -------
+    >>> from oggmap import ncbitax
+    >>> ncbitax.add_binary_taxonomy(dbname='taxadb.sqlite')
+    """
+    qlin.TaxonomySnapshot(dbname=dbname).save(dbname + '.taxonomy')
+
+
+def write_taxonomy_diff(old_dbname,
+                        new_dbname,
+                        out=None):
+    """
+    This function writes the taxIDs that changed between two versions of a taxadb.sqlite file
+    (see `qlin.diff_taxonomy`) as tab-separated file with the columns 'taxID' and 'change'.
+
+    :param old_dbname: Path to the old taxadb.sqlite file.
+    :param new_dbname: Path to the new taxadb.sqlite file.
+    :param out: Output file (default: stdout).
+
+    :type old_dbname: str
+    :type new_dbname: str
+    :type out: str
+
+    Example
+    -------
+    >>> from oggmap import ncbitax
+    >>> ncbitax.write_taxonomy_diff(old_dbname='taxadb.old.sqlite',
+    >>>                             new_dbname='taxadb.sqlite',
+    >>>                             out='taxadb.diff.tsv')
+    """
+    changed = qlin.diff_taxonomy(old_dbname=old_dbname,
+                                 new_dbname=new_dbname)
+    if out is None:
+        changed.to_csv(sys.stdout, sep='\t', index=False)
+    else:
+        changed.to_csv(out, sep='\t', index=False)
 
 
 def main():
@@ -113,6 +299,18 @@ def main():
     """
     parser = define_parser()
     args = parser.parse_args()
+    # the diff may be written to stdout, so the arguments are not printed
+    if args.diff:
+        if not args.dbname or not os.path.exists(args.dbname):
+            print('\nError <-dbname>: Please specify taxadb.sqlite file')
+            sys.exit()
+        if not os.path.exists(args.diff):
+            print('\nError <-diff>: Please specify old taxadb.sqlite file')
+            sys.exit()
+        write_taxonomy_diff(old_dbname=args.diff,
+                            new_dbname=args.dbname,
+                            out=args.out)
+        sys.exit()
     print(args)
     if not args.u:
         parser.print_help()
@@ -12,10 +12,15 @@ License: GPL-3
 
 import os
 import sys
-import zipfile
+import shutil
+import hashlib
 import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from oggmap import qlin
+from scipy import sparse
+from oggmap import aging, inputs, qlin
 
 
 def define_parser():
@@ -39,6 +44,33 @@ def define_parser():
       -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
       -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
       -dbname taxadb.sqlite
+
+    # after a taxonomy update, re-age only orthogroups with species whose lineage changed:
+    $ ncbitax -diff taxadb.old.sqlite -dbname taxadb.sqlite -out taxadb.diff.tsv
+    $ of2orthomap -seqname 7955.danio_rerio.pep -qt 7955 \\
+      -sl ensembl_113_orthofinder_last_species_list.tsv \\
+      -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
+      -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
+      -previous orthomap.tsv -changed taxadb.diff.tsv \\
+      -out orthomap.updated.tsv \\
+      -dbname taxadb.sqlite
+
+    # extract orthomaps of all species with one pass over the OrthoFinder results
+    # (written as <seqname>.orthomap.tsv):
+    $ of2orthomap -seqname all \\
+      -sl ensembl_113_orthofinder_last_species_list.tsv \\
+      -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
+      -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
+      -out orthomap.tsv \\
+      -dbname taxadb.sqlite
+
+    # convert the OrthoFinder results once into an indexed binary cache, which is re-used by later runs:
+    $ of2orthomap -seqname 7955.danio_rerio.pep -qt 7955 \\
+      -sl ensembl_113_orthofinder_last_species_list.tsv \\
+      -oc ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip \\
+      -og ensembl_113_orthofinder_last_Orthogroups.tsv.zip \\
+      -cache oggmap_cache \\
+      -dbname taxadb.sqlite
     '''
     parser = argparse.ArgumentParser(
         prog='of2orthomap',
@@ -60,7 +92,8 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     """
     parser.add_argument('-seqname',
                         help='sequence name of the query species in OrthoFinder '
-                             '(see column names of  <Orthogroups.tsv>)')
+                             '(see column names of  <Orthogroups.tsv>) or all to write one orthomap per species '
+                             'of the species list')
     parser.add_argument('-qt',
                         help='query species taxID (e.g. use <oggmap qlin -h> to get taxID)')
     parser.add_argument('-sl',
@@ -71,11 +104,28 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     parser.add_argument('-og',
                         help='specify OrthoFinder <Orthogroups.tsv> (see Orthogroups directory)')
     parser.add_argument('-out',
-                        help='specify output file <orthomap.tsv> (default: orthomap.tsv)',
-                        default='orthomap.tsv')
+                        help='specify output file <orthomap.tsv> (default: orthomap.<-format>)')
     parser.add_argument('-overwrite',
                         help='specify if existing output file should be overwritten (default: True)',
                         action='store_true')
+    parser.add_argument('-previous',
+                        help='specify orthomap of a previous run to re-age only orthogroups affected by <-changed>')
+    parser.add_argument('-changed',
+                        help='specify changed taxIDs between taxonomy versions (see <ncbitax -diff>)')
+    parser.add_argument('-ranks',
+                        help='project query lineage onto a comma-separated rank set, '
+                             'e.g. phylum,class,order,family,genus')
+    parser.add_argument('-format',
+                        help='specify output file format (default: tsv)',
+                        choices=['tsv', 'parquet', 'feather'],
+                        default='tsv')
+    parser.add_argument('-processes',
+                        help='number of worker processes to parse an uncompressed <Orthogroups.tsv> (default: 1)',
+                        default=1,
+                        type=int)
+    parser.add_argument('-cache',
+                        help='specify directory of an indexed binary cache of <Orthogroups.GeneCounts.tsv> and '
+                             '<Orthogroups.tsv>, which is created on first use')
     parser.add_argument('-dbname',
                         help='taxadb.sqlite file')
 
@@ -90,35 +140,72 @@ def get_orthomap(seqname,
                  continuity=True,
                  overwrite=True,
                  ncbi=None,
-                 dbname=None):
+                 dbname=None,
+                 query_lineage=None,
+                 ranks=None,
+                 previous=None,
+                 changed=None,
+                 processes=1,
+                 out_format='tsv',
+                 cache=None):
     """
     This function return an orthomap for a given query species and OrthoFinder input data.
 
+    After an update of the taxonomic database, an orthomap of a previous run on the same input data can be
+    given together with the taxIDs whose lineage changed (see `qlin.diff_taxonomy`). Then only orthogroups
+    that contain affected species are aged again and all other orthogroups keep their previous phylostratum,
+    while continuity scores are always computed again. If the query lineage itself changed, all orthogroups
+    are aged again.
+
+    The species list and the OrthoFinder results can also be given already parsed, as done by `get_orthomaps`
+    to age many query species with one pass over the input data.
+
     :param seqname: Sequence name of the query species used for OrthoFinder comparison.
     :param qt: Query species taxID.
-    :param sl: Path to species list file containing <OrthoFinder name><tab><species taxID>.
-    :param oc: Path to OrthoFinder result <Orthogroups.GeneCounts.tsv> file.
-    :param og: Path to OrthoFinder result <Orthogroups.tsv> file.
+    :param sl: Path to species list file containing <OrthoFinder name><tab><species taxID>
+               or DataFrame with the columns 'species', 'taxID' and optionally 'lineage'.
+    :param oc: Path to OrthoFinder result <Orthogroups.GeneCounts.tsv> file
+               or its content as returned by `read_gene_counts`.
+    :param og: Path to OrthoFinder result <Orthogroups.tsv> file
+               or rows of orthogroup and query genes as returned by `read_orthogroups`.
     :param out: Path to output file.
     :param quiet: Specify if output should be quiet.
     :param continuity: Specify if continuity score should be calculated.
     :param overwrite: Specify if output should be overwritten.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
+    :param query_lineage: Precomputed query lineage (see `qlin.get_query_lineage`) to be used instead of
+                          querying the lineage of the query species again.
+    :param ranks: Project the query lineage onto these ranks, e.g. ['phylum', 'class', 'order', 'family', 'genus']
+                  (see `qlin.QueryLineage.project`).
+    :param previous: Orthomap of a previous run as DataFrame or path to its output file.
+    :param changed: Changed taxIDs as DataFrame returned by `qlin.diff_taxonomy`, path to its output file
+                    or list of taxIDs.
+    :param processes: Number of worker processes to parse an uncompressed <Orthogroups.tsv> file.
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather' (see `write_orthomap`).
+    :param cache: Directory of the indexed binary cache of <Orthogroups.GeneCounts.tsv> and <Orthogroups.tsv>
+                  (see `get_orthofinder_cache`).
     :return: A list of results such as:
              orthomap, species_list, youngest_common_counts
 
     :type seqname: str
     :type qt: str
-    :type sl: str
-    :type oc: str
-    :type og: str
+    :type sl: str or pandas.DataFrame
+    :type oc: str or list
+    :type og: str or list
     :type out: str
     :type quiet: bool
     :type continuity: bool
     :type overwrite: bool
     :type ncbi: dict
     :type dbname: str
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type ranks: list or str
+    :type previous: pandas.DataFrame or str
+    :type changed: pandas.DataFrame or str or list
+    :type processes: int
+    :type out_format: str
+    :type cache: str
     :rtype: list
 
     Example
@@ -138,10 +225,15 @@ def get_orthomap(seqname,
     >>>     dbname='taxadb.sqlite')
     >>> query_orthomap
     """
-    outhandle = None
-    og_continuity_score = None
     ncbi = qlin.load_taxadb(ncbi=ncbi,
-                            dbname=dbname)
+                            dbname=dbname,
+                            cache=True)
+    if query_lineage is None:
+        query_lineage = qlin.get_query_lineage(qt=qt,
+                                               quiet=True,
+                                               ncbi=ncbi)
+    if ranks is not None:
+        query_lineage = query_lineage.project(ranks)
     qname, \
         qtid, \
         qlineage, \
@@ -149,161 +241,757 @@ def get_orthomap(seqname,
         qlineagezip, \
         qlineagenames, \
         qlineagerev, \
-        qk = qlin.get_qlin(qt=qt,
-                           quiet=True,
-                           ncbi=ncbi)
-    query_lineage_topo = qlin.get_lineage_topo(qt=qt,
-                                               ncbi=ncbi)
-    species_list = pd.read_csv(sl,
-                               sep='\t',
-                               header=None)
-    species_list.columns = ['species', 'taxID']
-    #species_list['lineage'] = species_list.apply(lambda x: ncbi.get_lineage(x.iloc[1]),
-    #                                             axis=1)
-    species_list['lineage'] = species_list.apply(lambda x: qlin.ncbi_get_lineage(qt=x.iloc[1],
-                                                                                 ncbi=ncbi),
-                                                 axis=1)
-    species_list['youngest_common'] = [qlin.get_youngest_common(qlineage, x) for x in species_list.lineage]
-    species_list['youngest_name'] = [list(x.values())[0] for x in [qlin.ncbi_get_taxid_translator(qt_vec=[x],
-                                                                                                  ncbi=ncbi)
-                                                                   for x in list(species_list.youngest_common)]]
+        qk = query_lineage.to_list()
+    if isinstance(sl, pd.DataFrame):
+        species_list = sl[[x for x in ['species', 'taxID', 'lineage'] if x in sl.columns]].copy()
+    else:
+        species_list = pd.read_csv(sl,
+                                   sep='\t',
+                                   header=None)
+        species_list.columns = ['species', 'taxID']
+    species_list = aging.add_youngest_common(query_lineage,
+                                             species_list,
+                                             ncbi=ncbi)
     if not quiet:
         print(seqname)
         print(qname)
         print(qt)
         print(species_list)
-    youngest_common_counts_df = get_youngest_common_counts(qlineage,
-                                                           species_list)
-    for node in qlin.traverse_postorder(query_lineage_topo.root):
-        if node.name:
-            nsplit = node.name.split('/')
-            if len(nsplit) == 3:
-                node.species_count = list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-                    [int(nsplit[1])])].counts)[0]
-            #node.add_feature('species_count',
-            #                 list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-            #                     [int(nsplit[1])])].counts)[0])
-    oc_og_dict = {}
-    continuity_dict = {}
-    if os.path.basename(oc).split('.')[-1] == 'zip':
-        oc_zip = zipfile.Path(oc, at='.'.join(os.path.basename(oc).split('.')[:-1]))
-        oc_lines = oc_zip.open()
-    else:
-        oc_lines = open(oc,
-                        'r')
-    oc_species = next(oc_lines)
-    if type(oc_species) == bytes:
-        oc_species = oc_species.decode('utf-8').strip().split('\t')
-    else:
-        oc_species = oc_species.strip().split('\t')
+    youngest_common_counts_df = aging.get_youngest_common_counts(qlineage,
+                                                                 species_list)
+    aging.set_species_counts(query_lineage,
+                             youngest_common_counts_df)
+    previous_ps, affected_species = get_previous_ps(previous=previous,
+                                                    changed=changed,
+                                                    qlineage=query_lineage.full.qlineage,
+                                                    species_list=species_list)
+    og_cache = None
+    if cache is not None and isinstance(oc, str) and isinstance(og, str):
+        og_cache = get_orthofinder_cache(oc,
+                                         og,
+                                         cache)
+        oc = read_cached_gene_counts(og_cache)
+    oc_og_names_all, oc_species, oc_counts = read_gene_counts(oc) if isinstance(oc, str) else oc
     oc_qidx = [x for x, y in enumerate(oc_species) if y == seqname]
     if len(oc_qidx) == 0:
         print('\nError <-qname>: query species name not in OrthoFinder results, please check spelling\n'
               'e.g. <head -1 Orthogroups.GeneCounts.tsv>')
         sys.exit()
-    for oc_line in oc_lines:
-        if type(oc_line) == bytes:
-            oc_og = oc_line.decode('utf-8').strip().split('\t')
-        else:
-            oc_og = oc_line.strip().split('\t')
-        if int(oc_og[oc_qidx[0]]) == 0:
-            continue
-        if int(oc_og[oc_qidx[0]]) > 0:
-            oc_og_hits = [oc_species[x+1] for x, y in enumerate(oc_og[1::][::-1][1::][::-1]) if int(y) > 0]
-            # get list of the youngest common between query and all other species
-            oc_og_hits_youngest_common = list(species_list.youngest_common[
-                                                  [x for x, y in enumerate(species_list.species)
-                                                   if y in oc_og_hits]])
-            # evaluate all youngest common nodes to retain the oldest of them and assign as the orthogroup
-            # ancestral state (gene age)
-            if len(oc_og_hits_youngest_common) > 0:
-                oc_og_oldest_common = qlin.get_oldest_common(qlineage,
-                                                             oc_og_hits_youngest_common)
-                oc_og_dict[oc_og[0]] = oc_og_oldest_common
-                if continuity:
-                    continuity_dict[oc_og[0]] = get_youngest_common_counts(
-                        qlineage,
-                        pd.DataFrame(oc_og_hits_youngest_common,
-                                     columns=['youngest_common'])).counts
-    oc_lines.close()
+    # map species list rows onto count matrix columns once
+    oc_species_idx = {y: x for x, y in enumerate(oc_species)}
+    sl_idx = [x for x, y in enumerate(species_list.species) if y in oc_species_idx]
+    sl_cols = [oc_species_idx[species_list.species[x]] for x in sl_idx]
+    sl_youngest_common = np.asarray(species_list.youngest_common, dtype=np.int64)[sl_idx]
+    # presence of the species list species in all orthogroups containing the query species
+    oc_query = oc_counts[:, oc_qidx[0]] > 0
+    oc_presence = oc_counts[:, sl_cols][oc_query] > 0
+    oc_og_names_all = oc_og_names_all[oc_query]
+    oc_og_keep = oc_presence.any(axis=1)
+    oc_presence = sparse.csr_matrix(oc_presence[oc_og_keep])
+    oc_og_names = oc_og_names_all[oc_og_keep].tolist()
+    # orthogroups of a previous run without species of changed lineage keep their phylostratum, all others
+    # are aged again: evaluate all youngest common nodes to retain the oldest of them and assign as the
+    # orthogroup ancestral state (gene age)
+    og_ps_all = np.array([int(previous_ps[x][0]) if x in previous_ps else -1 for x in oc_og_names],
+                         dtype=np.int64)
+    oc_og_age = og_ps_all < 0
+    if previous_ps:
+        sl_affected = np.isin(species_list.species.values[sl_idx], list(affected_species))
+        oc_og_age |= np.asarray(oc_presence[:, sl_affected].sum(axis=1)).ravel() > 0
+    og_ps_all[oc_og_age], _ = aging.age_orthogroups(query_lineage,
+                                                    oc_presence[oc_og_age],
+                                                    sl_youngest_common,
+                                                    continuity=False)
+    # the continuity score depends on the phylostrata occupied by the whole species list, which a taxonomy
+    # update can change for every orthogroup
+    og_continuity_all = None
     if continuity:
-        youngest_common_counts_df = youngest_common_counts_df.join(pd.DataFrame.from_dict(continuity_dict))
-    omap = []
+        og_continuity_all = aging.get_orthogroup_continuity(query_lineage,
+                                                            oc_presence,
+                                                            sl_youngest_common,
+                                                            youngest_common_counts_df)
+    og_idx = {y: x for x, y in enumerate(oc_og_names)}
     if out:
         if os.path.exists(out) and not overwrite:
             print('\nError <-overwrite>: output file exists, please set to True if it should be overwritten\n')
             sys.exit()
-        outhandle = open(out,
-                         'w')
-        if continuity:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\tPScontinuity\n')
-        else:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\n')
-    if os.path.basename(og).split('.')[-1] == 'zip':
-        og_zip = zipfile.Path(og,
-                              at='.'.join(os.path.basename(og).split('.')[:-1]))
-        og_lines = og_zip.open()
+    # only decode the orthogroup name and the query column of aged orthogroups
+    if og_cache is not None:
+        og = read_cached_orthogroups(og_cache,
+                                     seqname,
+                                     ogs=set(og_idx))
+    elif isinstance(og, str):
+        og = read_orthogroups(og,
+                              seqname,
+                              ogs=set(og_idx),
+                              processes=processes)
+    og_names = []
+    og_rows_idx = []
+    og_genes = []
+    for og_name, og_name_genes in og:
+        if og_name in og_idx:
+            og_names.append(og_name)
+            og_rows_idx.append(og_idx[og_name])
+            og_genes.append(og_name_genes.replace(' ', '').split(','))
+    og_rows_idx = np.array(og_rows_idx, dtype=np.int64)
+    omap_df = aging.get_orthomap_df(query_lineage,
+                                    og_names,
+                                    og_ps_all[og_rows_idx],
+                                    og_genes,
+                                    og_continuity=og_continuity_all[og_rows_idx] if continuity else None)
+    if out:
+        write_orthomap(omap_df,
+                       out,
+                       out_format=out_format)
+    return [omap_df,
+            species_list,
+            youngest_common_counts_df]
+
+
+def get_orthomaps(seqnames,
+                  sl,
+                  oc,
+                  og,
+                  out=None,
+                  quiet=False,
+                  continuity=True,
+                  overwrite=True,
+                  ncbi=None,
+                  dbname=None,
+                  ranks=None,
+                  processes=1,
+                  out_format='tsv',
+                  cache=None):
+    """
+    This function returns the orthomaps of many query species of one OrthoFinder run.
+
+    The species list lineages, the <Orthogroups.GeneCounts.tsv> count matrix and the query columns of
+    <Orthogroups.tsv> are read only once; each query species is then aged on the shared data with
+    `get_orthomap`. The query species taxIDs are taken from the species list.
+
+    :param seqnames: Sequence names of the query species used for OrthoFinder comparison
+                     or 'all' for all species of the species list.
+    :param sl: Path to species list file containing <OrthoFinder name><tab><species taxID>.
+    :param oc: Path to OrthoFinder result <Orthogroups.GeneCounts.tsv> file.
+    :param og: Path to OrthoFinder result <Orthogroups.tsv> file.
+    :param out: Path to output file; the orthomap of each query species is written next to it as
+                <seqname>.<out basename>.
+    :param quiet: Specify if output should be quiet.
+    :param continuity: Specify if continuity score should be calculated.
+    :param overwrite: Specify if output should be overwritten.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :param ranks: Project the query lineages onto these ranks (see `qlin.QueryLineage.project`).
+    :param processes: Number of worker processes to parse an uncompressed <Orthogroups.tsv> file.
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather' (see `write_orthomap`).
+    :param cache: Directory of the indexed binary cache of <Orthogroups.GeneCounts.tsv> and <Orthogroups.tsv>
+                  (see `get_orthofinder_cache`).
+    :return: Dictionary of query species sequence name to the results of `get_orthomap` such as:
+             orthomap, species_list, youngest_common_counts
+
+    :type seqnames: list or str
+    :type sl: str
+    :type oc: str
+    :type og: str
+    :type out: str
+    :type quiet: bool
+    :type continuity: bool
+    :type overwrite: bool
+    :type ncbi: dict
+    :type dbname: str
+    :type ranks: list or str
+    :type processes: int
+    :type out_format: str
+    :type cache: str
+    :rtype: dict
+
+    Example
+    -------
+    >>> from oggmap import datasets, of2orthomap
+    >>> datasets.ensembl113_last(datapath='.')
+    >>> orthomaps = of2orthomap.get_orthomaps(
+    >>>     seqnames='all',
+    >>>     sl='ensembl_113_orthofinder_last_species_list.tsv',
+    >>>     oc='ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip',
+    >>>     og='ensembl_113_orthofinder_last_Orthogroups.tsv.zip',
+    >>>     out='orthomap.tsv',
+    >>>     dbname='taxadb.sqlite')
+    >>> orthomaps['7955.danio_rerio.pep'][0]
+    """
+    ncbi = qlin.load_taxadb(ncbi=ncbi,
+                            dbname=dbname,
+                            cache=True)
+    species_list = pd.read_csv(sl,
+                               sep='\t',
+                               header=None)
+    species_list.columns = ['species', 'taxID']
+    species_list['lineage'] = qlin.get_lineages(taxids=list(species_list['taxID']),
+                                                ncbi=ncbi)
+    if cache is not None:
+        og_cache = get_orthofinder_cache(oc,
+                                         og,
+                                         cache)
+        gene_counts = read_cached_gene_counts(og_cache)
     else:
-        og_lines = open(og,
-                        'r')
-    og_species = next(og_lines)
-    if type(og_species) == bytes:
-        og_species = og_species.decode('utf-8').strip().split('\t')
+        gene_counts = read_gene_counts(oc)
+    if isinstance(seqnames, str):
+        seqnames = [x for x in species_list.species if x in gene_counts[1]] if seqnames == 'all' else [seqnames]
+    qts = dict(zip(species_list.species, species_list.taxID))
+    for seqname in seqnames:
+        if seqname not in qts or seqname not in gene_counts[1]:
+            print('\nError <-seqname>: query species name %s not in species list and OrthoFinder results, '
+                  'please check spelling' % seqname)
+            sys.exit()
+    # orthogroups containing any of the query species
+    og_query = (gene_counts[2][:, [gene_counts[1].index(x) for x in seqnames]] > 0).any(axis=1)
+    if cache is not None:
+        og_rows = read_cached_orthogroups(og_cache,
+                                          seqnames,
+                                          ogs=set(gene_counts[0][og_query]))
     else:
-        og_species = og_species.strip().split('\t')
-    og_qidx = [x for x, y in enumerate(og_species) if y == seqname]
-    if len(oc_qidx) == 0:
-        print('\nError <-qname>: query species name not in OrthoFinder results, please check spelling\n'
-              'e.g. <head -1 Orthogroups.tsv>')
+        og_rows = read_orthogroups(og,
+                                   seqnames,
+                                   ogs=set(gene_counts[0][og_query]),
+                                   processes=processes)
+    orthomaps = {}
+    for seqname_idx, seqname in enumerate(seqnames):
+        seqname_out = None
+        if out:
+            seqname_out = os.path.join(os.path.dirname(out), seqname + '.' + os.path.basename(out))
+        orthomaps[seqname] = get_orthomap(seqname=seqname,
+                                          qt=str(qts[seqname]),
+                                          sl=species_list,
+                                          oc=gene_counts,
+                                          og=[[x[0], x[seqname_idx + 1]] for x in og_rows],
+                                          out=seqname_out,
+                                          quiet=quiet,
+                                          continuity=continuity,
+                                          overwrite=overwrite,
+                                          ncbi=ncbi,
+                                          ranks=ranks,
+                                          out_format=out_format)
+    return orthomaps
+
+
+def write_orthomap(omap_df,
+                   out,
+                   out_format='tsv'):
+    """
+    This function writes an orthomap at once to a file, either as tab-separated text in blocks of rows or as
+    Parquet or Feather file (requires `pyarrow`), which can be loaded with `orthomap2tei.read_orthomap`.
+
+    :param omap_df: Orthomap.
+    :param out: Path to output file.
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather'.
+
+    :type omap_df: pandas.DataFrame
+    :type out: str
+    :type out_format: str
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> query_orthomap = of2orthomap.get_orthomap(
+    >>>     seqname='7955.danio_rerio.pep',
+    >>>     qt='7955',
+    >>>     sl='ensembl_113_orthofinder_last_species_list.tsv',
+    >>>     oc='ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip',
+    >>>     og='ensembl_113_orthofinder_last_Orthogroups.tsv.zip',
+    >>>     continuity=True,
+    >>>     dbname='taxadb.sqlite')[0]
+    >>> of2orthomap.write_orthomap(omap_df=query_orthomap,
+    >>>                            out='Danio_rerio.orthomap.parquet',
+    >>>                            out_format='parquet')
+    """
+    if out_format == 'tsv':
+        omap_df.to_csv(out,
+                       sep='\t',
+                       index=False,
+                       chunksize=100000)
+    elif out_format == 'parquet':
+        omap_df.to_parquet(out,
+                           index=False)
+    elif out_format == 'feather':
+        omap_df.reset_index(drop=True).to_feather(out)
+    else:
+        print('\nError <-format>: output file format needs to be one of tsv, parquet or feather\n')
         sys.exit()
+
+
+def get_default_out(out,
+                    out_format='tsv'):
+    """
+    This function returns the output file of the command-line tools, which is <orthomap.<out_format>> if no
+    output file is given, so that the file extension matches the output file format.
+
+    :param out: Path to output file or None.
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather'.
+    :return: Path to output file.
+
+    :type out: str
+    :type out_format: str
+    :rtype: str
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> of2orthomap.get_default_out(out=None,
+    >>>                             out_format='parquet')
+    """
+    if out is None:
+        return 'orthomap.' + out_format
+    return out
+
+
+def read_gene_counts(oc):
+    """
+    This function reads an OrthoFinder <Orthogroups.GeneCounts.tsv> file (plain or compressed, see
+    `inputs.open_input`) at once into an int32 count matrix with one row per orthogroup and one column per species.
+
+    :param oc: Path to OrthoFinder result <Orthogroups.GeneCounts.tsv> file.
+    :return: A list of results such as:
+             orthogroup names, species names, count matrix (orthogroups x species, without the 'Total' column)
+
+    :type oc: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> og_names, species, counts = of2orthomap.read_gene_counts(
+    >>>     oc='ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip')
+    >>> counts.shape
+    """
+    oc_lines = inputs.open_input(oc)
+    oc_header = next(oc_lines).decode('utf-8').strip().split('\t')
+    oc_df = pd.read_csv(oc_lines,
+                        sep='\t',
+                        header=None,
+                        dtype={x: str if x == 0 else np.int32 for x in range(len(oc_header))})
+    oc_lines.close()
+    return [oc_df[0].to_numpy(dtype=object),
+            oc_header[1:-1],
+            oc_df.iloc[:, 1:-1].to_numpy(dtype=np.int32)]
+
+
+def read_orthogroups(og,
+                     seqname,
+                     ogs=None,
+                     processes=1):
+    """
+    This function reads the genes of one or more species from an OrthoFinder <Orthogroups.tsv> file
+    (plain or compressed, see `inputs.open_input`).
+
+    Lines are kept as raw bytes: the orthogroup name is located with the first tab and lines of orthogroups
+    not in `ogs` are skipped before decoding. For all other lines only the requested species columns are
+    located with `bytes.find` and decoded.
+    With more than one process, an uncompressed file is split into line-aligned byte ranges
+    (see `get_byte_ranges`) that are parsed by worker processes and collected in file order, while a
+    compressed file is decompressed by an external process if available.
+
+    :param og: Path to OrthoFinder result <Orthogroups.tsv> file.
+    :param seqname: Sequence name of the species used for OrthoFinder comparison or list of them.
+    :param ogs: Orthogroups to read (default: all).
+    :param processes: Number of worker processes.
+    :return: A list of rows such as:
+             [orthogroup, genes of the first species, genes of the second species, ...]
+             with the genes of each species as comma-separated string.
+
+    :type og: str
+    :type seqname: str or list
+    :type ogs: set
+    :type processes: int
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> og_rows = of2orthomap.read_orthogroups(og='ensembl_113_orthofinder_last_Orthogroups.tsv.zip',
+    >>>                                        seqname='7955.danio_rerio.pep',
+    >>>                                        ogs={'OG0000000', 'OG0000001'})
+    """
+    seqnames = [seqname] if isinstance(seqname, str) else list(seqname)
+    og_lines = inputs.open_input(og,
+                                 threads=processes)
+    og_species = next(og_lines).decode('utf-8').strip().split('\t')
+    og_qidx = []
+    for seqname in seqnames:
+        if seqname not in og_species[1:]:
+            og_lines.close()
+            print('\nError <-qname>: query species name not in OrthoFinder results, please check spelling\n'
+                  'e.g. <head -1 Orthogroups.tsv>')
+            sys.exit()
+        og_qidx.append(og_species.index(seqname, 1))
+    if ogs is not None:
+        ogs = set([x.encode('utf-8') for x in ogs])
+    if processes > 1 and inputs.get_compression(og) is None:
+        og_lines.close()
+        with ProcessPoolExecutor(processes) as pool:
+            og_rows = []
+            # results are collected in the order of the byte ranges
+            for og_rows_range in pool.map(_read_orthogroups_range,
+                                          *zip(*[[og, x, y, og_qidx, ogs]
+                                                 for x, y in get_byte_ranges(og, processes * 4)])):
+                og_rows += og_rows_range
+        return og_rows
+    og_rows = _parse_orthogroups_lines(og_lines,
+                                       og_qidx,
+                                       ogs)
+    og_lines.close()
+    return og_rows
+
+
+def _parse_orthogroups_lines(og_lines,
+                             og_qidx,
+                             ogs=None):
+    """
+    A helper function to parse raw <Orthogroups.tsv> lines into rows of orthogroup and genes of the species
+    at the column positions `og_qidx`, skipping orthogroups not in `ogs` before decoding.
+
+    :param og_lines: Lines as bytes.
+    :param og_qidx: Column positions of the species.
+    :param ogs: Orthogroups to read as bytes (default: all).
+    :return: Rows of orthogroup and genes of each species.
+
+    :type og_lines: iterable
+    :type og_qidx: list
+    :type ogs: set
+    :rtype: list
+    """
+    og_cols = sorted(set(og_qidx))
+    og_rows = []
     for og_line in og_lines:
-        if type(og_line) == bytes:
-            og_og = og_line.decode('utf-8').strip().split('\t')
-        else:
-            og_og = og_line.strip().split('\t')
-        if og_og[0] not in oc_og_dict:
+        og_end = og_line.find(b'\t')
+        # blank lines, e.g. at the end of a byte range, are no orthogroups
+        if og_end == -1 and not og_line.strip():
             continue
+        if ogs is not None and og_line[:og_end] not in ogs:
+            continue
+        og_line = og_line.rstrip(b'\r\n')
+        og_fields = {}
+        og_col = 0
+        for og_qcol in og_cols:
+            while og_col < og_qcol and og_end != -1:
+                og_start = og_end + 1
+                og_end = og_line.find(b'\t', og_start)
+                og_col += 1
+            if og_col < og_qcol:
+                og_fields[og_qcol] = ''
+            else:
+                og_fields[og_qcol] = og_line[og_start:len(og_line) if og_end == -1 else og_end].decode('utf-8')
+        og_rows.append([og_line[:og_line.find(b'\t')].decode('utf-8')] + [og_fields[x] for x in og_qidx])
+    return og_rows
+
+
+def _read_orthogroups_range(og,
+                            start,
+                            end,
+                            og_qidx,
+                            ogs=None):
+    """
+    A helper function to parse the <Orthogroups.tsv> lines of one byte range in a worker process
+    (see `get_byte_ranges`).
+
+    :param og: Path to uncompressed OrthoFinder result <Orthogroups.tsv> file.
+    :param start: Start of the byte range.
+    :param end: End of the byte range.
+    :param og_qidx: Column positions of the species.
+    :param ogs: Orthogroups to read as bytes (default: all).
+    :return: Rows of orthogroup and genes of each species.
+
+    :type og: str
+    :type start: int
+    :type end: int
+    :type og_qidx: list
+    :type ogs: set
+    :rtype: list
+    """
+    return _parse_orthogroups_lines(read_byte_range(og, start, end),
+                                    og_qidx,
+                                    ogs)
+
+
+def get_byte_ranges(path,
+                    chunks,
+                    header=True):
+    """
+    This function splits an uncompressed text file into byte ranges that start and end at line boundaries,
+    so that the ranges can be parsed independently by worker processes.
+
+    :param path: Path to uncompressed text file.
+    :param chunks: Number of byte ranges to aim for (less are returned for small files).
+    :param header: Specify if the first line is a header to be excluded.
+    :return: List of (start, end) byte positions.
+
+    :type path: str
+    :type chunks: int
+    :type header: bool
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> of2orthomap.get_byte_ranges(path='Orthogroups.tsv',
+    >>>                             chunks=8)
+    """
+    size = os.path.getsize(path)
+    with open(path,
+              'rb') as handle:
+        if header:
+            handle.readline()
+        bounds = [handle.tell()]
+        for chunk in range(1, chunks):
+            handle.seek(max(bounds[0] + (size - bounds[0]) * chunk // chunks - 1, bounds[-1]))
+            handle.readline()
+            if bounds[-1] < handle.tell() < size:
+                bounds.append(handle.tell())
+    bounds.append(size)
+    return [(x, y) for x, y in zip(bounds[:-1], bounds[1:]) if x < y]
+
+
+def read_byte_range(path,
+                    start,
+                    end):
+    """
+    This function returns the lines of a byte range of a file as bytes (see `get_byte_ranges`).
+
+    :param path: Path to uncompressed text file.
+    :param start: Start of the byte range.
+    :param end: End of the byte range.
+    :return: Lines as bytes.
+
+    :type path: str
+    :type start: int
+    :type end: int
+    :rtype: list
+    """
+    with open(path,
+              'rb') as handle:
+        handle.seek(start)
+        return handle.read(end - start).splitlines()
+
+
+def get_orthofinder_cache(oc,
+                          og,
+                          cache):
+    """
+    This function returns the path of an indexed binary cache of an OrthoFinder run, which is created on first
+    use in a sub-directory of `cache` named by the stamps of the <Orthogroups.GeneCounts.tsv> and
+    <Orthogroups.tsv> files (see `inputs.get_file_stamp`).
+
+    The cache contains the orthogroup x species count matrix in column-major order as <oc_counts.npy>, and the
+    genes of all orthogroups stored per species as one byte blob <og_genes.npy> with offsets <og_offsets.npy>,
+    so that the counts and the genes of one species are each a contiguous part of their file. All arrays can be
+    memory-mapped (see `read_cached_gene_counts` and `read_cached_orthogroups`). <Orthogroups.tsv> is read
+    twice, first to get the offsets and then to write the genes into the memory-mapped blob, so that it is
+    never held in memory.
+
+    :param oc: Path to OrthoFinder result <Orthogroups.GeneCounts.tsv> file.
+    :param og: Path to OrthoFinder result <Orthogroups.tsv> file.
+    :param cache: Cache directory.
+    :return: Path to the cache of this OrthoFinder run.
+
+    :type oc: str
+    :type og: str
+    :type cache: str
+    :rtype: str
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> og_cache = of2orthomap.get_orthofinder_cache(
+    >>>     oc='ensembl_113_orthofinder_last_Orthogroups.GeneCount.tsv.zip',
+    >>>     og='ensembl_113_orthofinder_last_Orthogroups.tsv.zip',
+    >>>     cache='oggmap_cache')
+    """
+    cache_key = hashlib.sha256((inputs.get_file_stamp(oc) + inputs.get_file_stamp(og)).encode('utf-8')).hexdigest()
+    cache_path = os.path.join(cache, cache_key[:32])
+    if os.path.exists(cache_path):
+        return cache_path
+    os.makedirs(cache,
+                exist_ok=True)
+    # the cache is written to a temporary directory first, so that an interrupted run leaves no partial cache
+    cache_tmp = tempfile.mkdtemp(dir=cache)
+    oc_names, oc_species, oc_counts = read_gene_counts(oc)
+    np.save(os.path.join(cache_tmp, 'oc_names.npy'), oc_names.astype(str))
+    np.save(os.path.join(cache_tmp, 'oc_species.npy'), np.array(oc_species, dtype=str))
+    # column-major, so that the counts of one species are contiguous
+    np.save(os.path.join(cache_tmp, 'oc_counts.npy'), np.asfortranarray(oc_counts))
+    og_names = []
+    og_lengths = []
+    with inputs.open_input(og) as og_lines:
+        og_species = next(og_lines).decode('utf-8').strip().split('\t')[1:]
+        for og_line in og_lines:
+            og_fields = og_line.rstrip(b'\r\n').split(b'\t')
+            og_names.append(og_fields[0].decode('utf-8'))
+            og_line_lengths = np.zeros(len(og_species), dtype=np.int64)
+            og_line_lengths[:len(og_fields) - 1] = [len(x) for x in og_fields[1:len(og_species) + 1]]
+            og_lengths.append(og_line_lengths)
+    # offsets of the genes of each orthogroup, with all orthogroups of one species in a row
+    og_lengths = np.array(og_lengths, dtype=np.int64).reshape(len(og_names), len(og_species))
+    og_offsets = np.zeros(len(og_species) * len(og_names) + 1, dtype=np.int64)
+    np.cumsum(og_lengths.transpose().ravel(), out=og_offsets[1:])
+    np.save(os.path.join(cache_tmp, 'og_names.npy'), np.array(og_names, dtype=str))
+    np.save(os.path.join(cache_tmp, 'og_species.npy'), np.array(og_species, dtype=str))
+    np.save(os.path.join(cache_tmp, 'og_offsets.npy'), og_offsets)
+    og_genes = np.lib.format.open_memmap(os.path.join(cache_tmp, 'og_genes.npy'),
+                                         mode='w+',
+                                         dtype=np.uint8,
+                                         shape=(int(og_offsets[-1]),))
+    with inputs.open_input(og) as og_lines:
+        next(og_lines)
+        for og_idx, og_line in enumerate(og_lines):
+            og_fields = og_line.rstrip(b'\r\n').split(b'\t')
+            for og_sidx, og_species_genes in enumerate(og_fields[1:len(og_species) + 1]):
+                if og_species_genes:
+                    og_start = og_offsets[og_sidx * len(og_names) + og_idx]
+                    og_genes[og_start:og_start + len(og_species_genes)] = np.frombuffer(og_species_genes,
+                                                                                       dtype=np.uint8)
+    og_genes.flush()
+    del og_genes
+    try:
+        os.rename(cache_tmp, cache_path)
+    except OSError:
+        # another process created the same cache in the meantime
+        shutil.rmtree(cache_tmp)
+    return cache_path
+
+
+def read_cached_gene_counts(og_cache):
+    """
+    This function reads the <Orthogroups.GeneCounts.tsv> part of an OrthoFinder cache (see
+    `get_orthofinder_cache`) with the count matrix memory-mapped.
+
+    :param og_cache: Path to the cache of an OrthoFinder run.
+    :return: A list of results such as (see `read_gene_counts`):
+             orthogroup names, species names, count matrix (orthogroups x species, without the 'Total' column)
+
+    :type og_cache: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> og_names, species, counts = of2orthomap.read_cached_gene_counts(og_cache=og_cache)
+    """
+    return [np.load(os.path.join(og_cache, 'oc_names.npy')).astype(object),
+            np.load(os.path.join(og_cache, 'oc_species.npy')).tolist(),
+            np.load(os.path.join(og_cache, 'oc_counts.npy'),
+                    mmap_mode='r')]
+
+
+def read_cached_orthogroups(og_cache,
+                            seqname,
+                            ogs=None):
+    """
+    This function reads the genes of one or more species from the <Orthogroups.tsv> part of an OrthoFinder cache
+    (see `get_orthofinder_cache`). Only the offsets and the part of the memory-mapped byte blob of the requested
+    species are read.
+
+    :param og_cache: Path to the cache of an OrthoFinder run.
+    :param seqname: Sequence name of the species used for OrthoFinder comparison or list of them.
+    :param ogs: Orthogroups to read (default: all).
+    :return: A list of rows such as (see `read_orthogroups`):
+             [orthogroup, genes of the first species, genes of the second species, ...]
+             with the genes of each species as comma-separated string.
+
+    :type og_cache: str
+    :type seqname: str or list
+    :type ogs: set
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap
+    >>> og_rows = of2orthomap.read_cached_orthogroups(og_cache=og_cache,
+    >>>                                               seqname='7955.danio_rerio.pep',
+    >>>                                               ogs={'OG0000000', 'OG0000001'})
+    """
+    seqnames = [seqname] if isinstance(seqname, str) else list(seqname)
+    og_species = np.load(os.path.join(og_cache, 'og_species.npy')).tolist()
+    for seqname in seqnames:
+        if seqname not in og_species:
+            print('\nError <-qname>: query species name not in OrthoFinder results, please check spelling\n'
+                  'e.g. <head -1 Orthogroups.tsv>')
+            sys.exit()
+    og_names = np.load(os.path.join(og_cache, 'og_names.npy'))
+    og_offsets = np.load(os.path.join(og_cache, 'og_offsets.npy'),
+                         mmap_mode='r')
+    og_genes = np.load(os.path.join(og_cache, 'og_genes.npy'),
+                       mmap_mode='r')
+    og_idx = np.arange(len(og_names)) if ogs is None else np.flatnonzero(np.isin(og_names, list(ogs)))
+    og_rows = [[x] for x in og_names[og_idx].tolist()]
+    for seqname in seqnames:
+        og_sidx = og_species.index(seqname)
+        og_species_offsets = np.array(og_offsets[og_sidx * len(og_names):(og_sidx + 1) * len(og_names) + 1])
+        og_species_genes = og_genes[og_species_offsets[0]:og_species_offsets[-1]].tobytes()
+        og_species_offsets -= og_species_offsets[0]
+        for og_row, x in zip(og_rows, og_idx.tolist()):
+            og_row.append(og_species_genes[og_species_offsets[x]:og_species_offsets[x + 1]].decode('utf-8'))
+    return og_rows
+
+
+def get_previous_ps(previous,
+                    changed,
+                    qlineage,
+                    species_list):
+    """
+    This function returns the phylostratum assignments of a previous orthomap that remain valid after a
+    taxonomy update, together with the species whose lineage changed. Continuity scores are not reused, since
+    they depend on the phylostrata occupied by the whole species list.
+
+    If the query lineage contains a changed taxID, nothing can be reused. For target species, only changes of
+    their lineage ('lineage'), merged and deleted taxIDs count, since renamed ancestors do not change their
+    youngest common node.
+
+    :param previous: Orthomap of a previous run as DataFrame or path to its output file.
+    :param changed: Changed taxIDs as DataFrame returned by `qlin.diff_taxonomy`, path to its output file
+                    or list of taxIDs.
+    :param qlineage: Query lineage information.
+    :param species_list: Species list with the columns 'species' and 'taxID'.
+    :return: A list of results such as:
+             dictionary of orthogroup to [PSnum, PStaxID, PSname], set of affected species
+
+    :type previous: pandas.DataFrame or str
+    :type changed: pandas.DataFrame or str or list
+    :type qlineage: list
+    :type species_list: pandas.DataFrame
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import of2orthomap, qlin
+    >>> changed = qlin.diff_taxonomy(old_dbname='taxadb.old.sqlite',
+    >>>                              new_dbname='taxadb.sqlite')
+    >>> previous_ps, affected_species = of2orthomap.get_previous_ps(previous='orthomap.tsv',
+    >>>                                                             changed=changed,
+    >>>                                                             qlineage=qlineage,
+    >>>                                                             species_list=species_list)
+    """
+    if previous is None or changed is None:
+        return [{}, set()]
+    if isinstance(previous, str):
+        previous = inputs.read_table(previous)
+    if isinstance(changed, str):
+        changed = pd.read_csv(changed,
+                              sep='\t')
+    if isinstance(changed, pd.DataFrame):
+        changed_taxids = set(changed['taxID'])
+        if 'change' in changed.columns:
+            changed_target_taxids = set(changed['taxID'][~changed['change'].isin(['renamed', 'new'])])
         else:
-            og_ps = qlineagenames[qlineagenames['PStaxID'] ==
-                                  str(oc_og_dict[og_og[0]])].values.tolist()[0]
-            og_ps_join = '\t'.join(og_ps)
-            if continuity:
-                og_continuity_score = get_continuity_score(og_name=og_og[0],
-                                                           youngest_common_counts_df=youngest_common_counts_df)
-            if out:
-                if continuity:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_og[0] + '\t' + og_ps_join + '\t' +
-                                     str(og_continuity_score) + '\n') for x in og_og[og_qidx[0]].split(',')]
-                else:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_og[0] + '\t' + og_ps_join + '\n')
-                     for x in og_og[og_qidx[0]].split(',')]
-        if continuity:
-            omap += [[x.replace(' ', ''), og_og[0], og_ps[0], og_ps[1], og_ps[2], og_continuity_score]
-                     for x in og_og[og_qidx[0]].split(',')]
-        else:
-            omap += [[x.replace(' ', ''), og_og[0], og_ps[0], og_ps[1], og_ps[2]]
-                     for x in og_og[og_qidx[0]].split(',')]
-    og_lines.close()
-    if out:
-        outhandle.close()
-    omap_df = pd.DataFrame(omap)
-    if continuity:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname',
-                           'PScontinuity']
+            changed_target_taxids = changed_taxids
     else:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname']
-    omap_df['PSnum'] = [int(x) for x in list(omap_df['PSnum'])]
-    return [omap_df,
-            species_list,
-            youngest_common_counts_df]
+        changed_taxids = set([int(x) for x in changed])
+        changed_target_taxids = changed_taxids
+    if not changed_taxids.isdisjoint(qlineage):
+        return [{}, set()]
+    affected_species = set(species_list['species'][species_list['taxID'].isin(changed_target_taxids)])
+    previous_ps = previous.drop_duplicates('Orthogroup').set_index('Orthogroup')[['PSnum', 'PStaxID', 'PSname']]
+    previous_ps = {x: [str(y[0]), str(y[1]), str(y[2])]
+                   for x, y in zip(previous_ps.index, previous_ps.values.tolist())}
+    return [previous_ps,
+            affected_species]
 
 
 def get_counts_per_ps(omap_df,
@@ -363,35 +1051,10 @@ def get_counts_per_ps(omap_df,
     return counts_df
 
 
-def get_youngest_common_counts(qlineage,
-                               species_list):
-    """
-    This function return LCA counts for a given query species lineage.
-
-    :param qlineage: Query lineage information.
-    :param species_list: Species list.
-    :return: DataFrame with LCA counts.
-
-    :type qlineage: list
-    :type species_list: pandas.DataFrame
-    :rtype: pandas.DataFrame
-
-    Example
-    -------
-    >>>
-    """
-    counts_df = pd.DataFrame(qlineage,
-                             columns=['lineage'])
-    counts_df.set_index('lineage',
-                        inplace=True)
-    counts_df = pd.concat([counts_df,
-                          species_list['youngest_common'].value_counts()],
-                          join='outer',
-                          axis=1)
-    counts_df.columns = ['counts']
-    counts_df['PStaxID'] = counts_df.index.values
-    counts_df['PSnum'] = list(range(len(counts_df['PStaxID'])))
-    return counts_df
+# the vectorized aging helpers live in `aging`, the shared engine of all front ends
+get_youngest_common_counts = aging.get_youngest_common_counts
+get_continuity_matrix = aging.get_continuity_matrix
+get_continuity_scores = aging.get_continuity_scores
 
 
 def get_continuity_score(og_name,
@@ -437,7 +1100,7 @@ def main():
         parser.print_help()
         print('\nError <-seqname>: Please specify query species name in OrthoFinder and taxID')
         sys.exit()
-    if not args.qt:
+    if not args.qt and args.seqname != 'all':
         parser.print_help()
         print('\nError <-qt>: Please specify query species taxID')
         sys.exit()
@@ -453,16 +1116,37 @@ def main():
         parser.print_help()
         print('\nError <-og>: Please specify OrthoFinder <Orthogroups.tsv> (see Orthogroups directory)')
         sys.exit()
+    if args.seqname == 'all':
+        get_orthomaps(seqnames=args.seqname,
+                      sl=args.sl,
+                      oc=args.oc,
+                      og=args.og,
+                      out=get_default_out(args.out, args.format),
+                      quiet=True,
+                      continuity=True,
+                      overwrite=args.overwrite,
+                      dbname=args.dbname,
+                      ranks=args.ranks,
+                      processes=args.processes,
+                      out_format=args.format,
+                      cache=args.cache)
+        sys.exit()
     get_orthomap(seqname=args.seqname,
                  qt=args.qt,
                  sl=args.sl,
                  oc=args.oc,
                  og=args.og,
-                 out=args.out,
+                 out=get_default_out(args.out, args.format),
                  quiet=False,
                  continuity=True,
                  overwrite=args.overwrite,
-                 dbname=args.dbname)
+                 dbname=args.dbname,
+                 ranks=args.ranks,
+                 previous=args.previous,
+                 changed=args.changed,
+                 processes=args.processes,
+                 out_format=args.format,
+                 cache=args.cache)
 
 
 if __name__ == '__main__':
@@ -15,11 +15,14 @@ import scanpy as sc
 import seaborn as sns
 from alive_progress import alive_bar
 from statannotations.Annotator import Annotator
+from oggmap import inputs
 
 
 def read_orthomap(orthomapfile):
     """
     This function reads a pre-calculated orthomap file <GeneID><tab><Phylostratum>.
+    Orthomaps written as Parquet or Feather file (see `of2orthomap.write_orthomap`) are detected and loaded
+    column-wise via Arrow without parsing text.
 
     :param orthomapfile: File name of pre-calculated orthomap file.
     :return: Orthomap.
@@ -39,8 +42,8 @@ def read_orthomap(orthomapfile):
     """
     orthomap = None
     if os.path.exists(orthomapfile):
-        orthomap = pd.read_csv(orthomapfile,
-                               delimiter='\t')
+        orthomap = inputs.read_table(orthomapfile,
+                                     sep='\t')
     return orthomap
 
 
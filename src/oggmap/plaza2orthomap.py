@@ -14,7 +14,7 @@ import sys
 import argparse
 import pandas as pd
 import numpy as np
-from oggmap import of2orthomap, qlin
+from oggmap import aging, inputs, of2orthomap, qlin
 
 
 def define_parser():
@@ -75,12 +75,18 @@ def add_argparse_args(parser: argparse.ArgumentParser):
                         help='specify PLAZA gene family file <genefamily_data.ORTHOFAM.csv> or '
                              'genefamily_data.HOMFAM.csv')
     parser.add_argument('-out',
-                        help='specify output file <orthomap.tsv> (default: orthomap.tsv)',
-                        default='orthomap.tsv')
+                        help='specify output file <orthomap.tsv> (default: orthomap.<-format>)')
     parser.add_argument('-overwrite',
                         help='specify if existing output file should be overwritten (default: True)',
                         default=True,
                         type=bool)
+    parser.add_argument('-ranks',
+                        help='project query lineage onto a comma-separated rank set, '
+                             'e.g. phylum,class,order,family,genus')
+    parser.add_argument('-format',
+                        help='specify output file format (default: tsv)',
+                        choices=['tsv', 'parquet', 'feather'],
+                        default='tsv')
     parser.add_argument('-dbname',
                         help='taxadb.sqlite file')
 
@@ -113,7 +119,10 @@ def get_plaza_orthomap(qt,
                        continuity=True,
                        overwrite=True,
                        ncbi=None,
-                       dbname=None):
+                       dbname=None,
+                       query_lineage=None,
+                       ranks=None,
+                       out_format='tsv'):
     """
     This function return an orthomap for a given query species and PLAZA gene family data.
 
@@ -126,6 +135,11 @@ def get_plaza_orthomap(qt,
     :param overwrite: Specify if output should be overwritten.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
+    :param query_lineage: Precomputed query lineage (see `qlin.get_query_lineage`) to be used instead of
+                          querying the lineage of the query species again.
+    :param ranks: Project the query lineage onto these ranks, e.g. ['phylum', 'class', 'order', 'family', 'genus']
+                  (see `qlin.QueryLineage.project`).
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather' (see `of2orthomap.write_orthomap`).
     :return: A list of results such as:
              orthomap, species_list, youngest_common_counts
 
@@ -138,16 +152,24 @@ def get_plaza_orthomap(qt,
     :type overwrite: bool
     :type ncbi: dict
     :type dbname: str
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type ranks: list or str
+    :type out_format: str
     :rtype: list
 
     Example
     -------
     >>>
     """
-    outhandle = None
-    og_continuity_score = None
     ncbi = qlin.load_taxadb(ncbi=ncbi,
-                            dbname=dbname)
+                            dbname=dbname,
+                            cache=True)
+    if query_lineage is None:
+        query_lineage = qlin.get_query_lineage(qt=qt,
+                                               quiet=True,
+                                               ncbi=ncbi)
+    if ranks is not None:
+        query_lineage = query_lineage.project(ranks)
     qname,\
         qtid,\
         qlineage,\
@@ -155,11 +177,7 @@ def get_plaza_orthomap(qt,
         qlineagezip,\
         qlineagenames,\
         qlineagerev,\
-        qk = qlin.get_qlin(qt=qt,
-                           quiet=True,
-                           ncbi=ncbi)
-    query_lineage_topo = qlin.get_lineage_topo(qt=qt,
-                                               ncbi=ncbi)
+        qk = query_lineage.to_list()
     species_list = pd.read_csv(sl,
                                sep='\t',
                                header=None,
@@ -169,10 +187,11 @@ def get_plaza_orthomap(qt,
     if len(qt_species) == 0:
         print('\nError <-qt>: query species taxID not in PLAZA results, please check taxID.')
         sys.exit()
-    ogs = pd.DataFrame(pd.read_csv(og,
-                                   sep='\t',
-                                   header=None,
-                                   comment='#'))
+    with inputs.open_input(og) as og_handle:
+        ogs = pd.DataFrame(pd.read_csv(og_handle,
+                                       sep='\t',
+                                       header=None,
+                                       comment='#'))
     ogs.columns = ['gf_id', 'species', 'gene_id']
     ogs_grouped = ogs.groupby('gf_id')['species'].apply(set).apply(list).apply(_get_species_tax_id,
                                                                                species_list=species_list)
@@ -181,109 +200,38 @@ def get_plaza_orthomap(qt,
     ogs_qt_red = ogs_qt[ogs_qt['species'].isin(qt_species)]
     ogs_qt_red_grouped = ogs_qt_red.groupby('gf_id')['gene_id'].apply(list)
     ogs_grouped_qt['gene_id'] = ogs_qt_red_grouped
-    ogs_grouped_qt_species = np.sort(list(set([x[0] for x in ogs_grouped_qt['species'].to_dict().values()])))
-    ogs_grouped_qt_species_names = [qlin.get_qlin(qt=x,
-                                                  quiet=True,
-                                                  ncbi=ncbi)[0] for x in ogs_grouped_qt_species]
+    ogs_grouped_qt_species = np.sort(list(set([x for og_species in ogs_grouped_qt['species'] for x in og_species])))
+    ogs_grouped_qt_species_names = qlin.translate_taxids(taxids=list(ogs_grouped_qt_species),
+                                                         ncbi=ncbi)
+    ogs_grouped_qt_species_names = [ogs_grouped_qt_species_names[int(x)] for x in ogs_grouped_qt_species]
     species_list_df = pd.DataFrame(ogs_grouped_qt_species_names,
                                    columns=['species'])
     species_list_df['taxID'] = ogs_grouped_qt_species
-    species_list_df['lineage'] = species_list_df.apply(lambda x: qlin.ncbi_get_lineage(qt=x.iloc[1],
-                                                                                       ncbi=ncbi),
-                                                       axis=1)
-    species_list_df['youngest_common'] = [qlin.get_youngest_common(qlineage,
-                                                                   x) for x in species_list_df.lineage]
-    species_list_df['youngest_name'] = [list(x.values())[0] for x in [qlin.ncbi_get_taxid_translator(qt_vec=[x],
-                                                                                                     ncbi=ncbi)
-                                                                      for x in list(species_list_df.youngest_common)]]
+    species_list_df = aging.add_youngest_common(query_lineage,
+                                                species_list_df,
+                                                ncbi=ncbi)
     if not quiet:
         print(qname)
         print(qt)
         print(species_list_df)
-    youngest_common_counts_df = of2orthomap.get_youngest_common_counts(qlineage,
-                                                                       species_list_df)
-    for node in qlin.traverse_postorder(query_lineage_topo.root):
-        if node.name:
-            nsplit = node.name.split('/')
-            if len(nsplit) == 3:
-                node.species_count = list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-                    [int(nsplit[1])])].counts)[0]
-    #for node in query_lineage_topo.traverse('postorder'):
-    #    nsplit = node.name.split('/')
-    #    if len(nsplit) == 3:
-    #        node.add_feature('species_count',
-    #                         list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-    #                             [int(nsplit[1])])].counts)[0])
-    og_dict = {}
-    continuity_dict = {}
-    for og in ogs_grouped_qt.index:
-        og_hits = np.sort(
-            list(set(list(ogs_grouped_qt[ogs_grouped_qt.index.isin([og])]['species'].to_dict().values())[0])))
-        # get list of the youngest common between query and all other species
-        og_hits_youngest_common = list(species_list_df.youngest_common[
-                                           [x for x, y in enumerate(species_list_df.taxID)
-                                            if y in og_hits]])
-        # evaluate all youngest common nodes to retain the oldest of them and assign as the orthogroup
-        # ancestral state (gene age)
-        if len(og_hits_youngest_common) > 0:
-            og_oldest_common = qlin.get_oldest_common(qlineage,
-                                                      og_hits_youngest_common)
-            og_dict[og] = og_oldest_common
-            if continuity:
-                continuity_dict[og] = \
-                    of2orthomap.get_youngest_common_counts(qlineage,
-                                                           pd.DataFrame(og_hits_youngest_common,
-                                                                        columns=['youngest_common'])).counts
-    if continuity:
-        youngest_common_counts_df = youngest_common_counts_df.join(pd.DataFrame.from_dict(continuity_dict))
-    omap = []
     if out:
         if os.path.exists(out) and not overwrite:
             print('\nError <-overwrite>: output file exists, please set to True if it should be overwritten\n')
             sys.exit()
-        outhandle = open(out, 'w')
-        if continuity:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\tPScontinuity\n')
-        else:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\n')
-    for og in ogs_grouped_qt.index:
-        og_tmp = ogs_grouped_qt[ogs_grouped_qt.index.isin([og])]
-        og_ps = qlineagenames[qlineagenames['PStaxID'] ==
-                              str(og_dict[og])].values.tolist()[0]
-        og_ps_join = '\t'.join(og_ps)
-        if continuity:
-            og_continuity_score = of2orthomap.get_continuity_score(og,
-                                                                   youngest_common_counts_df)
-            if out:
-                if continuity:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og + '\t' + og_ps_join + '\t' +
-                                     str(og_continuity_score) + '\n') for x in list(og_tmp['gene_id'])[0]]
-                else:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og + '\t' + og_ps_join + '\n')
-                     for x in list(og_tmp['gene_id'])[0]]
-        if continuity:
-            omap += [[x.replace(' ', ''), og, og_ps[0], og_ps[1], og_ps[2], og_continuity_score]
-                     for x in list(og_tmp['gene_id'])[0]]
-        else:
-            omap += [[x.replace(' ', ''), og, og_ps[0], og_ps[1], og_ps[2]]
-                     for x in list(og_tmp['gene_id'])[0]]
+    og_names = list(ogs_grouped_qt.index)
+    og_presence = aging.get_presence_matrix(og_species=list(ogs_grouped_qt['species']),
+                                            species=list(species_list_df.taxID))
+    og_genes = [[x.replace(' ', '') for x in og_gene_ids] for og_gene_ids in ogs_grouped_qt['gene_id']]
+    omap_df, youngest_common_counts_df = aging.get_orthomap(query_lineage=query_lineage,
+                                                            species_list=species_list_df,
+                                                            og_names=og_names,
+                                                            presence=og_presence,
+                                                            og_genes=og_genes,
+                                                            continuity=continuity)
     if out:
-        outhandle.close()
-    omap_df = pd.DataFrame(omap)
-    if continuity:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname',
-                           'PScontinuity']
-    else:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname']
-    omap_df['PSnum'] = [int(x) for x in list(omap_df['PSnum'])]
+        of2orthomap.write_orthomap(omap_df,
+                                   out,
+                                   out_format=out_format)
     return [omap_df,
             species_list_df,
             youngest_common_counts_df]
@@ -315,9 +263,11 @@ def main():
     get_plaza_orthomap(qt=args.qt,
                        sl=args.sl,
                        og=args.og,
-                       out=args.out,
+                       out=of2orthomap.get_default_out(args.out, args.format),
                        overwrite=args.overwrite,
-                       dbname=args.dbname)
+                       dbname=args.dbname,
+                       ranks=args.ranks,
+                       out_format=args.format)
 
 
 if __name__ == '__main__':
@@ -12,12 +12,18 @@ License: GPL-3
 
 import os
 import sys
+import json
+import time
+import sqlite3
 import argparse
+import threading
+from urllib.parse import quote
+import numpy as np
 import pandas as pd
 from taxadb2.taxid import TaxID
 from taxadb2.names import SciName
+from peewee import OperationalError
 from Bio import Phylo
-from io import StringIO
 
 
 def define_parser():
@@ -38,6 +44,19 @@ def define_parser():
     # using query species name
     $ qlin -q "Mus musculus" \\
       -dbname taxadb.sqlite
+
+    # major ranks only
+    $ qlin -qt 10090 \\
+      -ranks phylum,class,order,family,genus \\
+      -dbname taxadb.sqlite
+
+    # batch mode: resolve many taxIDs or names (one per line) and
+    # add the LCA with Mus musculus as phylostratum
+    $ qlin -i species.txt \\
+      -lca 10090 \\
+      -format jsonl \\
+      -out species.lineages.jsonl \\
+      -dbname taxadb.sqlite
     '''
     parser = argparse.ArgumentParser(
         prog='qlin',
@@ -61,9 +80,22 @@ def add_argparse_args(parser: argparse.ArgumentParser):
                         help='query species name')
     parser.add_argument('-qt',
                         help='query species taxID')
+    parser.add_argument('-i',
+                        help='batch mode: file with one species name or taxID per line (use - for stdin)')
+    parser.add_argument('-out',
+                        help='batch mode: specify output file (default: stdout)')
+    parser.add_argument('-format',
+                        help='batch mode: specify output format (default: tsv)',
+                        choices=['tsv', 'jsonl'],
+                        default='tsv')
+    parser.add_argument('-lca',
+                        help='batch mode: reference species taxID to add the LCA of each query as phylostratum')
+    parser.add_argument('-ranks',
+                        help='project lineages onto a comma-separated rank set, e.g. phylum,class,order,family,genus')
     parser.add_argument('-dbname',
                         help='taxadb.sqlite file')
 
+
 def traverse_postorder(clade):
     """
     Yield each clade (node) in a post-order traversal (children before parent)
@@ -78,27 +110,857 @@ def traverse_postorder(clade):
     yield clade
 
 
-def load_taxadb(ncbi, dbname):
+def _get_depth(parent,
+               root=1):
+    """
+    A helper function to get the depth (number of edges to the root node) of every taxID
+    from a parent array by pointer jumping.
+
+    :param parent: Parent taxID array indexed by taxID (-1 for unknown taxIDs).
+    :param root: Root taxID.
+    :return: Depth array indexed by taxID (-1 for unknown taxIDs).
+
+    :type parent: numpy.ndarray
+    :type root: int
+    :rtype: numpy.ndarray
+    """
+    valid = parent >= 0
+    nodes = np.arange(len(parent))
+    ancestor = np.where(valid, parent, root)
+    ancestor[root] = root
+    depth = (valid & (nodes != root)).astype(np.int32)
+    while np.any(ancestor[valid] != root):
+        depth = depth + depth[ancestor]
+        ancestor = ancestor[ancestor]
+    return np.where(valid, depth, -1).astype(np.int16)
+
+
+class TaxonomySnapshot:
+    """
+    An in-memory copy of the taxa table of a taxadb.sqlite file.
+
+    The parent taxID, rank and scientific name of every node are loaded once into NumPy arrays that are
+    indexed by taxID, so that lineage walks become pure array lookups instead of one SQLite query per node.
+    A snapshot can be used everywhere the `ncbi` dictionary returned by `load_taxadb` is accepted,
+    since both `ncbi['taxid']` and `ncbi['names']` return the snapshot itself.
+
+    A snapshot can be saved as a directory of NumPy arrays with `save` (see `ncbitax.add_binary_taxonomy`)
+    and opened again with `load`, which memory-maps the arrays instead of reading the SQLite file.
+
+    :param dbname: Path to taxadb.sqlite file.
+
+    :type dbname: str
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> ncbi = qlin.TaxonomySnapshot(dbname='taxadb.sqlite')
+    >>> qlin.get_qlin(qt='10090',
+    >>>               ncbi=ncbi)
+    """
+
+    root = 1
+
+    def __init__(self, dbname):
+        if not os.path.exists(dbname):
+            raise FileNotFoundError(f"Database file '{dbname}' not found.")
+        self.dbname = dbname
+        con = sqlite3.connect(dbname)
+        try:
+            nodes = np.fromiter(con.execute('SELECT ncbi_taxid, parent_taxid FROM taxa ORDER BY ncbi_taxid'),
+                                dtype=np.dtype((np.int64, 2)))
+            levels = [x[0] for x in con.execute('SELECT lineage_level FROM taxa ORDER BY ncbi_taxid')]
+            names = [x[0].encode('utf-8') for x in con.execute('SELECT tax_name FROM taxa ORDER BY ncbi_taxid')]
+            try:
+                synonyms = con.execute('SELECT tax_name, taxid FROM synonym ORDER BY taxid').fetchall()
+            except sqlite3.OperationalError:
+                synonyms = []
+            merged = []
+            for table in ['SELECT old_taxid, new_taxid FROM deprecatedtaxid',
+                          'SELECT taxid, NULL FROM deletedtaxid']:
+                try:
+                    merged += con.execute(table).fetchall()
+                except sqlite3.OperationalError:
+                    pass
+        finally:
+            con.close()
+        taxids = nodes[:, 0]
+        size = int(taxids.max()) + 1 if len(taxids) > 0 else 1
+        self.parent = np.full(size, -1, dtype=np.int32)
+        self.parent[taxids] = nodes[:, 1]
+        self.rank_names, rank_codes = np.unique(np.array(levels, dtype=object), return_inverse=True)
+        self.rank_names = [str(x) for x in self.rank_names]
+        self.rank = np.zeros(size, dtype=np.uint8)
+        self.rank[taxids] = rank_codes
+        name_len = np.zeros(size, dtype=np.int64)
+        name_len[taxids] = [len(x) for x in names]
+        self.name_offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(name_len, out=self.name_offsets[1:])
+        self.name_blob = b''.join(names)
+        self.merged = {int(old): None if new is None else int(new) for old, new in merged}
+        self.synonyms = {}
+        for synonym, taxid in synonyms:
+            self.synonyms.setdefault(_normalize_name(synonym).lower(), int(taxid))
+        self.depth = _get_depth(self.parent, self.root)
+        self.stamp = _db_stamp(dbname)
+        self._synonyms_path = None
+        self._name_index = None
+        self._name_index_nocase = None
+
+    def save(self, path):
+        """
+        This function saves the snapshot as a directory of uncompressed NumPy arrays (parent, rank, depth,
+        name offsets, name blob, merged taxIDs) together with a JSON file holding the rank names,
+        the synonyms and the build stamp of the taxadb.sqlite file.
+
+        :param path: Output directory.
+
+        :type path: str
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'parent.npy'), self.parent)
+        np.save(os.path.join(path, 'rank.npy'), self.rank)
+        np.save(os.path.join(path, 'depth.npy'), self.depth)
+        np.save(os.path.join(path, 'name_offsets.npy'), self.name_offsets)
+        np.save(os.path.join(path, 'name_blob.npy'), np.frombuffer(self.name_blob, dtype=np.uint8))
+        np.save(os.path.join(path, 'merged.npy'),
+                np.array([(x, -1 if y is None else y) for x, y in self.merged.items()],
+                         dtype=np.int64).reshape(-1, 2))
+        with open(os.path.join(path, 'synonyms.json'), 'w') as handle:
+            json.dump(self.synonyms, handle)
+        # written last, so that an interrupted save is never mistaken for a complete one
+        with open(os.path.join(path, 'taxonomy.json'), 'w') as handle:
+            json.dump({'dbname': os.path.abspath(self.dbname),
+                       'stamp': self.stamp,
+                       'rank_names': self.rank_names}, handle)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        This function opens a snapshot that was saved with `save`. By default the arrays are
+        memory-mapped, so that processes using the same snapshot share one page-cached copy.
+
+        :param path: Input directory.
+        :param mmap_mode: Memory-map mode passed to `numpy.load` (None to read the arrays into memory).
+        :return: Taxonomy snapshot.
+
+        :type path: str
+        :type mmap_mode: str
+        :rtype: TaxonomySnapshot
+        """
+        with open(os.path.join(path, 'taxonomy.json'), 'r') as handle:
+            meta = json.load(handle)
+        snapshot = cls.__new__(cls)
+        snapshot.dbname = meta['dbname']
+        snapshot.stamp = meta['stamp']
+        snapshot.rank_names = meta['rank_names']
+        snapshot.parent = np.load(os.path.join(path, 'parent.npy'), mmap_mode=mmap_mode)
+        snapshot.rank = np.load(os.path.join(path, 'rank.npy'), mmap_mode=mmap_mode)
+        snapshot.depth = np.load(os.path.join(path, 'depth.npy'), mmap_mode=mmap_mode)
+        snapshot.name_offsets = np.load(os.path.join(path, 'name_offsets.npy'), mmap_mode=mmap_mode)
+        snapshot.name_blob = np.load(os.path.join(path, 'name_blob.npy'), mmap_mode=mmap_mode)
+        snapshot.merged = {int(x): None if y < 0 else int(y) for x, y in
+                           np.load(os.path.join(path, 'merged.npy')).tolist()}
+        snapshot.synonyms = None
+        snapshot._synonyms_path = os.path.join(path, 'synonyms.json')
+        snapshot._name_index = None
+        snapshot._name_index_nocase = None
+        return snapshot
+
+    def __getitem__(self, key):
+        if key in ('taxid', 'names'):
+            return self
+        raise KeyError(key)
+
+    def __contains__(self, taxid):
+        if taxid is None:
+            return False
+        taxid = int(taxid)
+        return 0 <= taxid < len(self.parent) and self.parent[taxid] >= 0
+
+    def resolve_taxid(self, taxid):
+        """
+        This function returns the current taxID for a deprecated (merged) taxID.
+
+        :param taxid: The queried taxID.
+        :return: The current taxID, the queried taxID if it is not deprecated or None if it was deleted.
+
+        :type taxid: int
+        :rtype: int
+        """
+        if taxid is None:
+            return None
+        taxid = int(taxid)
+        return self.merged.get(taxid, taxid)
+
+    def sci_name(self, taxid):
+        """
+        This function returns the scientific name of a taxID.
+
+        :param taxid: The queried taxID.
+        :return: Scientific name or None if the taxID is not found.
+
+        :type taxid: int
+        :rtype: str
+        """
+        taxid = self.resolve_taxid(taxid)
+        if taxid not in self:
+            return None
+        return bytes(self.name_blob[self.name_offsets[taxid]:self.name_offsets[taxid + 1]]).decode('utf-8')
+
+    def taxid(self, sci_name):
+        """
+        This function returns the taxID of a scientific name.
+
+        :param sci_name: The queried scientific name.
+        :return: TaxID or None if the scientific name is not found.
+
+        :type sci_name: str
+        :rtype: int
+        """
+        if self._name_index is None:
+            self._name_index = {}
+            for taxid in np.flatnonzero(self.parent >= 0):
+                self._name_index.setdefault(self.sci_name(taxid), int(taxid))
+        return self._name_index.get(sci_name)
+
+    def taxid_nocase(self, sci_name):
+        """
+        This function returns the taxID of a scientific name or synonym ignoring case and whitespace.
+
+        :param sci_name: The queried scientific name.
+        :return: TaxID or None if the name is not found.
+
+        :type sci_name: str
+        :rtype: int
+        """
+        if self._name_index_nocase is None:
+            self._name_index_nocase = {}
+            for taxid in np.flatnonzero(self.parent >= 0):
+                self._name_index_nocase.setdefault(self.sci_name(taxid).lower(), int(taxid))
+        if self.synonyms is None:
+            with open(self._synonyms_path, 'r') as handle:
+                self.synonyms = json.load(handle)
+        sci_name = _normalize_name(sci_name).lower()
+        taxid = self._name_index_nocase.get(sci_name)
+        if taxid is None:
+            taxid = self.synonyms.get(sci_name)
+        return taxid
+
+    def lineage_id(self, taxid, ranks=False, reverse=False):
+        """
+        This function returns the lineage of a taxID as a list of taxIDs, excluding the root node.
+
+        :param taxid: The queried taxID.
+        :param ranks: Specify if tuples of (rank, taxID) should be returned.
+        :param reverse: Specify if the lineage should be ordered from the root to the taxID.
+        :return: Lineage or None if the taxID is not found.
+
+        :type taxid: int
+        :type ranks: bool
+        :type reverse: bool
+        :rtype: list
+        """
+        taxid = self.resolve_taxid(taxid)
+        if taxid not in self:
+            return None
+        lineage = []
+        while taxid != self.root and len(lineage) < len(self.parent):
+            lineage.append(taxid)
+            taxid = int(self.parent[taxid])
+        if ranks:
+            lineage = [(self.rank_names[self.rank[x]], x) for x in lineage]
+        if reverse:
+            lineage.reverse()
+        return lineage
+
+    def lineage_name(self, taxid, ranks=False, reverse=False):
+        """
+        This function returns the lineage of a taxID as a list of scientific names, excluding the root node.
+
+        :param taxid: The queried taxID.
+        :param ranks: Specify if tuples of (rank, name) should be returned.
+        :param reverse: Specify if the lineage should be ordered from the root to the taxID.
+        :return: Lineage or None if the taxID is not found.
+
+        :type taxid: int
+        :type ranks: bool
+        :type reverse: bool
+        :rtype: list
+        """
+        lineage = self.lineage_id(taxid, ranks=ranks, reverse=reverse)
+        if lineage is None:
+            return None
+        if ranks:
+            return [(x, self.sci_name(y)) for x, y in lineage]
+        return [self.sci_name(x) for x in lineage]
+
+
+class LineageCache:
+    """
+    A persistent cache of species lineages stored in a sidecar SQLite file next to a taxadb.sqlite file.
+
+    Each entry holds the lineage of a queried taxID as (taxID, name) pairs from the root node to the
+    taxID. The cache is keyed by the build stamp of the taxonomic database, so that it is emptied whenever
+    the database changes, and holds at most `max_entries` lineages, evicting the least recently used ones.
+
+    :param path: Path to the cache file.
+    :param stamp: Build stamp of the taxonomic database.
+    :param max_entries: Maximum number of cached lineages.
+
+    :type path: str
+    :type stamp: str
+    :type max_entries: int
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> ncbi = qlin.load_taxadb(ncbi=None,
+    >>>                         dbname='taxadb.sqlite',
+    >>>                         cache=True)
+    >>> qlin.get_lineages(taxids=[7955, 10090],
+    >>>                   ncbi=ncbi)
+    """
+
+    def __init__(self, path, stamp, max_entries=10000):
+        self.path = path
+        self.stamp = stamp
+        self.max_entries = max_entries
+        self.con = sqlite3.connect(path,
+                                   timeout=30)
+        with self.con:
+            self.con.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.con.execute('CREATE TABLE IF NOT EXISTS lineage '
+                             '(taxid INTEGER PRIMARY KEY, lineage TEXT, atime INTEGER)')
+            self.con.execute('CREATE INDEX IF NOT EXISTS lineage_atime ON lineage (atime)')
+            cached_stamp = self.con.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+            if cached_stamp is None or cached_stamp[0] != stamp:
+                self.con.execute('DELETE FROM lineage')
+                self.con.execute("INSERT OR REPLACE INTO meta VALUES ('stamp', ?)", [stamp])
+
+    def __len__(self):
+        return self.con.execute('SELECT COUNT(*) FROM lineage').fetchone()[0]
+
+    def get_many(self, taxids):
+        """
+        This function returns the cached lineages of a vector of taxIDs and marks them as recently used.
+
+        :param taxids: A vector of taxIDs as integers.
+        :return: A dictionary mapping the cached taxIDs to their lineage as (taxID, name) tuples
+                 (None for taxIDs cached as not found).
+
+        :type taxids: list of int
+        :rtype: dict
+        """
+        rows = []
+        taxids = list(set(taxids))
+        for i in range(0, len(taxids), 499):
+            taxids_chunk = taxids[i:i + 499]
+            rows += self.con.execute('SELECT taxid, lineage FROM lineage WHERE taxid IN ({})'.format(
+                ','.join(['?'] * len(taxids_chunk))), taxids_chunk).fetchall()
+        if rows:
+            with self.con:
+                self.con.executemany('UPDATE lineage SET atime = ? WHERE taxid = ?',
+                                     [(time.time_ns(), x) for x, y in rows])
+        return {x: None if y is None else [tuple(z) for z in json.loads(y)] for x, y in rows}
+
+    def put_many(self, lineages):
+        """
+        This function adds lineages to the cache and evicts the least recently used ones
+        if the cache holds more than `max_entries` lineages.
+
+        :param lineages: A dictionary mapping taxIDs to their lineage as (taxID, name) tuples or None.
+
+        :type lineages: dict
+        """
+        atime = time.time_ns()
+        with self.con:
+            self.con.executemany('INSERT OR REPLACE INTO lineage VALUES (?, ?, ?)',
+                                 [(x, None if y is None else json.dumps(y), atime)
+                                  for x, y in lineages.items()])
+            overflow = len(self) - self.max_entries
+            if overflow > 0:
+                self.con.execute('DELETE FROM lineage WHERE taxid IN '
+                                 '(SELECT taxid FROM lineage ORDER BY atime LIMIT ?)', [overflow])
+
+    def close(self):
+        self.con.close()
+
+
+def load_lineage_cache(dbname,
+                       max_entries=10000):
+    """
+    This function opens the persistent lineage cache of a taxadb.sqlite file, stored as
+    <dbname>.lineage.sqlite, or returns None if the cache file can not be written.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :param max_entries: Maximum number of cached lineages.
+    :return: Lineage cache.
+
+    :type dbname: str
+    :type max_entries: int
+    :rtype: LineageCache
+    """
+    try:
+        return LineageCache(path=dbname + '.lineage.sqlite',
+                            stamp=_db_stamp(dbname),
+                            max_entries=max_entries)
+    except sqlite3.Error:
+        return None
+
+
+def load_taxonomy_snapshot(dbname,
+                           mmap_mode='r'):
+    """
+    This function returns a TaxonomySnapshot of a taxadb.sqlite file. If the binary taxonomy
+    <dbname>.taxonomy written by `ncbitax.add_binary_taxonomy` exists and matches the current
+    database, its arrays are memory-mapped; otherwise the snapshot is read from the database.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :param mmap_mode: Memory-map mode passed to `numpy.load` (None to read the arrays into memory).
+    :return: Taxonomy snapshot.
+
+    :type dbname: str
+    :type mmap_mode: str
+    :rtype: TaxonomySnapshot
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> ncbi = qlin.load_taxonomy_snapshot(dbname='taxadb.sqlite')
+    >>> qlin.get_qlin(qt='10090',
+    >>>               ncbi=ncbi)
+    """
+    if not os.path.exists(dbname):
+        raise FileNotFoundError(f"Database file '{dbname}' not found.")
+    path = dbname + '.taxonomy'
+    if os.path.exists(os.path.join(path, 'taxonomy.json')):
+        snapshot = TaxonomySnapshot.load(path,
+                                         mmap_mode=mmap_mode)
+        if snapshot.stamp == _db_stamp(dbname):
+            return snapshot
+    return TaxonomySnapshot(dbname=dbname)
+
+
+class _SQLiteDatabase:
+    """
+    A minimal stand-in for the peewee database of a taxadb2 object, wrapping one sqlite3 connection.
+    """
+
+    __slots__ = ('connection',)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute_sql(self, sql, params=None):
+        return self.connection.execute(sql, [] if params is None else params)
+
+
+class TaxonomyHandle:
+    """
+    A thread- and process-safe handle of a taxadb.sqlite file, which can be used everywhere the `ncbi`
+    dictionary returned by `load_taxadb` is accepted.
+
+    Every thread gets its own SQLite connection (and lineage cache), opened on first use. After a fork, the
+    connections inherited from the parent process are left untouched and new ones are opened in the child.
+    The handle pickles to its arguments only, so that it can be passed to process-pool workers, which open
+    their own connections lazily. By default the database is opened read-only via an SQLite URI.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :param cache: Specify if lineages should be read from and written to the persistent lineage cache
+                  (see `LineageCache`).
+    :param readonly: Specify if the database should be opened read-only.
+
+    :type dbname: str
+    :type cache: bool
+    :type readonly: bool
+
+    Example
+    -------
+    >>> from concurrent.futures import ThreadPoolExecutor
+    >>> from oggmap import qlin
+    >>> ncbi = qlin.load_taxadb(ncbi=None,
+    >>>                         dbname='taxadb.sqlite',
+    >>>                         threadsafe=True)
+    >>> with ThreadPoolExecutor(4) as pool:
+    >>>     list(pool.map(lambda x: qlin.get_qlin(qt=x, ncbi=ncbi, quiet=True), ['10090', '7955']))
+    """
+
+    def __init__(self, dbname, cache=False, readonly=True):
+        if not os.path.exists(dbname):
+            raise FileNotFoundError(f"Database file '{dbname}' not found.")
+        self.dbname = dbname
+        self.cache = cache
+        self.readonly = readonly
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._inherited = []
+
+    def __reduce__(self):
+        return self.__class__, (self.dbname, self.cache, self.readonly)
+
+    def __getitem__(self, key):
+        if key in ('taxid', 'names'):
+            return self
+        if key == 'cache':
+            return self._state()['cache']
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _state(self):
+        if self._pid != os.getpid():
+            # keep the connections of the parent process referenced, closing them in a child is unsafe
+            self._inherited.append(self._local)
+            self._local = threading.local()
+            self._pid = os.getpid()
+        state = getattr(self._local, 'state', None)
+        if state is None:
+            if self.readonly:
+                connection = sqlite3.connect('file:%s?mode=ro' % quote(os.path.abspath(self.dbname)),
+                                             uri=True)
+            else:
+                connection = sqlite3.connect(self.dbname)
+            state = {'database': _SQLiteDatabase(connection),
+                     'cache': load_lineage_cache(dbname=self.dbname) if self.cache else None}
+            self._local.state = state
+        return state
+
+    @property
+    def database(self):
+        """
+        The SQLite database of the current thread, with an `execute_sql` method like a peewee database.
+        """
+        return self._state()['database']
+
+    def taxid(self, sci_name):
+        """
+        This function returns the taxID of a scientific name.
+
+        :param sci_name: The queried scientific name.
+        :return: TaxID or None if the scientific name is not found.
+
+        :type sci_name: str
+        :rtype: int
+        """
+        row = self.database.execute_sql('SELECT MIN(ncbi_taxid) FROM taxa WHERE tax_name = ?',
+                                        [sci_name]).fetchone()
+        return None if row is None else row[0]
+
+
+def _lineage_cache(ncbi):
+    """
+    A helper function to get the lineage cache attached to the NCBI taxonomic database, if any.
+
+    :param ncbi: The NCBI taxonomic database.
+    :return: Lineage cache or None.
+
+    :type ncbi: dict
+    :rtype: LineageCache
+    """
+    if isinstance(ncbi, (dict, TaxonomyHandle)):
+        return ncbi.get('cache')
+    return None
+
+
+def load_taxadb(ncbi, dbname, snapshot=False, cache=False, threadsafe=False):
     """
     Load taxadb.sqlite database or exit if neither ncbi nor dbname are provided.
 
     :param ncbi: Existing ncbi dictionary, if any.
     :param dbname: Path to taxadb.sqlite file.
+    :param snapshot: Specify if the database should be loaded into memory as a TaxonomySnapshot.
+    :param cache: Specify if lineages should be read from and written to the persistent lineage cache
+                  (see `LineageCache`).
+    :param threadsafe: Specify if the database should be opened read-only as a TaxonomyHandle that can be
+                       shared by threads and worker processes.
 
-    :rtype: dict
+    :rtype: dict or TaxonomySnapshot or TaxonomyHandle
     """
     if ncbi is None and dbname is None:
         sys.exit('\nPlease provide path to taxadb.sqlite file')
     if ncbi is None and dbname is not None:
         if not os.path.exists(dbname):
             raise FileNotFoundError(f"Database file '{dbname}' not found.")
+        if snapshot:
+            return load_taxonomy_snapshot(dbname=dbname)
+        if threadsafe:
+            return TaxonomyHandle(dbname=dbname,
+                                  cache=cache)
         ncbi = {
             'taxid': TaxID(dbtype='sqlite', dbname=dbname),
             'names': SciName(dbtype='sqlite', dbname=dbname)
         }
+        if cache:
+            ncbi['cache'] = load_lineage_cache(dbname=dbname)
     return ncbi
 
 
+def _query_in(database,
+              sql,
+              values,
+              chunk=499,
+              repeat=1):
+    """
+    A helper function to run a SQL query with an `IN (...)` clause over a vector of values
+    in chunks that respect the SQLite limit of bind variables.
+
+    :param database: The peewee database of a taxadb2 object.
+    :param sql: SQL query with `{}` placeholders for the `IN (...)` bind variables.
+    :param values: Values to bind.
+    :param chunk: Maximum number of bind variables per query.
+    :param repeat: Number of `{}` placeholders in the query, each bound to the same values.
+    :return: All result rows.
+
+    :type database: peewee.Database
+    :type sql: str
+    :type values: list
+    :type chunk: int
+    :type repeat: int
+    :rtype: list
+    """
+    rows = []
+    values = list(values)
+    for i in range(0, len(values), chunk):
+        values_chunk = values[i:i + chunk]
+        rows += database.execute_sql(sql.format(','.join(['?'] * len(values_chunk))),
+                                     values_chunk * repeat).fetchall()
+    return rows
+
+
+def _resolve_taxids(taxids,
+                    ncbi):
+    """
+    A helper function to replace deprecated (merged) taxIDs by their current taxID
+    and deleted taxIDs by None.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :return: A dictionary mapping the deprecated and deleted taxIDs to their current taxID.
+
+    :type taxids: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: dict
+    """
+    if isinstance(ncbi, TaxonomySnapshot):
+        return {x: ncbi.resolve_taxid(x) for x in set(taxids) if x in ncbi.merged}
+    try:
+        return dict(_query_in(ncbi['taxid'].database,
+                              'SELECT old_taxid, new_taxid FROM deprecatedtaxid WHERE old_taxid IN ({0}) '
+                              'UNION ALL SELECT taxid, NULL FROM deletedtaxid WHERE taxid IN ({0})',
+                              set(taxids),
+                              repeat=2))
+    except (OperationalError, sqlite3.OperationalError):
+        return dict(_query_in(ncbi['taxid'].database,
+                              'SELECT old_taxid, new_taxid FROM deprecatedtaxid WHERE old_taxid IN ({})',
+                              set(taxids)))
+
+
+def resolve_taxid(qt,
+                  ncbi=None,
+                  dbname=None):
+    """
+    This function resolves a taxID to its canonical taxID in one step, using the index of
+    merged (deprecated) and deleted taxIDs of the NCBI taxonomy.
+
+    :param qt: The queried taxID.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: The current taxID, the queried taxID if it was never merged or None if it was deleted.
+
+    :type qt: str
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: int
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.resolve_taxid(qt='10090',
+    >>>                    dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    qt = int(qt)
+    return _resolve_taxids([qt], ncbi).get(qt, qt)
+
+
+def _normalize_name(name):
+    """
+    A helper function to normalize a species name by replacing underscores with spaces and
+    collapsing whitespace.
+
+    :param name: Species name.
+    :return: Normalized species name.
+
+    :type name: str
+    :rtype: str
+    """
+    return ' '.join(str(name).replace('_', ' ').split())
+
+
+def compile_aliases(aliases):
+    """
+    This function compiles an alias table, mapping species names as used by an orthology resource to
+    their NCBI scientific names, into a lookup dictionary of normalized names.
+
+    :param aliases: Dictionary of alias to NCBI scientific name.
+    :return: Dictionary of normalized, lower-case alias to normalized NCBI scientific name.
+
+    :type aliases: dict
+    :rtype: dict
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.compile_aliases({'Ustilago maydis': 'Mycosarcoma maydis'})
+    """
+    return {_normalize_name(x).lower(): _normalize_name(y) for x, y in aliases.items()}
+
+
+def resolve_names(names,
+                  ncbi=None,
+                  dbname=None,
+                  aliases=None):
+    """
+    This function resolves a vector of species names to taxIDs in bulk.
+
+    The names are normalized (underscores, whitespace, case) and translated with an optional alias table
+    (see `compile_aliases`). They are then looked up with a few `IN (...)` queries against the scientific
+    names and, for names without a match, against the synonyms of the taxonomic database. The queries use
+    the case-insensitive name index created by `ncbitax.add_name_index`; if several taxIDs share a name,
+    the smallest taxID is returned as by `get_qlin`.
+
+    :param names: A vector of species names.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :param aliases: Alias table as dictionary of alias to NCBI scientific name, or compiled with
+                    `compile_aliases`.
+    :return: A dictionary mapping each queried name to its taxID (None for names not found).
+
+    :type names: list
+    :type ncbi: dict
+    :type dbname: str
+    :type aliases: dict
+    :rtype: dict
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.resolve_names(names=['Danio rerio', 'mus_musculus'],
+    >>>                    dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    aliases = {} if aliases is None else compile_aliases(aliases)
+    queries = {}
+    for name in names:
+        query = _normalize_name(name)
+        queries[name] = aliases.get(query.lower(), query)
+    if isinstance(ncbi, TaxonomySnapshot):
+        return {x: ncbi.taxid_nocase(y) for x, y in queries.items()}
+    found = {}
+    for query_sql in ['SELECT tax_name, ncbi_taxid FROM taxa WHERE tax_name COLLATE NOCASE IN ({})',
+                      'SELECT tax_name, taxid FROM synonym WHERE tax_name COLLATE NOCASE IN ({})']:
+        missing = set([x for x in queries.values() if x.lower() not in found])
+        if not missing:
+            break
+        try:
+            rows = _query_in(ncbi['taxid'].database,
+                             query_sql,
+                             missing)
+        except (OperationalError, sqlite3.OperationalError):
+            break
+        hits = {}
+        for tax_name, taxid in rows:
+            hits.setdefault(tax_name.lower(), []).append((tax_name, taxid))
+        for query in missing:
+            if query.lower() in hits:
+                exact = [y for x, y in hits[query.lower()] if x == query]
+                found[query.lower()] = min(exact if exact else [y for x, y in hits[query.lower()]])
+    return {x: found.get(y.lower()) for x, y in queries.items()}
+
+
+def _get_lineage_zip(qtid,
+                     ncbi):
+    """
+    A helper function to get the lineage of a canonical taxID as (taxID, name) tuples from the root node
+    to the taxID with an array walk on a TaxonomySnapshot.
+
+    :param qtid: The canonical taxID of the queried species.
+    :param ncbi: The NCBI taxonomic database as TaxonomySnapshot.
+    :return: Lineage as (taxID, name) tuples or None if the taxID is not found.
+
+    :type qtid: int
+    :type ncbi: oggmap.qlin.TaxonomySnapshot
+    :rtype: list
+    """
+    if qtid is None:
+        return None
+    lineage = ncbi.lineage_id(qtid, reverse=True)
+    if lineage is None:
+        return None
+    return [(x, ncbi.sci_name(x)) for x in [1] + lineage]
+
+
+def _get_lineage_zips(taxids,
+                      ncbi):
+    """
+    A helper function to get the lineages of a vector of taxIDs as (taxID, name) tuples from the root node
+    to the taxID. Lineages are read from the lineage cache attached to the NCBI taxonomic database first;
+    the remaining ones are resolved with one recursive SQL query over all their ancestors (per chunk of
+    taxIDs) or array walks on a TaxonomySnapshot and added to the cache.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :return: A dictionary mapping each queried taxID to its lineage as (taxID, name) tuples
+             (None for taxIDs not found in the database).
+
+    :type taxids: list of int
+    :type ncbi: dict
+    :rtype: dict
+    """
+    taxids = set([int(x) for x in taxids])
+    cache = _lineage_cache(ncbi)
+    lineages = {} if cache is None else cache.get_many(taxids)
+    missing = [x for x in taxids if x not in lineages]
+    if not missing:
+        return lineages
+    merged = _resolve_taxids(missing, ncbi)
+    if isinstance(ncbi, TaxonomySnapshot):
+        lineages.update({x: _get_lineage_zip(merged.get(x, x), ncbi) for x in missing})
+        return lineages
+    rows = _query_in(ncbi['taxid'].database,
+                     'WITH RECURSIVE ancestors(ncbi_taxid) AS ('
+                     'SELECT ncbi_taxid FROM taxa WHERE ncbi_taxid IN ({}) '
+                     'UNION '
+                     'SELECT taxa.parent_taxid FROM taxa JOIN ancestors ON taxa.ncbi_taxid = ancestors.ncbi_taxid '
+                     'WHERE taxa.ncbi_taxid != 1) '
+                     'SELECT ncbi_taxid, parent_taxid, tax_name FROM taxa '
+                     'WHERE ncbi_taxid IN (SELECT ncbi_taxid FROM ancestors)',
+                     set([merged.get(x, x) for x in missing]) - {None})
+    parents = {x: y for x, y, z in rows}
+    names = {x: z for x, y, z in rows}
+    missing_lineages = {}
+    for x in missing:
+        taxid = merged.get(x, x)
+        if taxid not in parents:
+            missing_lineages[x] = None
+            continue
+        lineage = []
+        while taxid != 1 and taxid in parents and len(lineage) < len(parents):
+            lineage.append((taxid, names[taxid]))
+            taxid = parents[taxid]
+        missing_lineages[x] = [(1, names.get(1, 'root'))] + lineage[::-1]
+    if cache is not None:
+        cache.put_many(missing_lineages)
+    lineages.update(missing_lineages)
+    return lineages
+
+
 def ncbi_get_lineage(qt,
                      ncbi=None,
                      dbname=None):
@@ -115,9 +977,8 @@ def ncbi_get_lineage(qt,
     :rtype: list
     """
     ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
-    taxid2name = ncbi['taxid'].sci_name(qt)
-    qtid = ncbi['names'].taxid(taxid2name)
-    qlineage = [1] + ncbi['taxid'].lineage_id(qtid, reverse=True)
+    qlineagezip = _get_lineage_zips([qt], ncbi)[int(qt)]
+    qlineage = [x for x, y in qlineagezip]
     return qlineage
 
 
@@ -131,30 +992,353 @@ def ncbi_get_taxid_translator(qt_vec,
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
 
-    :type qt_vec: list of int
-    :type ncbi: dict
-    :type dbname: str
-    :rtype: dict
-    """
-    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
-    if not isinstance(qt_vec, list):
-        sys.exit('\nqt_vec needs to be a vector of taxIDs as integers')
-    else:
-        qt_vec = [int(x) for x in qt_vec]
-    taxid2names = [ncbi['taxid'].sci_name(qt) for qt in qt_vec]
-    qtids = [ncbi['names'].taxid(taxid2name) for taxid2name in taxid2names]
-    translations = dict(zip(qtids, taxid2names))
-    return translations
+    :type qt_vec: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: dict
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    if not isinstance(qt_vec, list):
+        sys.exit('\nqt_vec needs to be a vector of taxIDs as integers')
+    else:
+        qt_vec = [int(x) for x in qt_vec]
+    merged = _resolve_taxids(qt_vec, ncbi)
+    taxid2names = translate_taxids([merged.get(x, x) for x in qt_vec], ncbi=ncbi)
+    translations = {x: y for x, y in taxid2names.items() if y is not None}
+    return translations
+
+
+def get_lineages(taxids,
+                 ncbi=None,
+                 dbname=None):
+    """
+    This function returns the species lineages for a vector of taxIDs.
+
+    In contrast to calling `ncbi_get_lineage` once per taxID, all lineages are resolved together,
+    either with a few bulk SQL queries (one per lineage level) or with array lookups
+    if the taxonomic database is a TaxonomySnapshot. Lineages found in the persistent lineage cache
+    (see `load_taxadb`) are not queried again.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: A list of lineages in the order of the taxIDs, each starting with the root taxID 1
+             (None for taxIDs not found in the database).
+
+    :type taxids: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.get_lineages(taxids=[7955, 10090],
+    >>>                   dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    taxids = [int(x) for x in taxids]
+    lineages = _get_lineage_zips(taxids, ncbi)
+    return [None if lineages[x] is None else [y for y, z in lineages[x]] for x in taxids]
+
+
+def translate_taxids(taxids,
+                     ncbi=None,
+                     dbname=None):
+    """
+    This function returns the scientific names for a vector of taxIDs with a few bulk SQL queries
+    or with array lookups if the taxonomic database is a TaxonomySnapshot.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: A dictionary mapping each queried taxID to its scientific name
+             (None for taxIDs not found in the database).
+
+    :type taxids: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: dict
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.translate_taxids(taxids=[7955, 10090],
+    >>>                       dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    taxids = [int(x) for x in taxids]
+    merged = _resolve_taxids(taxids, ncbi)
+    if isinstance(ncbi, TaxonomySnapshot):
+        return {x: ncbi.sci_name(merged.get(x, x)) for x in taxids}
+    names = dict(_query_in(ncbi['taxid'].database,
+                           'SELECT ncbi_taxid, tax_name FROM taxa WHERE ncbi_taxid IN ({})',
+                           set([merged.get(x, x) for x in taxids])))
+    return {x: names.get(merged.get(x, x)) for x in taxids}
+
+
+MAJOR_RANKS = ['domain', 'superkingdom', 'kingdom', 'phylum', 'class', 'order', 'family', 'genus', 'species']
+
+
+def _parse_ranks(ranks):
+    """
+    A helper function to get a rank set from a vector of ranks or a comma-separated string.
+
+    :param ranks: Ranks as vector or comma-separated string.
+    :return: Ranks.
+
+    :type ranks: list or str
+    :rtype: tuple
+    """
+    if isinstance(ranks, str):
+        ranks = ranks.split(',')
+    return tuple([x.strip().lower() for x in ranks if x.strip()])
+
+
+def get_ranks(taxids,
+              ncbi=None,
+              dbname=None):
+    """
+    This function returns the rank (lineage level) of a vector of taxIDs, either with a single
+    bulk SQL query or with one array lookup if the taxonomic database is a TaxonomySnapshot.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: Ranks in the order of the taxIDs (None for taxIDs not found in the database).
+
+    :type taxids: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: numpy.ndarray
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.get_ranks(taxids=[7955, 7954, 7898],
+    >>>                dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    taxids = np.asarray(taxids, dtype=np.int64)
+    if isinstance(ncbi, TaxonomySnapshot):
+        found = (taxids >= 0) & (taxids < len(ncbi.parent))
+        found[found] = ncbi.parent[taxids[found]] >= 0
+        ranks = np.full(len(taxids), None, dtype=object)
+        ranks[found] = np.asarray(ncbi.rank_names, dtype=object)[ncbi.rank[taxids[found]]]
+        return ranks
+    rows = dict(_query_in(ncbi['taxid'].database,
+                          'SELECT ncbi_taxid, lineage_level FROM taxa WHERE ncbi_taxid IN ({})',
+                          set(taxids.tolist())))
+    return np.array([rows.get(x) for x in taxids.tolist()], dtype=object)
+
+
+class LineageNode:
+    """
+    A node of a `LineageChain`, i.e. one phylostratum of a query lineage.
+
+    The node exposes `name` and `clades` like a Bio.Phylo.Newick.Clade so that it can be walked with
+    `traverse_postorder`.
+
+    :param name: Node name as 'PSnum/PStaxID/PSname'.
+    :param taxid: TaxID of the phylostratum.
+    :param psnum: Phylostratum number.
+
+    :type name: str
+    :type taxid: int
+    :type psnum: int
+    """
+
+    __slots__ = ('name', 'taxid', 'psnum', 'clades', 'species_count')
+
+    def __init__(self, name, taxid, psnum):
+        self.name = name
+        self.taxid = taxid
+        self.psnum = psnum
+        self.clades = []
+        self.species_count = None
+
+
+class LineageChain:
+    """
+    A lightweight chain tree of a query lineage, with the root (PSnum 0) as `root` and the query species as
+    the only leaf.
+
+    :param nodes: Lineage nodes ordered from root to leaf.
+
+    :type nodes: list
+    """
+
+    __slots__ = ('nodes', 'root')
+
+    def __init__(self, nodes):
+        for parent_node, child_node in zip(nodes[:-1], nodes[1:]):
+            parent_node.clades.append(child_node)
+        self.nodes = nodes
+        self.root = nodes[0] if nodes else None
+
+
+class QueryLineage:
+    """
+    The lineage information of a query species, computed once per query.
+
+    The phylostrata are held as integer arrays (`taxids`, `psnum`) together with their names, ranks and a
+    taxID to phylostratum number dictionary (`ps_map`). The remaining attributes correspond to the list
+    returned by `get_qlin`, which can be obtained with `to_list`.
+
+    With `project` the lineage is reduced to the phylostrata of a rank set (the root and the query species
+    are always retained). A dropped node is merged into its nearest retained ancestor towards the root,
+    so `ps_map` of a projected lineage still maps every taxID of the full lineage (`full`) to its
+    phylostratum number and `youngest_common` assigns target species on the full lineage.
+
+    :param qname: The name of the queried species.
+    :param qtid: The taxID of the queried species.
+    :param qlineagezip: Pairs of taxID and name from the root to the query species.
+    :param qk: The query kingdom.
+    :param ranks: Rank of each lineage node.
+
+    :type qname: str
+    :type qtid: int
+    :type qlineagezip: list
+    :type qk: str
+    :type ranks: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> query_lineage = qlin.get_query_lineage(qt='10090',
+    >>>                                        dbname='taxadb.sqlite')
+    >>> query_lineage.ps_map
+    >>> query_lineage.project(ranks=['phylum', 'class', 'order', 'family', 'genus']).qlineagenames
+    """
+
+    __slots__ = ('qname', 'qtid', 'qk', 'taxids', 'psnum', 'names', 'ranks', 'ps_map', 'full',
+                 '_ps_project', '_projections', '_qlineagezip', '_qlineagenames', '_topo')
+
+    def __init__(self, qname, qtid, qlineagezip, qk, ranks=None):
+        self.qname = qname
+        self.qtid = qtid
+        self.qk = qk
+        self.taxids = np.array([x for x, y in qlineagezip], dtype=np.int64)
+        self.psnum = np.arange(len(qlineagezip), dtype=np.int64)
+        self.names = [y for x, y in qlineagezip]
+        self.ranks = np.full(len(qlineagezip), None, dtype=object) if ranks is None \
+            else np.asarray(ranks, dtype=object)
+        self.ps_map = {x: y for y, (x, _) in enumerate(qlineagezip)}
+        self.full = self
+        self._ps_project = self.psnum
+        self._projections = {}
+        self._qlineagezip = list(qlineagezip)
+        self._qlineagenames = None
+        self._topo = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def qlineage(self):
+        return [x for x, y in self._qlineagezip]
+
+    @property
+    def qlineagenames_dict(self):
+        return dict(self._qlineagezip)
+
+    @property
+    def qlineagezip(self):
+        return list(self._qlineagezip)
+
+    @property
+    def qlineagerev(self):
+        return self.qlineage[::-1]
+
+    @property
+    def qlineagenames(self):
+        """
+        Phylostrata as string-typed DataFrame with the columns 'PSnum', 'PStaxID' and 'PSname'.
+        """
+        if self._qlineagenames is None:
+            self._qlineagenames = pd.DataFrame({'PSnum': [str(x) for x in self.psnum],
+                                                'PStaxID': [str(x) for x in self.taxids],
+                                                'PSname': [str(x) for x in self.names]})
+        return self._qlineagenames.copy()
+
+    @property
+    def topo(self):
+        """
+        The lineage as `LineageChain`.
+        """
+        if self._topo is None:
+            self._topo = LineageChain([LineageNode(name='/'.join([str(x), str(y), z]),
+                                                   taxid=int(y),
+                                                   psnum=x)
+                                       for x, (y, z) in enumerate(self._qlineagezip)])
+        return self._topo
+
+    def project(self, ranks=None):
+        """
+        Return the lineage projected onto a rank set, computed once per rank set.
+
+        :param ranks: Ranks to retain as vector or comma-separated string (default: `MAJOR_RANKS`).
+        :return: The projected lineage.
+
+        :type ranks: list or str
+        :rtype: QueryLineage
+        """
+        full = self.full
+        ranks = _parse_ranks(MAJOR_RANKS if ranks is None else ranks)
+        if ranks not in full._projections:
+            keep = np.isin(full.ranks, np.asarray(ranks, dtype=object))
+            keep[[0, -1]] = True
+            keep_idx = np.flatnonzero(keep)
+            projected = QueryLineage(qname=full.qname,
+                                     qtid=full.qtid,
+                                     qlineagezip=[full._qlineagezip[x] for x in keep_idx],
+                                     qk=full.qk,
+                                     ranks=full.ranks[keep_idx])
+            projected.full = full
+            # a dropped node takes the phylostratum of its nearest retained ancestor
+            projected._ps_project = np.searchsorted(keep_idx, full.psnum, side='right') - 1
+            projected.ps_map = dict(zip(full.taxids.tolist(), projected._ps_project.tolist()))
+            full._projections[ranks] = projected
+        return full._projections[ranks]
+
+    def youngest_common(self, lineages):
+        """
+        Return the youngest common node of the query species and each target species as taxID of this
+        (possibly projected) lineage.
+
+        :param lineages: Target species lineages.
+        :return: Youngest common taxIDs in the order of the lineages.
+
+        :type lineages: list
+        :rtype: list
+        """
+        full_ps_map = self.full.ps_map
+        youngest_ps = [max([full_ps_map[y] for y in x if y in full_ps_map]) for x in lineages]
+        return self.taxids[self._ps_project[np.asarray(youngest_ps, dtype=np.int64)]].tolist()
+
+    def to_list(self):
+        """
+        Return the lineage information in the order of `get_qlin`.
+        """
+        return [self.qname,
+                self.qtid,
+                self.qlineage,
+                self.qlineagenames_dict,
+                self.qlineagezip,
+                self.qlineagenames,
+                self.qlineagerev,
+                self.qk]
 
 
-def get_qlin(q=None,
-             qt=None,
-             quiet=False,
-             ncbi=None,
-             dbname=None):
+def get_query_lineage(q=None,
+                      qt=None,
+                      quiet=False,
+                      ncbi=None,
+                      dbname=None,
+                      ranks=None):
     """
     This function searches the NCBI taxonomic database for results matching the
-    query name or query taxID.
+    query name or query taxID and returns them as `QueryLineage`.
 
     Note that if the user specifies both the name and the taxID of a species,
     the returning result is based on the taxID.
@@ -164,70 +1348,54 @@ def get_qlin(q=None,
     :param quiet: Specify if output should be quiet.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
-    :return: A list of information for the queried species such as:
-             query name, query taxID, query lineage, query lineage dictionary, query lineage zip,
-             query lineage names, reverse query lineage, query kingdom
+    :param ranks: Project the lineage onto these ranks (see `QueryLineage.project`).
+    :return: The lineage information of the queried species.
 
     :type q: str
     :type qt: str
     :type quiet: bool
     :type ncbi: dict
     :type dbname: str
-    :rtype: list
+    :type ranks: list or str
+    :rtype: QueryLineage
 
     Example
     -------
     >>> from oggmap import qlin
-    >>> qlin.get_qlin(q='Danio rerio',
-    >>>               dbname='taxadb.sqlite')
+    >>> query_lineage = qlin.get_query_lineage(q='Danio rerio',
+    >>>                                        dbname='taxadb.sqlite')
+    >>> query_lineage.qlineage
     """
     ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
     qtid = None
-    qname = None
     qk = None
-    #if ncbi is None:
-        #ncbi = NCBITaxa()
     if qt:
-        #taxid2name = ncbi.get_taxid_translator([int(qt)])
-        #taxid2name = taxid.sci_name(qt)
-        taxid2name = ncbi['taxid'].sci_name(qt)
-        #qtid, \
-        #    qname = list(taxid2name.items())[0]
-        #qtid = names.taxid(taxid2name)
-        qtid = ncbi['names'].taxid(taxid2name)
-        qname = taxid2name
+        qtid = int(qt)
     if q and not qt:
-        #name2taxid = ncbi.get_name_translator([q])
-        #name2taxid = names.taxid(q)
-        name2taxid = ncbi['names'].taxid(q)
-        #qname, \
-        #    qtid = list(name2taxid.items())[0]
-        #qtid = qtid[0]
-        #qname = taxid.sci_name(name2taxid)
-        qname = ncbi['taxid'].sci_name(name2taxid)
-        qtid = name2taxid
-    #qlineage = ncbi.get_lineage(qtid)
-    #qlineage = [1]+taxid.lineage_id(qtid, reverse=True)
-    qlineage = [1] + ncbi['taxid'].lineage_id(qtid, reverse=True)
-    #qlineagen = ['root'] + taxid.lineage_name(qtid, reverse=True)
-    qlineagen = ['root'] + ncbi['taxid'].lineage_name(qtid, reverse=True)
-    #qlineagenames_dict = ncbi.get_taxid_translator(qlineage)
-    qlineagenames_dict = dict(zip(qlineage, qlineagen))
-    qlineagezip = [(a, qlineagenames_dict[a]) for a in qlineage]
-    qlineagenames = pd.DataFrame([(x, y, qlineagenames_dict[y]) for x, y in enumerate(qlineage)],
-                                 columns=['PSnum',
-                                          'PStaxID',
-                                          'PSname'])
-    qlineagenames['PSnum'] = [str(x) for x in list(qlineagenames['PSnum'])]
-    qlineagenames['PStaxID'] = [str(x) for x in list(qlineagenames['PStaxID'])]
-    qlineagenames['PSname'] = [str(x) for x in list(qlineagenames['PSname'])]
-    qlineagerev = qlineage[::-1]
+        qtid = ncbi['names'].taxid(q)
+    qlineagezip = None
+    if qtid is not None:
+        qlineagezip = _get_lineage_zips([qtid], ncbi)[qtid]
+        if qlineagezip is not None:
+            qtid = qlineagezip[-1][0]
+    qlineage = [x for x, y in qlineagezip]
+    qlineagenames_dict = dict(qlineagezip)
+    qname = qlineagenames_dict[qtid]
     if qlineage[2] == 2:
         qk = 'Bacteria'
     if qlineage[2] == 2157:
         qk = 'Archea'
     if qlineage[2] == 2759:
         qk = 'Eukaryota'
+    query_lineage = QueryLineage(qname=qname,
+                                 qtid=qtid,
+                                 qlineagezip=qlineagezip,
+                                 qk=qk,
+                                 ranks=get_ranks(qlineage, ncbi=ncbi))
+    if ranks is not None:
+        query_lineage = query_lineage.project(ranks)
+        qlineage = query_lineage.qlineage
+        qlineagenames_dict = query_lineage.qlineagenames_dict
     if not quiet:
         print('query name: %s' % qname)
         print('query taxID: %s' % str(qtid))
@@ -236,30 +1404,76 @@ def get_qlin(q=None,
             'query lineage names: \n%s' % str([qlineagenames_dict[x] + '(' + str(x) + ')' for x in qlineage])
         )
         print('query lineage: \n%s' % str(qlineage))
-    return [qname,
-            qtid,
-            qlineage,
-            qlineagenames_dict,
-            qlineagezip,
-            qlineagenames,
-            qlineagerev,
-            qk]
+    return query_lineage
+
+
+def get_qlin(q=None,
+             qt=None,
+             quiet=False,
+             ncbi=None,
+             dbname=None,
+             ranks=None):
+    """
+    This function searches the NCBI taxonomic database for results matching the
+    query name or query taxID.
+
+    Note that if the user specifies both the name and the taxID of a species,
+    the returning result is based on the taxID.
+
+    :param q: The name of the queried species.
+    :param qt: The taxID of the queried species.
+    :param quiet: Specify if output should be quiet.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :param ranks: Project the lineage onto these ranks, e.g. ['phylum', 'class', 'order', 'family', 'genus']
+                  (the root and the query species are always retained).
+    :return: A list of information for the queried species such as:
+             query name, query taxID, query lineage, query lineage dictionary, query lineage zip,
+             query lineage names, reverse query lineage, query kingdom
+
+    :type q: str
+    :type qt: str
+    :type quiet: bool
+    :type ncbi: dict
+    :type dbname: str
+    :type ranks: list or str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.get_qlin(q='Danio rerio',
+    >>>               dbname='taxadb.sqlite')
+    >>> # major ranks only
+    >>> qlin.get_qlin(q='Danio rerio',
+    >>>               dbname='taxadb.sqlite',
+    >>>               ranks=qlin.MAJOR_RANKS)
+    """
+    return get_query_lineage(q=q,
+                             qt=qt,
+                             quiet=quiet,
+                             ncbi=ncbi,
+                             dbname=dbname,
+                             ranks=ranks).to_list()
 
 
-def get_lineage_topo(qt,
+def get_lineage_topo(qt=None,
                      ncbi=None,
-                     dbname=None):
+                     dbname=None,
+                     query_lineage=None):
     """
     This function returns a species lineage as a tree object for a query species given as taxID.
 
     :param qt: The taxID of the queried species.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
+    :param query_lineage: Precomputed query lineage, used instead of `qt`.
     :return: The lineage of the queried species as a Bio.Phylo.Newick.Tree.
 
     :type qt: str
     :type ncbi: dict
     :type dbname: str
+    :type query_lineage: QueryLineage
     :rtype: Bio.Phylo.Newick.Tree
 
     Example
@@ -269,18 +1483,18 @@ def get_lineage_topo(qt,
     >>>                                      dbname='taxadb.sqlite')
     >>> lineage_tree
     """
-    _, _, _, _, _, qlineagenames, _, _ = get_qlin(qt=qt,
-                                                  quiet=True,
-                                                  ncbi=ncbi,
-                                                  dbname=dbname)
-    qln = list(qlineagenames[['PSnum',
-                              'PStaxID',
-                              'PSname']].apply(lambda x: '/'.join(x), axis=1))
-    qln = [x.replace(' ', '_').replace('(', '_').replace(')', '_').replace(':', '_') for x in qln]
-    #tree = Tree('(' * len(qln) + ''.join([str(x) + '),' for x in qln[1::][::-1]])+str(qln[0])+');')
-    newick_str = '(' * len(qln) + ''.join([str(x) + '),' for x in qln[1::][::-1]]) + str(qln[0]) + ');'
-    tree = Phylo.read(StringIO(newick_str), 'newick')
-    return tree
+    if query_lineage is None:
+        query_lineage = get_query_lineage(qt=qt,
+                                          quiet=True,
+                                          ncbi=ncbi,
+                                          dbname=dbname)
+    # same topology as parsing '((((leaf),PS_n-1),...),PS_0);' without the Newick round-trip
+    clade = None
+    for node in query_lineage.topo.nodes[::-1]:
+        tip = Phylo.Newick.Clade(name=node.name.replace(' ', '_').replace('(', '_').replace(')', '_')
+                                 .replace(':', '_'))
+        clade = Phylo.Newick.Clade(clades=[tip] if clade is None else [clade, tip])
+    return Phylo.Newick.Tree(root=clade, rooted=False)
 
 
 def get_youngest_common(ql,
@@ -309,9 +1523,179 @@ def get_youngest_common(ql,
     >>> # get youngest common node
     >>> qlin.get_youngest_common(ql=query_lineage, tl=target_lineage)
     """
+    ql = set(ql)
     return [x for x in tl if x in ql][-1]
 
 
+def _has_closure(ncbi):
+    """
+    A helper function to check if the taxonomic database contains the closure table built by
+    `ncbitax.add_closure_table`.
+
+    :param ncbi: The NCBI taxonomic database.
+    :return: True if the closure table exists.
+
+    :type ncbi: dict
+    :rtype: bool
+    """
+    if isinstance(ncbi, TaxonomySnapshot):
+        return False
+    return len(ncbi['taxid'].database.execute_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'closure'").fetchall()) > 0
+
+
+def get_clade_members(clade,
+                      ncbi=None,
+                      dbname=None):
+    """
+    This function returns all taxIDs under a clade (excluding the clade itself).
+
+    The descendants are read with one index range scan from the closure table
+    (see `ncbitax.add_closure_table`), with vectorized parent lookups on a TaxonomySnapshot or,
+    otherwise, with a recursive SQL query.
+
+    :param clade: The taxID of the clade.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: Sorted list of descendant taxIDs.
+
+    :type clade: str
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> # all taxIDs under Vertebrata
+    >>> qlin.get_clade_members(clade='7742',
+    >>>                        dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    clade = resolve_taxid(clade, ncbi=ncbi)
+    if clade is None:
+        return []
+    if isinstance(ncbi, TaxonomySnapshot):
+        nodes = np.flatnonzero(ncbi.parent >= 0)
+        ancestors = nodes.copy()
+        members = np.zeros(len(nodes), dtype=bool)
+        active = ancestors != ncbi.root
+        while active.any():
+            ancestors[active] = ncbi.parent[ancestors[active]]
+            members |= ancestors == clade
+            active &= (ancestors != ncbi.root) & ~members
+        return [int(x) for x in nodes[members]]
+    if _has_closure(ncbi):
+        rows = ncbi['taxid'].database.execute_sql(
+            'SELECT descendant FROM closure WHERE ancestor = ? AND depth > 0',
+            [clade]).fetchall()
+    else:
+        rows = ncbi['taxid'].database.execute_sql(
+            'WITH RECURSIVE clade(ncbi_taxid) AS ('
+            'SELECT ? '
+            'UNION ALL '
+            'SELECT taxa.ncbi_taxid FROM taxa JOIN clade ON taxa.parent_taxid = clade.ncbi_taxid '
+            'WHERE taxa.ncbi_taxid != taxa.parent_taxid) '
+            'SELECT ncbi_taxid FROM clade WHERE ncbi_taxid != ?',
+            [clade, clade]).fetchall()
+    return sorted([x[0] for x in rows])
+
+
+def filter_clade(taxids,
+                 clade,
+                 ncbi=None,
+                 dbname=None):
+    """
+    This function tests for a vector of taxIDs whether they belong to a clade, e.g. to restrict
+    EggNOG species to a clade of interest.
+
+    With the closure table (see `ncbitax.add_closure_table`) the test is a few indexed
+    `IN (...)` queries; otherwise the lineages are resolved with `get_lineages`.
+
+    :param taxids: A vector of taxIDs as integers.
+    :param clade: The taxID of the clade.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: List of booleans in the order of the taxIDs (a clade is a member of itself).
+
+    :type taxids: list of int
+    :type clade: str
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.filter_clade(taxids=[7955, 10090, 6239],
+    >>>                   clade='7742',
+    >>>                   dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    taxids = [int(x) for x in taxids]
+    clade = resolve_taxid(clade, ncbi=ncbi)
+    if clade is None:
+        return [False for x in taxids]
+    if _has_closure(ncbi):
+        merged = _resolve_taxids(taxids, ncbi)
+        members = set([x[0] for x in _query_in(ncbi['taxid'].database,
+                                                'SELECT descendant FROM closure '
+                                                'WHERE ancestor = %d AND descendant IN ({})' % clade,
+                                                set([merged.get(x, x) for x in taxids]) - {None})])
+        return [merged.get(x, x) in members for x in taxids]
+    lineages = get_lineages(taxids, ncbi=ncbi)
+    return [x is not None and clade in x for x in lineages]
+
+
+def get_youngest_common_many(ql,
+                             taxids,
+                             ncbi=None,
+                             dbname=None):
+    """
+    This function returns the lowest common ancestors (LCA) of a query species lineage and a vector of
+    target species taxIDs.
+
+    With the closure table (see `ncbitax.add_closure_table`) the ancestors of all target species are read
+    with a few indexed queries ordered by depth; otherwise the target lineages are resolved with
+    `get_lineages` and compared with `get_youngest_common`.
+
+    :param ql: Query species lineage information.
+    :param taxids: A vector of target species taxIDs as integers.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :return: List of LCA taxIDs in the order of the target taxIDs (None for unknown taxIDs).
+
+    :type ql: list
+    :type taxids: list of int
+    :type ncbi: dict
+    :type dbname: str
+    :rtype: list
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> query_lineage = qlin.ncbi_get_lineage(qt='10090',
+    >>>                                       dbname='taxadb.sqlite')
+    >>> qlin.get_youngest_common_many(ql=query_lineage,
+    >>>                               taxids=[7955, 9606, 6239],
+    >>>                               dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname)
+    taxids = [int(x) for x in taxids]
+    if not _has_closure(ncbi):
+        return [None if x is None else get_youngest_common(ql, x) for x in get_lineages(taxids, ncbi=ncbi)]
+    merged = _resolve_taxids(taxids, ncbi)
+    ql = set(ql)
+    youngest_common = {}
+    for descendant, ancestor in _query_in(ncbi['taxid'].database,
+                                          'SELECT descendant, ancestor FROM closure '
+                                          'WHERE descendant IN ({}) ORDER BY depth',
+                                          set([merged.get(x, x) for x in taxids]) - {None}):
+        if descendant not in youngest_common and ancestor in ql:
+            youngest_common[descendant] = ancestor
+    return [youngest_common.get(merged.get(x, x)) for x in taxids]
+
+
 def get_oldest_common(ql,
                       tl):
     """
@@ -343,16 +1727,556 @@ def get_oldest_common(ql,
     return ql[min([x for x, y in enumerate(ql) if y in tl])]
 
 
+def get_ps_map(ql):
+    """
+    This function returns a dictionary mapping each taxID of a query lineage to its phylostratum number
+    (position in the lineage), so that phylostrata can be assigned without scanning the lineage.
+
+    :param ql: Query species lineage information.
+    :return: Dictionary of taxID to phylostratum number.
+
+    :type ql: list
+    :rtype: dict
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> _, _, query_lineage, _, _, _, _, _ = qlin.get_qlin(q='Caenorhabditis elegans',
+    >>>                                                    dbname='taxadb.sqlite')
+    >>> qlin.get_ps_map(ql=query_lineage)
+    """
+    return {y: x for x, y in enumerate(ql)}
+
+
+def map_ps(values,
+           ps_map):
+    """
+    This function maps many taxIDs to their phylostratum numbers at once with a sorted lookup table built from a
+    taxID to phylostratum number dictionary.
+
+    :param values: TaxIDs of the query lineage.
+    :param ps_map: TaxID to phylostratum number dictionary (see `get_ps_map`).
+    :return: Phylostratum number of each taxID.
+
+    :type values: list or numpy.ndarray
+    :type ps_map: dict
+    :rtype: numpy.ndarray
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.map_ps(values=[33154, 2759, 131567],
+    >>>             ps_map=qlin.get_ps_map(ql=[1, 131567, 2759, 33154]))
+    """
+    ps_taxids = np.fromiter(ps_map.keys(), dtype=np.int64, count=len(ps_map))
+    ps_nums = np.fromiter(ps_map.values(), dtype=np.int64, count=len(ps_map))
+    ps_order = np.argsort(ps_taxids)
+    ps_taxids = ps_taxids[ps_order]
+    values = np.asarray(values, dtype=np.int64)
+    values_idx = np.clip(np.searchsorted(ps_taxids, values), 0, len(ps_taxids) - 1)
+    values_known = ps_taxids[values_idx] == values
+    if not values_known.all():
+        raise ValueError('taxIDs not in the query lineage: %s' % ', '.join([str(x) for x in
+                                                                           np.unique(values[~values_known])]))
+    return ps_nums[ps_order][values_idx]
+
+
+def get_oldest_common_many(ql,
+                           values,
+                           offsets,
+                           ps_map=None):
+    """
+    This function returns the oldest common ancestor (OCA) as phylostratum number for many groups of
+    LCA values at once, e.g. the youngest common taxIDs of all target species per orthologous group.
+
+    The groups are given as a ragged array in CSR layout: group i consists of
+    `values[offsets[i]:offsets[i + 1]]`. The LCA values are mapped to phylostratum numbers with
+    a taxID to phylostratum map and the minimum of every group is obtained with a single
+    `numpy.minimum.reduceat` call. Empty groups get the phylostratum number -1.
+
+    :param ql: Query species lineage information.
+    :param values: Concatenated LCA values (taxIDs of the query lineage) of all groups.
+    :param offsets: Start position of each group in `values` followed by the total length.
+    :param ps_map: Precomputed taxID to phylostratum number dictionary (see `get_ps_map`).
+    :return: Phylostratum number of the OCA of each group; use it as index into the query lineage
+             to obtain the OCA taxID.
+
+    :type ql: list
+    :type values: list or numpy.ndarray
+    :type offsets: list or numpy.ndarray
+    :type ps_map: dict
+    :rtype: numpy.ndarray
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> ql = [1, 131567, 2759, 33154]
+    >>> qlin.get_oldest_common_many(ql=ql,
+    >>>                             values=[33154, 2759, 33154, 131567],
+    >>>                             offsets=[0, 2, 4])
+    """
+    if ps_map is None:
+        ps_map = get_ps_map(ql)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_groups = len(offsets) - 1
+    oldest_ps = np.full(n_groups, -1, dtype=np.int64)
+    if n_groups == 0 or offsets[-1] == 0:
+        return oldest_ps
+    values_ps = map_ps(values,
+                       ps_map)
+    non_empty = offsets[1:] > offsets[:-1]
+    oldest_ps[non_empty] = np.minimum.reduceat(values_ps, offsets[:-1][non_empty])
+    return oldest_ps
+
+
+def _db_stamp(dbname):
+    """
+    A helper function to get a build stamp of a taxadb.sqlite file from its size and modification time,
+    which is used to invalidate files derived from the database.
+
+    :param dbname: Path to taxadb.sqlite file.
+    :return: Build stamp.
+
+    :type dbname: str
+    :rtype: str
+    """
+    dbstat = os.stat(dbname)
+    return '%d:%d' % (dbstat.st_size, dbstat.st_mtime_ns)
+
+
+class LCAIndex:
+    """
+    A lowest common ancestor (LCA) index over the full NCBI taxonomy using binary lifting.
+
+    For every taxID the index stores its depth and its 2^k-th ancestors, so that the LCA of any pair
+    of taxIDs is found with a fixed number of array lookups (log2 of the maximal lineage depth),
+    independent of the number of species. `lca_many` answers millions of pairs with vectorized NumPy
+    operations. Use `load_lca_index` to build the index once and cache it next to the taxadb.sqlite file.
+
+    :param parent: Parent taxID array indexed by taxID (-1 for unknown taxIDs).
+    :param merged: Array of (deprecated taxID, current taxID) pairs (-1 for deleted taxIDs).
+    :param stamp: Build stamp of the taxadb.sqlite file.
+
+    :type parent: numpy.ndarray
+    :type merged: numpy.ndarray
+    :type stamp: str
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> lca_index = qlin.load_lca_index(dbname='taxadb.sqlite')
+    >>> lca_index.lca(7955, 10090)
+    >>> lca_index.lca_many(7955, [10090, 9606, 6239])
+    """
+
+    root = 1
+
+    def __init__(self, parent, merged=None, stamp=None, depth=None, up=None):
+        self.stamp = stamp
+        self.valid = parent >= 0
+        if merged is None:
+            merged = np.zeros((0, 2), dtype=np.int64)
+        merged = merged[np.argsort(merged[:, 0])]
+        self.merged_old = merged[:, 0].astype(np.int64)
+        self.merged_new = merged[:, 1].astype(np.int64)
+        if depth is None or up is None:
+            depth, up = self._build(parent)
+        self.depth = depth
+        self.up = up
+
+    def _build(self, parent):
+        nodes = np.arange(len(parent), dtype=np.int32)
+        ancestor = np.where(self.valid, parent, self.root).astype(np.int32)
+        ancestor[self.root] = self.root
+        # pointer jumping: after each step ancestor holds the 2^i-th ancestor and depth the distance to it
+        depth = (self.valid & (nodes != self.root)).astype(np.int32)
+        up = [ancestor]
+        while np.any(ancestor[self.valid] != self.root):
+            depth = depth + depth[ancestor]
+            ancestor = ancestor[ancestor]
+            up.append(ancestor)
+        return depth, np.stack(up)
+
+    def save(self, path):
+        """
+        This function saves the index as an uncompressed NumPy .npz file.
+
+        :param path: Output file.
+
+        :type path: str
+        """
+        with open(path, 'wb') as handle:
+            np.savez(handle,
+                     valid=self.valid,
+                     depth=self.depth,
+                     up=self.up,
+                     merged=np.stack([self.merged_old, self.merged_new], axis=1),
+                     stamp=np.array(self.stamp if self.stamp else ''))
+
+    @classmethod
+    def load(cls, path):
+        """
+        This function loads an index that was saved with `save`.
+
+        :param path: Input file.
+        :return: LCA index.
+
+        :type path: str
+        :rtype: LCAIndex
+        """
+        with np.load(path) as data:
+            parent = np.where(data['valid'], data['up'][0], -1)
+            return cls(parent,
+                       merged=data['merged'],
+                       stamp=str(data['stamp']),
+                       depth=data['depth'],
+                       up=data['up'])
+
+    def _resolve(self, taxids):
+        taxids = np.asarray(taxids, dtype=np.int64)
+        if len(self.merged_old) > 0:
+            pos = np.clip(np.searchsorted(self.merged_old, taxids), 0, len(self.merged_old) - 1)
+            is_merged = self.merged_old[pos] == taxids
+            taxids = np.where(is_merged, self.merged_new[pos], taxids)
+        in_range = (taxids >= 0) & (taxids < len(self.valid))
+        invalid = ~in_range | ~self.valid[np.where(in_range, taxids, self.root)]
+        return np.where(invalid, self.root, taxids), invalid
+
+    def lca_many(self, query, targets):
+        """
+        This function returns the lowest common ancestors (LCA) of query and target taxIDs.
+
+        :param query: A query taxID or a vector of query taxIDs.
+        :param targets: A target taxID or a vector of target taxIDs (broadcast against the query).
+        :return: The LCA taxIDs (-1 if one of the taxIDs is unknown).
+
+        :type query: int or list of int
+        :type targets: int or list of int
+        :rtype: numpy.ndarray
+        """
+        a, a_invalid = self._resolve(query)
+        b, b_invalid = self._resolve(targets)
+        a, b = np.broadcast_arrays(a, b)
+        invalid = np.broadcast_to(a_invalid | b_invalid, a.shape)
+        swap = self.depth[b] > self.depth[a]
+        a, b = np.where(swap, b, a), np.where(swap, a, b)
+        diff = self.depth[a] - self.depth[b]
+        for k in range(len(self.up)):
+            a = np.where((diff >> k) & 1, self.up[k][a], a)
+        for k in reversed(range(len(self.up))):
+            up_a = self.up[k][a]
+            up_b = self.up[k][b]
+            differ = up_a != up_b
+            a = np.where(differ, up_a, a)
+            b = np.where(differ, up_b, b)
+        lca = np.where(a == b, a, self.up[0][a])
+        return np.where(invalid, -1, lca)
+
+    def lca(self, a, b):
+        """
+        This function returns the lowest common ancestor (LCA) of two taxIDs.
+
+        :param a: First taxID.
+        :param b: Second taxID.
+        :return: The LCA taxID (-1 if one of the taxIDs is unknown).
+
+        :type a: int
+        :type b: int
+        :rtype: int
+        """
+        return int(self.lca_many(int(a), int(b)))
+
+
+def load_lca_index(ncbi=None,
+                   dbname=None,
+                   cache=True):
+    """
+    This function returns the LCA index of a taxadb.sqlite file. The index is built once from the
+    database and cached as <dbname>.lca.npz, which is rebuilt whenever the database changes.
+
+    :param ncbi: The NCBI taxonomic database as TaxonomySnapshot, if any.
+    :param dbname: Specify taxadb.sqlite file.
+    :param cache: Specify if the index should be read from and written to the on-disk cache.
+    :return: LCA index.
+
+    :type ncbi: TaxonomySnapshot
+    :type dbname: str
+    :type cache: bool
+    :rtype: LCAIndex
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> lca_index = qlin.load_lca_index(dbname='taxadb.sqlite')
+    >>> lca_index.lca_many(10090, [7955, 9606, 6239])
+    """
+    if isinstance(ncbi, TaxonomySnapshot) and dbname is None:
+        dbname = ncbi.dbname
+    if dbname is None:
+        sys.exit('\nPlease provide path to taxadb.sqlite file')
+    if not os.path.exists(dbname):
+        raise FileNotFoundError(f"Database file '{dbname}' not found.")
+    stamp = _db_stamp(dbname)
+    cachename = dbname + '.lca.npz'
+    if cache and os.path.exists(cachename):
+        lca_index = LCAIndex.load(cachename)
+        if lca_index.stamp == stamp:
+            return lca_index
+    if not isinstance(ncbi, TaxonomySnapshot):
+        ncbi = TaxonomySnapshot(dbname=dbname)
+    merged = np.array([(x, -1 if y is None else y) for x, y in ncbi.merged.items()],
+                      dtype=np.int64).reshape(-1, 2)
+    lca_index = LCAIndex(ncbi.parent,
+                         merged=merged,
+                         stamp=stamp)
+    if cache:
+        lca_index.save(cachename)
+    return lca_index
+
+
+def _name_changed(old,
+                  new,
+                  taxids):
+    """
+    A helper function to compare the scientific names of taxIDs between two TaxonomySnapshots
+    with vectorized byte comparisons.
+
+    :param old: Old taxonomy snapshot.
+    :param new: New taxonomy snapshot.
+    :param taxids: TaxIDs present in both snapshots.
+    :return: Boolean array, True where the name changed.
+
+    :type old: TaxonomySnapshot
+    :type new: TaxonomySnapshot
+    :type taxids: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    old_start = np.asarray(old.name_offsets[taxids])
+    new_start = np.asarray(new.name_offsets[taxids])
+    old_len = np.asarray(old.name_offsets[taxids + 1]) - old_start
+    new_len = np.asarray(new.name_offsets[taxids + 1]) - new_start
+    changed = old_len != new_len
+    same_len = np.flatnonzero(~changed & (old_len > 0))
+    if len(same_len) == 0:
+        return changed
+    lens = old_len[same_len]
+    group_starts = np.concatenate([[0], np.cumsum(lens)[:-1]])
+    rel = np.arange(lens.sum()) - np.repeat(group_starts, lens)
+    old_blob = np.frombuffer(old.name_blob, dtype=np.uint8) if isinstance(old.name_blob, bytes) \
+        else old.name_blob
+    new_blob = np.frombuffer(new.name_blob, dtype=np.uint8) if isinstance(new.name_blob, bytes) \
+        else new.name_blob
+    mismatch = old_blob[np.repeat(old_start[same_len], lens) + rel] != \
+        new_blob[np.repeat(new_start[same_len], lens) + rel]
+    changed[same_len] = np.add.reduceat(mismatch, group_starts) > 0
+    return changed
+
+
+def diff_taxonomy(old_dbname,
+                  new_dbname):
+    """
+    This function compares two versions of a taxadb.sqlite file and lists the taxIDs whose lineage changed,
+    e.g. to re-age only the affected orthogroups after an update of the NCBI taxonomy
+    (see `of2orthomap.get_orthomap`).
+
+    Every taxID gets the first matching change of:
+    'deleted' (deleted or missing in the new version), 'merged' (merged into another taxID),
+    'lineage' (the parent of the taxID or of one of its ancestors changed),
+    'renamed' (the name of the taxID or of one of its ancestors changed) and 'new'.
+    Parent and name changes are propagated to all descendants with vectorized pointer jumping
+    on the parent arrays of the new version.
+
+    :param old_dbname: Path to the old taxadb.sqlite file.
+    :param new_dbname: Path to the new taxadb.sqlite file.
+    :return: DataFrame with the columns 'taxID' and 'change'.
+
+    :type old_dbname: str
+    :type new_dbname: str
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> changed = qlin.diff_taxonomy(old_dbname='taxadb.2024.sqlite',
+    >>>                              new_dbname='taxadb.sqlite')
+    >>> changed['change'].value_counts()
+    """
+    old = load_taxonomy_snapshot(dbname=old_dbname)
+    new = load_taxonomy_snapshot(dbname=new_dbname)
+    size = max(len(old.parent), len(new.parent))
+    old_parent = np.full(size, -1, dtype=np.int64)
+    old_parent[:len(old.parent)] = old.parent
+    new_parent = np.full(size, -1, dtype=np.int64)
+    new_parent[:len(new.parent)] = new.parent
+    old_valid = old_parent >= 0
+    new_valid = new_parent >= 0
+    common = np.flatnonzero(old_valid & new_valid)
+    moved = np.zeros(size, dtype=bool)
+    moved[common] = old_parent[common] != new_parent[common]
+    renamed = np.zeros(size, dtype=bool)
+    renamed[common] = _name_changed(old, new, common)
+    # pointer jumping: propagate changes of any ancestor down to its descendants
+    ancestor = np.where(new_valid, new_parent, new.root)
+    ancestor[new.root] = new.root
+    while np.any(ancestor[new_valid] != new.root):
+        moved = moved | moved[ancestor]
+        renamed = renamed | renamed[ancestor]
+        ancestor = ancestor[ancestor]
+    change = np.full(size, '', dtype=object)
+    change[new_valid & ~old_valid] = 'new'
+    change[renamed & old_valid & new_valid] = 'renamed'
+    change[moved & old_valid & new_valid] = 'lineage'
+    change[old_valid & ~new_valid] = 'deleted'
+    merged = [x for x, y in new.merged.items() if y is not None and x < size and old_valid[x]]
+    change[merged] = 'merged'
+    taxids = np.flatnonzero(change != '')
+    return pd.DataFrame({'taxID': taxids,
+                         'change': change[taxids].astype(str)})
+
+
+def get_qlin_batch(queries,
+                   lca=None,
+                   ncbi=None,
+                   dbname=None,
+                   ranks=None):
+    """
+    This function resolves many query species, given as names or taxIDs, over one taxonomic database handle
+    and returns their lineages as a table.
+
+    Names are resolved with `resolve_names` and all lineages are obtained together with `get_lineages`.
+    If a reference species taxID is given, the lowest common ancestor (LCA) of each query species and the
+    reference species is added together with its phylostratum number in the reference lineage.
+    If ranks are given, all lineages are projected onto them (see `QueryLineage.project`).
+
+    :param queries: A vector of species names or taxIDs.
+    :param lca: Reference species taxID.
+    :param ncbi: The NCBI taxonomic database.
+    :param dbname: Specify taxadb.sqlite file.
+    :param ranks: Project the lineages onto these ranks.
+    :return: DataFrame with the columns 'query', 'taxID', 'name', 'lineage', 'lineage_names' and, if a
+             reference species is given, 'LCA_taxID', 'LCA_name' and 'PSnum' (None for unresolved queries).
+
+    :type queries: list
+    :type lca: str
+    :type ncbi: dict
+    :type dbname: str
+    :type ranks: list or str
+    :rtype: pandas.DataFrame
+
+    Example
+    -------
+    >>> from oggmap import qlin
+    >>> qlin.get_qlin_batch(queries=['Danio rerio', '9606', 'Caenorhabditis elegans'],
+    >>>                     lca='10090',
+    >>>                     dbname='taxadb.sqlite')
+    """
+    ncbi = load_taxadb(ncbi=ncbi, dbname=dbname, cache=True)
+    queries = [str(x).strip() for x in queries]
+    names = resolve_names(names=[x for x in queries if not x.isdigit()],
+                          ncbi=ncbi)
+    taxids = [int(x) if x.isdigit() else names[x] for x in queries]
+    lineages = _get_lineage_zips([x for x in taxids if x is not None], ncbi)
+    query_lineages = [None if x is None else lineages[x] for x in taxids]
+    full_lineages = query_lineages
+    if ranks is not None:
+        lineage_taxids = np.unique([y for x in query_lineages if x is not None for y, z in x])
+        keep = set(lineage_taxids[np.isin(get_ranks(lineage_taxids, ncbi=ncbi),
+                                          np.asarray(_parse_ranks(ranks), dtype=object))].tolist())
+        query_lineages = [None if x is None else [y for y in x[:-1] if y[0] in keep or y[0] == 1] + x[-1:]
+                          for x in query_lineages]
+    batch_df = pd.DataFrame({'query': queries,
+                             'taxID': [None if x is None else x[-1][0] for x in query_lineages],
+                             'name': [None if x is None else x[-1][1] for x in query_lineages],
+                             'lineage': [None if x is None else [y for y, z in x] for x in query_lineages],
+                             'lineage_names': [None if x is None else [z for y, z in x] for x in query_lineages]})
+    if lca is not None:
+        reference_lineage = get_query_lineage(qt=lca,
+                                              quiet=True,
+                                              ncbi=ncbi,
+                                              ranks=ranks)
+        youngest_common = [None if x is None else reference_lineage.youngest_common([[y for y, z in x]])[0]
+                           for x in full_lineages]
+        batch_df['LCA_taxID'] = youngest_common
+        batch_df['LCA_name'] = [None if x is None else reference_lineage.qlineagenames_dict[x]
+                                for x in youngest_common]
+        batch_df['PSnum'] = [None if x is None else reference_lineage.ps_map[x] for x in youngest_common]
+    for column in ['taxID', 'LCA_taxID', 'PSnum']:
+        if column in batch_df.columns:
+            batch_df[column] = batch_df[column].astype('Int64')
+    return batch_df
+
+
+def write_qlin_batch(batch_df,
+                     out=None,
+                     out_format='tsv'):
+    """
+    This function writes the lineage table of `get_qlin_batch` as TSV, with lineages joined by ';',
+    or as JSON lines.
+
+    :param batch_df: Lineage table.
+    :param out: Output file (default: stdout).
+    :param out_format: Output format, either 'tsv' or 'jsonl'.
+
+    :type batch_df: pandas.DataFrame
+    :type out: str
+    :type out_format: str
+    """
+    outhandle = sys.stdout if out is None or out == '-' else open(out, 'w')
+    try:
+        if out_format == 'jsonl':
+            for row in batch_df.to_dict(orient='records'):
+                row = {x: None if not isinstance(y, list) and pd.isna(y) else y for x, y in row.items()}
+                outhandle.write(json.dumps({x: int(y) if isinstance(y, np.integer) else y
+                                            for x, y in row.items()}) + '\n')
+        else:
+            tsv_df = batch_df.copy()
+            for column in ['lineage', 'lineage_names']:
+                tsv_df[column] = [None if x is None else ';'.join([str(y) for y in x]) for x in tsv_df[column]]
+            tsv_df.to_csv(outhandle,
+                          sep='\t',
+                          index=False)
+    finally:
+        if outhandle is not sys.stdout:
+            outhandle.close()
+
+
+def read_queries(infile):
+    """
+    This function reads query species names or taxIDs, one per line, from a file or from stdin if `infile`
+    is '-'. Empty lines and lines starting with '#' are skipped.
+
+    :param infile: Input file.
+    :return: List of queries.
+
+    :type infile: str
+    :rtype: list
+    """
+    inhandle = sys.stdin if infile == '-' else open(infile, 'r')
+    try:
+        return [x.strip() for x in inhandle if x.strip() and not x.startswith('#')]
+    finally:
+        if inhandle is not sys.stdin:
+            inhandle.close()
+
+
 def main():
     """
     The main function that is being called when `qlin` is used via the terminal.
     """
     parser = define_parser()
     args = parser.parse_args()
-    print(args)
     if not args.dbname:
         print('\nError <-dbname> : Please specify taxadb.sqlite file')
         sys.exit()
+    if args.i:
+        write_qlin_batch(get_qlin_batch(queries=read_queries(args.i),
+                                        lca=args.lca,
+                                        dbname=args.dbname,
+                                        ranks=args.ranks),
+                         out=args.out,
+                         out_format=args.format)
+        sys.exit()
+    print(args)
     if not args.q and not args.qt:
         parser.print_help()
         print('\nError <-q> <-qt>: Please specify query species name or taxID')
@@ -364,7 +2288,8 @@ def main():
     get_qlin(q=args.q,
              qt=args.qt,
              quiet=False,
-             dbname=args.dbname)
+             dbname=args.dbname,
+             ranks=args.ranks)
 
 
 if __name__ == '__main__':
@@ -11,10 +11,9 @@ License: GPL-3
 
 import os
 import sys
-import zipfile
 import argparse
 import pandas as pd
-from oggmap import qlin
+from oggmap import aging, inputs, of2orthomap, qlin
 
 
 def define_parser():
@@ -70,11 +69,17 @@ def add_argparse_args(parser: argparse.ArgumentParser):
     parser.add_argument('-og',
                         help='specify OrthoFinder <Orthogroups.tsv> (see Orthogroups directory)')
     parser.add_argument('-out',
-                        help='specify output file <orthomap.tsv> (default: orthomap.tsv)',
-                        default='orthomap.tsv')
+                        help='specify output file <orthomap.tsv> (default: orthomap.<-format>)')
     parser.add_argument('-overwrite',
                         help='specify if existing output file should be overwritten (default: True)',
                         action='store_true')
+    parser.add_argument('-ranks',
+                        help='project query lineage onto a comma-separated rank set, '
+                             'e.g. phylum,class,order,family,genus')
+    parser.add_argument('-format',
+                        help='specify output file format (default: tsv)',
+                        choices=['tsv', 'parquet', 'feather'],
+                        default='tsv')
     parser.add_argument('-dbname',
                         help='taxadb.sqlite file')
 
@@ -89,7 +94,10 @@ def get_orthomap(seqname,
                  continuity=True,
                  overwrite=True,
                  ncbi=None,
-                 dbname=None):
+                 dbname=None,
+                 query_lineage=None,
+                 ranks=None,
+                 out_format='tsv'):
     """
     This function return an orthomap for a given query species and OrthoFinder input data.
 
@@ -104,6 +112,11 @@ def get_orthomap(seqname,
     :param overwrite: Specify if output should be overwritten.
     :param ncbi: The NCBI taxonomic database.
     :param dbname: Specify taxadb.sqlite file.
+    :param query_lineage: Precomputed query lineage (see `qlin.get_query_lineage`) to be used instead of
+                          querying the lineage of the query species again.
+    :param ranks: Project the query lineage onto these ranks, e.g. ['phylum', 'class', 'order', 'family', 'genus']
+                  (see `qlin.QueryLineage.project`).
+    :param out_format: Output file format: 'tsv', 'parquet' or 'feather' (see `of2orthomap.write_orthomap`).
     :return: A list of results such as:
              orthomap, species_list, youngest_common_counts
 
@@ -118,6 +131,9 @@ def get_orthomap(seqname,
     :type overwrite: bool
     :type ncbi: dict
     :type dbname: str
+    :type query_lineage: oggmap.qlin.QueryLineage
+    :type ranks: list or str
+    :type out_format: str
     :rtype: list
 
     Example
@@ -137,169 +153,71 @@ def get_orthomap(seqname,
     >>>     dbname='taxadb.sqlite')
     >>> query_orthomap
     """
-    outhandle = None
-    og_continuity_score = None
     ncbi = qlin.load_taxadb(ncbi=ncbi,
-                            dbname=dbname)
-    qname, \
-        qtid, \
-        qlineage, \
-        qlineagenames_dict, \
-        qlineagezip, \
-        qlineagenames, \
-        qlineagerev, \
-        qk = qlin.get_qlin(qt=qt,
-                           quiet=True,
-                           ncbi=ncbi)
-    query_lineage_topo = qlin.get_lineage_topo(qt=qt,
+                            dbname=dbname,
+                            cache=True)
+    if query_lineage is None:
+        query_lineage = qlin.get_query_lineage(qt=qt,
+                                               quiet=True,
                                                ncbi=ncbi)
+    if ranks is not None:
+        query_lineage = query_lineage.project(ranks)
+    qname = query_lineage.qname
     species_list = pd.read_csv(sl,
                                sep='\t',
                                header=None)
     species_list.columns = ['species', 'taxID']
-    # species_list['lineage'] = species_list.apply(lambda x: ncbi.get_lineage(x.iloc[1]),
-    #                                             axis=1)
-    species_list['lineage'] = species_list.apply(lambda x: qlin.ncbi_get_lineage(qt=x.iloc[1],
-                                                                                 ncbi=ncbi),
-                                                 axis=1)
-    species_list['youngest_common'] = [qlin.get_youngest_common(qlineage, x) for x in species_list.lineage]
-    species_list['youngest_name'] = [list(x.values())[0] for x in [qlin.ncbi_get_taxid_translator(qt_vec=[x],
-                                                                                                  ncbi=ncbi)
-                                                                   for x in list(species_list.youngest_common)]]
+    species_list = aging.add_youngest_common(query_lineage,
+                                             species_list,
+                                             ncbi=ncbi)
     if not quiet:
         print(seqname)
         print(qname)
         print(qt)
         print(species_list)
-    youngest_common_counts_df = get_youngest_common_counts(qlineage,
-                                                           species_list)
-    for node in qlin.traverse_postorder(query_lineage_topo.root):
-        if node.name:
-            nsplit = node.name.split('/')
-            if len(nsplit) == 3:
-                node.species_count = list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-                    [int(nsplit[1])])].counts)[0]
-            # node.add_feature('species_count',
-            #                 list(youngest_common_counts_df[youngest_common_counts_df.PStaxID.isin(
-            #                     [int(nsplit[1])])].counts)[0])
-    oc_og_dict = {}
-    continuity_dict = {}
-    if os.path.basename(oc).split('.')[-1] == 'zip':
-        oc_zip = zipfile.Path(oc, at='.'.join(os.path.basename(oc).split('.')[:-1]))
-        oc_lines = oc_zip.open()
-    else:
-        oc_lines = open(oc,
-                        'r')
-    oc_species = next(oc_lines)
-    if type(oc_species) == bytes:
-        oc_species = oc_species.decode('utf-8').strip().split('\t')
-    else:
-        oc_species = oc_species.strip().split('\t')
-    oc_qidx = [x for x, y in enumerate(oc_species) if y == seqname]
-    if len(oc_qidx) == 0:
-        print('\nError <-qname>: query species name not in orthofinder results, please check spelling\n'
-              'e.g. <head -1 Orthogroups.GeneCounts.tsv>')
-        sys.exit()
-    for oc_line in oc_lines:
-        if type(oc_line) == bytes:
+    og_names = []
+    og_species = []
+    with inputs.open_input(oc) as oc_lines:
+        oc_species = next(oc_lines).decode('utf-8').strip().split('\t')
+        oc_qidx = [x for x, y in enumerate(oc_species) if y == seqname]
+        if len(oc_qidx) == 0:
+            print('\nError <-qname>: query species name not in orthofinder results, please check spelling\n'
+                  'e.g. <head -1 Orthogroups.GeneCounts.tsv>')
+            sys.exit()
+        for oc_line in oc_lines:
             oc_og = oc_line.decode('utf-8').strip().split('\t')
-        else:
-            oc_og = oc_line.strip().split('\t')
-        if int(oc_og[oc_qidx[0]]) == 0:
-            continue
-        if int(oc_og[oc_qidx[0]]) > 0:
-            oc_og_hits = [oc_species[x + 1] for x, y in enumerate(oc_og[1::][::-1][1::][::-1]) if int(y) > 0]
-            # get list of the youngest common between query and all other species
-            oc_og_hits_youngest_common = list(species_list.youngest_common[
-                                                  [x for x, y in enumerate(species_list.species)
-                                                   if y in oc_og_hits]])
-            # evaluate all youngest common nodes to retain the oldest of them and assign as the orthogroup
-            # ancestral state (gene age)
-            if len(oc_og_hits_youngest_common) > 0:
-                oc_og_oldest_common = qlin.get_oldest_common(qlineage,
-                                                             oc_og_hits_youngest_common)
-                oc_og_dict[oc_og[0]] = oc_og_oldest_common
-                if continuity:
-                    continuity_dict[oc_og[0]] = get_youngest_common_counts(
-                        qlineage,
-                        pd.DataFrame(oc_og_hits_youngest_common,
-                                     columns=['youngest_common'])).counts
-    oc_lines.close()
-    if continuity:
-        youngest_common_counts_df = youngest_common_counts_df.join(pd.DataFrame.from_dict(continuity_dict))
-    omap = []
+            if int(oc_og[oc_qidx[0]]) > 0:
+                og_names.append(oc_og[0])
+                # the last column holds the total counts
+                og_species.append([oc_species[x + 1] for x, y in enumerate(oc_og[1:-1]) if int(y) > 0])
     if out:
         if os.path.exists(out) and not overwrite:
             print('\nError <-overwrite>: output file exists, please set to True if it should be overwritten\n')
             sys.exit()
-        outhandle = open(out,
-                         'w')
-        if continuity:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\tPScontinuity\n')
-        else:
-            outhandle.write('seqID\tOrthogroup\tPSnum\tPStaxID\tPSname\n')
-    if os.path.basename(og).split('.')[-1] == 'zip':
-        og_zip = zipfile.Path(og,
-                              at='.'.join(os.path.basename(og).split('.')[:-1]))
-        og_lines = og_zip.open()
-    else:
-        og_lines = open(og,
-                        'r')
-    og_species = next(og_lines)
-    if type(og_species) == bytes:
-        og_species = og_species.decode('utf-8').strip().split('\t')
-    else:
-        og_species = og_species.strip().split('\t')
-    og_qidx = [x for x, y in enumerate(og_species) if y == seqname]
-    if len(oc_qidx) == 0:
-        print('\nError <-qname>: query species name not in orthofinder results, please check spelling\n'
-              'e.g. <head -1 Orthogroups.tsv>')
-        sys.exit()
-    for og_line in og_lines:
-        if type(og_line) == bytes:
+    og_genes_dict = {}
+    with inputs.open_input(og) as og_lines:
+        og_header = next(og_lines).decode('utf-8').strip().split('\t')
+        og_qidx = [x for x, y in enumerate(og_header) if y == seqname]
+        if len(og_qidx) == 0:
+            print('\nError <-qname>: query species name not in orthofinder results, please check spelling\n'
+                  'e.g. <head -1 Orthogroups.tsv>')
+            sys.exit()
+        for og_line in og_lines:
             og_og = og_line.decode('utf-8').strip().split('\t')
-        else:
-            og_og = og_line.strip().split('\t')
-        if og_og[0] not in oc_og_dict:
-            continue
-        else:
-            og_ps = qlineagenames[qlineagenames['PStaxID'] ==
-                                  str(oc_og_dict[og_og[0]])].values.tolist()[0]
-            og_ps_join = '\t'.join(og_ps)
-            if continuity:
-                og_continuity_score = get_continuity_score(og_name=og_og[0],
-                                                           youngest_common_counts_df=youngest_common_counts_df)
-            if out:
-                if continuity:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_og[0] + '\t' + og_ps_join + '\t' +
-                                     str(og_continuity_score) + '\n') for x in og_og[og_qidx[0]].split(',')]
-                else:
-                    [outhandle.write(x.replace(' ', '') + '\t' + og_og[0] + '\t' + og_ps_join + '\n')
-                     for x in og_og[og_qidx[0]].split(',')]
-        if continuity:
-            omap += [[x.replace(' ', ''), og_og[0], og_ps[0], og_ps[1], og_ps[2], og_continuity_score]
-                     for x in og_og[og_qidx[0]].split(',')]
-        else:
-            omap += [[x.replace(' ', ''), og_og[0], og_ps[0], og_ps[1], og_ps[2]]
-                     for x in og_og[og_qidx[0]].split(',')]
-    og_lines.close()
+            og_genes_dict[og_og[0]] = og_og[og_qidx[0]].replace(' ', '').split(',')
+    og_presence = aging.get_presence_matrix(og_species=og_species,
+                                            species=list(species_list.species))
+    og_genes = [og_genes_dict.get(x, []) for x in og_names]
+    omap_df, youngest_common_counts_df = aging.get_orthomap(query_lineage=query_lineage,
+                                                            species_list=species_list,
+                                                            og_names=og_names,
+                                                            presence=og_presence,
+                                                            og_genes=og_genes,
+                                                            continuity=continuity)
     if out:
-        outhandle.close()
-    omap_df = pd.DataFrame(omap)
-    if continuity:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname',
-                           'PScontinuity']
-    else:
-        omap_df.columns = ['seqID',
-                           'Orthogroup',
-                           'PSnum',
-                           'PStaxID',
-                           'PSname']
-    omap_df['PSnum'] = [int(x) for x in list(omap_df['PSnum'])]
+        of2orthomap.write_orthomap(omap_df,
+                                   out,
+                                   out_format=out_format)
     return [omap_df,
             species_list,
             youngest_common_counts_df]
@@ -457,11 +375,13 @@ def main():
                  sl=args.sl,
                  oc=args.oc,
                  og=args.og,
-                 out=args.out,
+                 out=of2orthomap.get_default_out(args.out, args.format),
                  quiet=False,
                  continuity=True,
                  overwrite=args.overwrite,
-                 dbname=args.dbname)
+                 dbname=args.dbname,
+                 ranks=args.ranks,
+                 out_format=args.format)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import pytest
+import numpy as np
+import pandas as pd
+from oggmap import aging, of2orthomap, qlin
+
+
+dbname = '/tmp/taxadb.sqlite'
+
+
+def test_get_presence_matrix():
+    presence = aging.get_presence_matrix(og_species=[[7955, 10090, 7955], [3702, 1], []],
+                                         species=[7955, 10090, 3702])
+    assert presence.dtype == bool
+    assert presence.toarray().tolist() == [[True, True, False],
+                                           [False, False, True],
+                                           [False, False, False]]
+    presence = aging.get_presence_matrix(og_species=[[7955, 10090], [3702]],
+                                         species=[7955, 3702, 7955])
+    assert presence.toarray().tolist() == [[True, False, True],
+                                           [False, True, False]]
+
+
+def test_get_continuity_scores():
+    qlineage = [1, 131567, 2759, 33154, 33208]
+    species_list = pd.DataFrame({'youngest_common': [131567, 2759, 33208, 33208]})
+    youngest_common_counts_df = aging.get_youngest_common_counts(qlineage,
+                                                                 species_list)
+    values = [131567, 33208, 2759, 33208, 33208]
+    offsets = [0, 2, 4, 5]
+    continuity_matrix = aging.get_continuity_matrix(qlineage=qlineage,
+                                                    values=values,
+                                                    offsets=offsets)
+    assert continuity_matrix.shape == (3, 5)
+    assert continuity_matrix.toarray()[1].tolist() == [0, 0, 1, 0, 1]
+    with pytest.raises(ValueError):
+        aging.get_continuity_matrix(qlineage=qlineage,
+                                    values=[131567, 7955],
+                                    offsets=[0, 2])
+    og_scores = aging.get_continuity_scores(continuity_matrix,
+                                            youngest_common_counts_df)
+    for og_idx, og_score in enumerate(og_scores):
+        og_counts = aging.get_youngest_common_counts(
+            qlineage,
+            pd.DataFrame(values[offsets[og_idx]:offsets[og_idx + 1]],
+                         columns=['youngest_common'])).counts
+        og_df = youngest_common_counts_df.join(pd.DataFrame({'OG': og_counts}))
+        assert og_score == of2orthomap.get_continuity_score('OG', og_df)
+
+
+def test_get_orthomap():
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname)
+    query_lineage = qlin.get_query_lineage(qt='7955',
+                                           quiet=True,
+                                           ncbi=ncbi)
+    species_list = aging.add_youngest_common(query_lineage,
+                                             pd.DataFrame({'taxID': [7955, 10090, 3702]}),
+                                             ncbi=ncbi)
+    presence = aging.get_presence_matrix(og_species=[[7955, 10090], [7955, 3702], [7955], [10090]],
+                                         species=list(species_list.taxID))
+    omap_df, youngest_common_counts_df = aging.get_orthomap(query_lineage=query_lineage,
+                                                            species_list=species_list,
+                                                            og_names=['OG1', 'OG2', 'OG3', 'OG4'],
+                                                            presence=presence,
+                                                            og_genes=[['g1', 'g2'], ['g3'], ['g4'], []])
+    assert list(omap_df.columns) == ['seqID', 'Orthogroup', 'PSnum', 'PStaxID', 'PSname', 'PScontinuity']
+    assert omap_df['Orthogroup'].dtype == 'category'
+    assert omap_df['PStaxID'].dtype == 'category'
+    assert omap_df['PSname'].dtype == 'category'
+    assert omap_df['PSnum'].dtype == np.int8
+    assert omap_df['PScontinuity'].dtype == np.float32
+    assert list(omap_df['seqID']) == ['g1', 'g2', 'g3', 'g4']
+    assert list(omap_df['PStaxID']) == ['117571', '117571', '2759', '7955']
+    assert list(omap_df['PSnum']) == [query_lineage.ps_map[x] for x in [117571, 117571, 2759, 7955]]
+    assert youngest_common_counts_df['counts'][117571] == 1
+    og_ps, og_continuity = aging.age_orthogroups(query_lineage,
+                                                 aging.get_presence_matrix([[], [10090]],
+                                                                           list(species_list.taxID)),
+                                                 species_list['youngest_common'],
+                                                 continuity=False)
+    assert list(og_ps) == [-1, query_lineage.ps_map[117571]]
+    assert og_continuity is None
+
+
+def test_get_orthomap_previous():
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname)
+    lineages = qlin.get_lineages(taxids=[7955, 10090, 3702],
+                                 ncbi=ncbi)
+    species_list = pd.DataFrame({'species': ['drer', 'mmus', 'atha'],
+                                 'taxID': [7955, 10090, 3702],
+                                 'lineage': lineages})
+    oc = [np.array(['OG1', 'OG2', 'OG3', 'OG4'], dtype=object),
+          ['drer', 'mmus', 'atha'],
+          np.array([[2, 1, 0], [1, 0, 1], [1, 0, 0], [0, 1, 1]], dtype=np.int32)]
+    og = [['OG1', 'g1, g2'], ['OG2', 'g3'], ['OG3', 'g4'], ['OG4', '']]
+    previous = of2orthomap.get_orthomap('drer', '7955', species_list, oc, og,
+                                        quiet=True, ncbi=ncbi)[0]
+    # mouse moves out of Euteleostomi, which no other species occupies, directly below Eukaryota
+    species_list_changed = species_list.copy()
+    species_list_changed.at[1, 'lineage'] = [1, 131567, 2759, 10090]
+    full = of2orthomap.get_orthomap('drer', '7955', species_list_changed, oc, og,
+                                    quiet=True, ncbi=ncbi)[0]
+    incremental = of2orthomap.get_orthomap('drer', '7955', species_list_changed, oc, og,
+                                           quiet=True, ncbi=ncbi, previous=previous, changed=[10090])[0]
+    assert list(previous['PStaxID']) == ['117571', '117571', '2759', '7955']
+    assert list(full['PStaxID']) == ['2759', '2759', '2759', '7955']
+    assert list(previous['PScontinuity'][2:]) != list(full['PScontinuity'][2:])
+    pd.testing.assert_frame_equal(incremental, full)
+    previous_ps, affected_species = of2orthomap.get_previous_ps(previous=previous,
+                                                                changed=[10090],
+                                                                qlineage=[1, 131567, 2759],
+                                                                species_list=species_list)
+    assert previous_ps['OG2'] == ['2', '2759', 'Eukaryota']
+    assert affected_species == {'mmus'}
+    assert of2orthomap.get_previous_ps(previous=previous,
+                                       changed=[2759],
+                                       qlineage=[1, 131567, 2759],
+                                       species_list=species_list) == [{}, set()]
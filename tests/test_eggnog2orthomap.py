@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import argparse
+from oggmap import __main__, eggnog2orthomap
+
+
+lines = [b'2759\tE0000000\t2\t3\t7955,10090\t7955.g1,7955.g2,10090.g3\n',
+         b'33208\tE0000001\t2\t2\t10090,9606\t10090.g4,9606.g5\n',
+         b'\n',
+         b'2759\tE0000003\t0\t0\t\t\n',
+         b'7742\tE0000002\t2\t2\t79550,7955\t79550.g6,7955.g7\n']
+
+
+def test_define_parser():
+    parse = eggnog2orthomap.define_parser()
+    assert isinstance(parse, argparse.ArgumentParser)
+
+
+def test_get_eggnog_index(tmp_path):
+    og = str(tmp_path / 'e6.og2seqs_and_species.tsv')
+    with open(og, 'wb') as handle:
+        handle.write(b''.join(lines))
+    for processes in [1, 2]:
+        og_index = eggnog2orthomap.get_eggnog_index(og,
+                                                    str(tmp_path / ('cache_%d' % processes)),
+                                                    processes=processes)
+        assert os.path.basename(og_index).startswith('eggnog_')
+        assert eggnog2orthomap.get_eggnog_index(og, str(tmp_path / ('cache_%d' % processes))) == og_index
+        assert eggnog2orthomap.read_eggnog_index(og_index, og, 7955) == [lines[0], lines[4]]
+        assert eggnog2orthomap.read_eggnog_index(og_index, og, 10090) == lines[:2]
+        assert eggnog2orthomap.read_eggnog_index(og_index, og, 1) == []
+    ogs_dict, species_list = eggnog2orthomap._parse_eggnog_lines(lines, 7955)
+    assert list(ogs_dict) == ['E0000000', 'E0000002']
+    assert ogs_dict['E0000002'][2] == ['7955.g7']
+    assert eggnog2orthomap._parse_eggnog_lines(eggnog2orthomap.read_eggnog_index(og_index, og, 7955),
+                                               7955) == [ogs_dict, species_list]
+
+
+def test_parse_eggnog_lines_level():
+    ogs_dict, species_list = eggnog2orthomap._parse_eggnog_lines(lines, 7955, level=[7742])
+    assert list(ogs_dict) == ['E0000002']
+    assert sorted(species_list) == ['7955', '79550']
+    ogs_dict, species_list = eggnog2orthomap._parse_eggnog_lines(lines, 7955, level=[2759, 7742])
+    assert list(ogs_dict) == ['E0000000', 'E0000002']
+    assert eggnog2orthomap._parse_eggnog_lines(lines, 7955, level=[33208]) == [{}, []]
+
+
+def test_main_arguments(monkeypatch):
+    calls = []
+    monkeypatch.setattr(eggnog2orthomap, 'get_eggnog_orthomap', lambda *args, **kwargs: calls.append(kwargs))
+    argv = ['-qt', '7955', '-og', 'e6.og2seqs_and_species.tsv', '-dbname', 'taxadb.sqlite',
+            '-cache', 'oggmap_cache', '-level', '7742']
+    monkeypatch.setattr(sys, 'argv', ['oggmap', 'eggnog2orthomap'] + argv)
+    __main__.main()
+    monkeypatch.setattr(sys, 'argv', ['eggnog2orthomap'] + argv)
+    eggnog2orthomap.main()
+    # the default output file follows the output file format
+    monkeypatch.setattr(sys, 'argv', ['eggnog2orthomap'] + argv + ['-format', 'parquet'])
+    eggnog2orthomap.main()
+    monkeypatch.setattr(sys, 'argv', ['eggnog2orthomap'] + argv + ['-format', 'parquet', '-out', 'danio.pq'])
+    eggnog2orthomap.main()
+    assert len(calls) == 4
+    for kwargs in calls:
+        assert kwargs['cache'] == 'oggmap_cache'
+        assert kwargs['level'] == '7742'
+    assert [x['out'] for x in calls] == ['orthomap.tsv', 'orthomap.tsv', 'orthomap.parquet', 'danio.pq']
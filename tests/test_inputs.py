@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import bz2
+import gzip
+import lzma
+import shutil
+import zipfile
+import subprocess
+import pytest
+from oggmap import inputs
+
+
+lines = [b'Orthogroup\tspecies1\tspecies2\n',
+         b'OG0000000\tgene1, gene2\tgene3\n',
+         b'OG0000001\t\tgene4\n']
+
+
+def _write_inputs(tmp_path):
+    paths = {}
+    paths[None] = tmp_path / 'Orthogroups.tsv'
+    paths[None].write_bytes(b''.join(lines))
+    paths['gz'] = tmp_path / 'Orthogroups.tsv.gz'
+    paths['gz'].write_bytes(gzip.compress(b''.join(lines)))
+    paths['bz2'] = tmp_path / 'Orthogroups.tsv.bz2'
+    paths['bz2'].write_bytes(bz2.compress(b''.join(lines)))
+    paths['xz'] = tmp_path / 'Orthogroups.tsv.xz'
+    paths['xz'].write_bytes(lzma.compress(b''.join(lines)))
+    # magic bytes are used, not the file extension
+    paths['zip'] = tmp_path / 'Orthogroups.tsv.zip'
+    with zipfile.ZipFile(paths['zip'], 'w') as zip_handle:
+        zip_handle.writestr('Orthogroups.tsv', b''.join(lines))
+    return paths
+
+
+def test_get_compression(tmp_path):
+    for compression, path in _write_inputs(tmp_path).items():
+        assert inputs.get_compression(str(path)) == compression
+
+
+def test_open_input(tmp_path):
+    for compression, path in _write_inputs(tmp_path).items():
+        with inputs.open_input(str(path)) as handle:
+            assert list(handle) == lines
+        with inputs.open_input(str(path), threads=2) as handle:
+            assert list(handle) == lines
+        with inputs.open_text(str(path)) as handle:
+            assert list(handle) == [x.decode('utf-8') for x in lines]
+
+
+@pytest.mark.skipif(inputs.zstandard is None and shutil.which('zstd') is None,
+                    reason='requires zstandard or zstd')
+def test_open_input_zstd(tmp_path):
+    path = tmp_path / 'Orthogroups.tsv'
+    path.write_bytes(b''.join(lines))
+    if inputs.zstandard is not None:
+        (tmp_path / 'Orthogroups.tsv.zst').write_bytes(inputs.zstandard.ZstdCompressor().compress(b''.join(lines)))
+    else:
+        subprocess.run(['zstd', '-q', str(path)], check=True)
+    assert inputs.get_compression(str(tmp_path / 'Orthogroups.tsv.zst')) == 'zst'
+    with inputs.open_input(str(tmp_path / 'Orthogroups.tsv.zst')) as handle:
+        assert list(handle) == lines
+
+
+@pytest.mark.skipif(shutil.which('zstd') is None,
+                    reason='requires zstd')
+def test_open_input_truncated(tmp_path):
+    path = tmp_path / 'Orthogroups.tsv'
+    path.write_bytes(b''.join(b'OG%07d\tgene%d\n' % (x, x) for x in range(100000)))
+    subprocess.run(['zstd', '-q', str(path)], check=True)
+    zst_bytes = (tmp_path / 'Orthogroups.tsv.zst').read_bytes()
+    (tmp_path / 'Orthogroups.tsv.zst').write_bytes(zst_bytes[:len(zst_bytes) // 2])
+    with pytest.raises(OSError):
+        with inputs.open_input(str(tmp_path / 'Orthogroups.tsv.zst'), threads=2) as handle:
+            list(handle)
+    # closing before the end of the output does not fail
+    with inputs.open_input(str(tmp_path / 'Orthogroups.tsv.zst'), threads=2) as handle:
+        assert next(handle) == b'OG0000000\tgene0\n'
+
+
+def test_get_file_stamp(tmp_path):
+    path = tmp_path / 'Orthogroups.tsv'
+    path.write_bytes(b''.join(lines))
+    file_stamp = inputs.get_file_stamp(str(path))
+    assert file_stamp == inputs.get_file_stamp(str(path))
+    path.write_bytes(b''.join(lines[:2]))
+    assert file_stamp != inputs.get_file_stamp(str(path))
+
+
+def test_read_table(tmp_path):
+    path = tmp_path / 'orthomap.tsv.gz'
+    path.write_bytes(gzip.compress(b'seqID\tPSnum\ng1\t1\ng2\t3\n'))
+    table = inputs.read_table(str(path))
+    assert list(table.columns) == ['seqID', 'PSnum']
+    assert list(table['PSnum']) == [1, 3]
+    pytest.importorskip('pyarrow')
+    table.to_parquet(str(tmp_path / 'orthomap.parquet'))
+    table.to_feather(str(tmp_path / 'orthomap.feather'))
+    assert inputs.read_table(str(tmp_path / 'orthomap.parquet')).equals(table)
+    assert inputs.read_table(str(tmp_path / 'orthomap.feather')).equals(table)
@@ -2,6 +2,9 @@
 # -*- coding: UTF-8 -*-
 
 import os
+import sys
+import shutil
+import pytest
 import argparse
 from unittest.mock import patch
 from oggmap import ncbitax
@@ -24,4 +27,18 @@ def test_update_ncbi():
         update_args.dbname = os.path.expanduser('/tmp/taxadb.sqlite')
         update_args.force = True
         ncbitax.update_ncbi(update_args)
-        assert os.path.exists(path)
\ No newline at end of file
+        assert os.path.exists(path)
+
+
+def test_main_diff(tmp_path, capsys, monkeypatch):
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    old_dbname = str(tmp_path / 'taxadb.old.sqlite')
+    shutil.copy(dbname, old_dbname)
+    monkeypatch.setattr(sys, 'argv', ['ncbitax', '-diff', old_dbname, '-dbname', dbname])
+    with pytest.raises(SystemExit):
+        ncbitax.main()
+    assert capsys.readouterr().out.split('\t')[0] == 'taxID'
+    monkeypatch.setattr(sys, 'argv', ['ncbitax', '-diff', old_dbname, '-dbname', str(tmp_path / 'missing.sqlite')])
+    with pytest.raises(SystemExit):
+        ncbitax.main()
+    assert 'Error <-dbname>' in capsys.readouterr().out
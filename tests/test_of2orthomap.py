@@ -2,8 +2,9 @@
 # -*- coding: UTF-8 -*-
 
 import argparse
+import numpy as np
 import pandas as pd
-from oggmap import datasets, of2orthomap
+from oggmap import datasets, inputs, of2orthomap
 
 
 ensembl113_last_oc, ensembl113_last_og, ensembl113_last_sl = datasets.ensembl113_last(datapath='/tmp')
@@ -45,3 +46,95 @@ def test_of2orthomap_continuity_true():
     assert (query_orthomap.columns == ['seqID', 'Orthogroup', 'PSnum', 'PStaxID', 'PSname', 'PScontinuity']).all()
     assert isinstance(orthofinder_species_list, pd.DataFrame)
     assert isinstance(of_species_abundance, pd.DataFrame)
+
+
+def test_read_gene_counts():
+    og_names, species, counts = of2orthomap.read_gene_counts(oc=ensembl113_last_oc)
+    assert counts.dtype == np.int32
+    assert counts.shape == (len(og_names), len(species))
+    assert '7955.danio_rerio.pep' in species
+    assert 'Total' not in species
+
+
+def test_read_orthogroups():
+    og_rows = of2orthomap.read_orthogroups(og=ensembl113_last_og,
+                                           seqname='7955.danio_rerio.pep')
+    og_names = [x[0] for x in og_rows[:2]]
+    og_rows_subset = of2orthomap.read_orthogroups(og=ensembl113_last_og,
+                                                  seqname=['7955.danio_rerio.pep'],
+                                                  ogs=set(og_names))
+    assert og_rows_subset == og_rows[:2]
+
+
+def test_get_orthomaps():
+    orthomaps = of2orthomap.get_orthomaps(seqnames=['7955.danio_rerio.pep'],
+                                          sl=ensembl113_last_sl,
+                                          oc=ensembl113_last_oc,
+                                          og=ensembl113_last_og,
+                                          continuity=False,
+                                          quiet=True,
+                                          dbname=dbname)
+    query_orthomap, _, _ = of2orthomap.get_orthomap(
+        seqname='7955.danio_rerio.pep',
+        qt='7955',
+        oc=ensembl113_last_oc,
+        og=ensembl113_last_og,
+        sl=ensembl113_last_sl,
+        continuity=False,
+        quiet=True,
+        dbname=dbname)
+    assert orthomaps['7955.danio_rerio.pep'][0].equals(query_orthomap)
+
+
+def test_get_byte_ranges(tmp_path):
+    path = str(tmp_path / 'Orthogroups.tsv')
+    lines = [b'Orthogroup\tA\tB'] + [b'OG%07d\ta%d\tb%d' % (x, x, x) for x in range(100)]
+    with open(path, 'wb') as handle:
+        handle.write(b'\n'.join(lines) + b'\n')
+    byte_ranges = of2orthomap.get_byte_ranges(path, 7)
+    assert len(byte_ranges) == 7
+    assert sum([of2orthomap.read_byte_range(path, x, y) for x, y in byte_ranges], []) == lines[1:]
+    assert of2orthomap.read_orthogroups(path, 'B', processes=2) == [[x.split(b'\t')[0].decode('utf-8'),
+                                                                      x.split(b'\t')[2].decode('utf-8')]
+                                                                     for x in lines[1:]]
+
+
+def test_parse_orthogroups_lines():
+    lines = [b'OG0000000\ta1, a2\tb1\n', b'\n', b'OG0000001\t\tb2\r\n', b'']
+    assert of2orthomap._parse_orthogroups_lines(lines, [2, 1]) == [['OG0000000', 'b1', 'a1, a2'],
+                                                                  ['OG0000001', 'b2', '']]
+    assert of2orthomap._parse_orthogroups_lines(lines, [1], ogs={b'OG0000001'}) == [['OG0000001', '']]
+
+
+def test_write_orthomap(tmp_path):
+    omap_df = pd.DataFrame({'seqID': ['g1', 'g2', 'g3'],
+                            'Orthogroup': ['OG0000000', 'OG0000000', 'OG0000001'],
+                            'PSnum': [1, 1, 5],
+                            'PStaxID': ['131567', '131567', '7742'],
+                            'PSname': ['cellular organisms', 'cellular organisms', 'Vertebrata'],
+                            'PScontinuity': [1.0, 1.0, 0.5]})
+    for out_format in ['tsv', 'parquet', 'feather']:
+        out = str(tmp_path / ('orthomap.' + out_format))
+        of2orthomap.write_orthomap(omap_df, out, out_format=out_format)
+        omap_read = inputs.read_table(out)
+        assert (omap_read.columns == omap_df.columns).all()
+        assert (omap_read.astype(str).values == omap_df.astype(str).values).all()
+
+def test_get_orthofinder_cache(tmp_path):
+    oc = str(tmp_path / 'Orthogroups.GeneCount.tsv')
+    og = str(tmp_path / 'Orthogroups.tsv')
+    with open(oc, 'w') as handle:
+        handle.write('Orthogroup\tA\tB\tTotal\nOG0000000\t2\t1\t3\nOG0000001\t0\t1\t1\nOG0000002\t1\t0\t1\n')
+    with open(og, 'w') as handle:
+        handle.write('Orthogroup\tA\tB\nOG0000000\ta1, a2\tb1\nOG0000001\t\tb2\nOG0000002\ta3\n')
+    og_cache = of2orthomap.get_orthofinder_cache(oc, og, str(tmp_path / 'cache'))
+    assert of2orthomap.get_orthofinder_cache(oc, og, str(tmp_path / 'cache')) == og_cache
+    gene_counts = of2orthomap.read_gene_counts(oc)
+    cached_gene_counts = of2orthomap.read_cached_gene_counts(og_cache)
+    assert list(cached_gene_counts[0]) == list(gene_counts[0])
+    assert cached_gene_counts[1] == gene_counts[1]
+    assert (cached_gene_counts[2] == gene_counts[2]).all()
+    assert cached_gene_counts[2].flags['F_CONTIGUOUS']
+    for seqname, ogs in [['A', None], [['B', 'A'], {'OG0000001'}]]:
+        assert of2orthomap.read_cached_orthogroups(og_cache, seqname, ogs=ogs) == \
+               of2orthomap.read_orthogroups(og, seqname, ogs=ogs)
@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+import argparse
+from oggmap import orthomcl2orthomap
+
+
+dbname = '/tmp/taxadb.sqlite'
+
+
+def test_define_parser():
+    parse = orthomcl2orthomap.define_parser()
+    assert isinstance(parse, argparse.ArgumentParser)
+
+
+def test_get_orthomcl_orthomap(tmp_path, capsys):
+    sl = tmp_path / 'genomeSummary_OrthoMCL-6.16.txt'
+    sl.write_text('THREE_LETTER_ABBREV\tNAME\n'
+                  'drer\tDanio rerio\n'
+                  'mmus\tMus musculus\n'
+                  'atha\tArabidopsis thaliana\n')
+    og = tmp_path / 'groups_OrthoMCL-6.16.txt'
+    og.write_text('OG6_100000: drer|g1 drer|g2 mmus|g3\n'
+                  'OG6_100001: atha|g4 drer|g5\n'
+                  'OG6_100002: mmus|g6 atha|g7\n')
+    out = tmp_path / 'orthomap.tsv'
+    omap_df, species_list, youngest_common_counts_df = orthomcl2orthomap.get_orthomcl_orthomap(
+        tla='drer',
+        sl=str(sl),
+        og=str(og),
+        out=str(out),
+        quiet=False,
+        continuity=True,
+        overwrite=True,
+        dbname=dbname)
+    assert 'drer' in capsys.readouterr().out
+    assert out.exists()
+    assert list(omap_df['seqID']) == ['g1', 'g2', 'g5']
+    assert list(omap_df['PStaxID']) == ['117571', '117571', '2759']
@@ -2,10 +2,16 @@
 # -*- coding: UTF-8 -*-
 
 import os
+import shutil
+import pickle
+import sqlite3
+import pytest
 import argparse
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from Bio.Phylo.Newick import Tree
-from oggmap import qlin
+from oggmap import ncbitax, qlin
 
 
 def test_define_parser():
@@ -80,3 +86,266 @@ def test_oldest_common():
     ql = ['A', 'B', 'C']
     tl = ['Q', 'N', 'A', 'C', 'B']
     assert qlin.get_oldest_common(ql, tl) == 'A'
+
+
+def test_taxonomy_snapshot():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    snapshot = qlin.load_taxadb(ncbi=None,
+                                dbname=dbname,
+                                snapshot=True)
+    assert isinstance(snapshot, qlin.TaxonomySnapshot)
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname)
+    assert snapshot['taxid'].sci_name(7955) == ncbi['taxid'].sci_name(7955)
+    assert snapshot['names'].taxid('Danio rerio') == 7955
+    assert snapshot['taxid'].lineage_id(7955, reverse=True) == ncbi['taxid'].lineage_id(7955, reverse=True)
+    info = qlin.get_qlin(qt='7955',
+                         ncbi=snapshot)
+    assert info[1] == 7955
+    assert info[2] == qlin.get_qlin(qt='7955',
+                                    ncbi=ncbi)[2]
+
+
+def test_get_lineages():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    taxids = [7955, 10090]
+    lineages = qlin.get_lineages(taxids=taxids,
+                                 dbname=dbname)
+    assert lineages == [qlin.ncbi_get_lineage(qt=x,
+                                              dbname=dbname) for x in taxids]
+    assert lineages == qlin.get_lineages(taxids=taxids,
+                                         ncbi=qlin.load_taxadb(ncbi=None,
+                                                               dbname=dbname,
+                                                               snapshot=True))
+
+
+def test_translate_taxids():
+    translations = qlin.translate_taxids(taxids=[7955, 10090],
+                                         dbname=os.path.expanduser('/tmp/taxadb.sqlite'))
+    assert translations == {7955: 'Danio rerio', 10090: 'Mus musculus'}
+
+
+def test_resolve_taxid():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    assert qlin.resolve_taxid(qt='7955',
+                              dbname=dbname) == 7955
+    assert qlin.ncbi_get_lineage(qt='7955',
+                                 dbname=dbname)[-1] == 7955
+
+
+def test_lca_index():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    lca_index = qlin.load_lca_index(dbname=dbname)
+    query_lineage = qlin.ncbi_get_lineage(qt='7955',
+                                          dbname=dbname)
+    target_lineage = qlin.ncbi_get_lineage(qt='10090',
+                                           dbname=dbname)
+    youngest_common = qlin.get_youngest_common(ql=query_lineage,
+                                               tl=target_lineage)
+    assert lca_index.lca(7955, 10090) == youngest_common
+    assert list(lca_index.lca_many(7955, [10090, 7955])) == [youngest_common, 7955]
+    assert qlin.load_lca_index(dbname=dbname).lca(7955, 10090) == youngest_common
+
+
+def test_get_oldest_common_many():
+    ql = [1, 131567, 2759, 33154]
+    assert qlin.get_ps_map(ql=ql) == {1: 0, 131567: 1, 2759: 2, 33154: 3}
+    assert list(qlin.get_oldest_common_many(ql=ql,
+                                            values=[33154, 2759, 33154, 131567],
+                                            offsets=[0, 2, 4])) == [2, 1]
+    assert list(qlin.get_oldest_common_many(ql=ql,
+                                            values=[2759, 1],
+                                            offsets=[0, 1, 1, 2])) == [2, -1, 0]
+    assert list(qlin.map_ps(values=[33154, 1], ps_map=qlin.get_ps_map(ql=ql))) == [3, 0]
+    # unknown taxIDs between, before and after the lineage taxIDs are not mapped to a neighbour
+    for values in [[2760], [0], [99999]]:
+        with pytest.raises(ValueError):
+            qlin.get_oldest_common_many(ql=ql,
+                                        values=values,
+                                        offsets=[0, 1])
+
+
+def test_query_lineage():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    query_lineage = qlin.get_query_lineage(qt='7955',
+                                           quiet=True,
+                                           dbname=dbname)
+    qlin_list = qlin.get_qlin(qt='7955',
+                              quiet=True,
+                              dbname=dbname)
+    assert query_lineage.qtid == 7955
+    assert list(query_lineage.taxids) == qlin_list[2]
+    assert query_lineage.ps_map[7955] == len(query_lineage) - 1
+    assert query_lineage.qlineagenames.equals(qlin_list[5])
+    assert [x.taxid for x in qlin.traverse_postorder(query_lineage.topo.root)] == qlin_list[6]
+    lineage_tree = qlin.get_lineage_topo(query_lineage=query_lineage)
+    assert lineage_tree.root.clades[1].name == '0/1/root'
+
+
+def test_lineage_cache(tmp_path):
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    cachename = str(tmp_path / 'lineage.sqlite')
+    lineage_cache = qlin.LineageCache(path=cachename,
+                                      stamp='1',
+                                      max_entries=2)
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname)
+    ncbi['cache'] = lineage_cache
+    lineages = qlin.get_lineages(taxids=[7955, 10090],
+                                 ncbi=ncbi)
+    assert lineages == qlin.get_lineages(taxids=[7955, 10090],
+                                         dbname=dbname)
+    assert len(lineage_cache) == 2
+    assert [x for x, y in lineage_cache.get_many([7955])[7955]] == lineages[0]
+    qlin.get_lineages(taxids=[9606],
+                      ncbi=ncbi)
+    assert sorted(lineage_cache.get_many([7955, 10090, 9606])) == [7955, 9606]
+    lineage_cache.close()
+    assert len(qlin.LineageCache(path=cachename,
+                                 stamp='2')) == 0
+
+
+def test_resolve_names():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    names = ['Danio rerio', 'mus_musculus', 'Homo  Sapiens', 'Ustilago maydis', 'unknown species']
+    aliases = {'Ustilago maydis': 'Caenorhabditis elegans'}
+    taxids = {'Danio rerio': 7955,
+              'mus_musculus': 10090,
+              'Homo  Sapiens': 9606,
+              'Ustilago maydis': 6239,
+              'unknown species': None}
+    assert qlin.resolve_names(names=names,
+                              dbname=dbname,
+                              aliases=aliases) == taxids
+    assert qlin.resolve_names(names=names,
+                              ncbi=qlin.TaxonomySnapshot(dbname=dbname),
+                              aliases=aliases) == taxids
+
+
+def test_get_qlin_batch(tmp_path):
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    batch_df = qlin.get_qlin_batch(queries=['Danio rerio', '9606', 'unknown species'],
+                                   lca='10090',
+                                   dbname=dbname)
+    assert list(batch_df['taxID'][:2]) == [7955, 9606]
+    assert batch_df['lineage'][0] == qlin.ncbi_get_lineage(qt='7955',
+                                                           dbname=dbname)
+    assert list(batch_df['LCA_name'][:2]) == ['Euteleostomi', 'Mammalia']
+    assert pd.isna(batch_df['PSnum'][2])
+    out = str(tmp_path / 'batch.tsv')
+    qlin.write_qlin_batch(batch_df,
+                          out=out)
+    assert pd.read_csv(out, sep='\t')['name'][1] == 'Homo sapiens'
+
+
+def test_clade_queries(tmp_path):
+    dbname = str(tmp_path / 'taxadb.sqlite')
+    shutil.copy(os.path.expanduser('/tmp/taxadb.sqlite'), dbname)
+    query_lineage = qlin.ncbi_get_lineage(qt='10090',
+                                          dbname=dbname)
+    members = qlin.get_clade_members(clade='7742',
+                                     dbname=dbname)
+    in_clade = qlin.filter_clade(taxids=[7955, 6239, 7742],
+                                 clade='7742',
+                                 dbname=dbname)
+    youngest_common = qlin.get_youngest_common_many(ql=query_lineage,
+                                                    taxids=[7955, 9606, 6239],
+                                                    dbname=dbname)
+    assert 7955 in members and 6239 not in members and 7742 not in members
+    assert in_clade == [True, False, True]
+    assert youngest_common == [117571, 40674, 33213]
+    ncbitax.add_closure_table(dbname=dbname)
+    assert qlin.get_clade_members(clade='7742',
+                                  dbname=dbname) == members
+    assert qlin.filter_clade(taxids=[7955, 6239, 7742],
+                             clade='7742',
+                             dbname=dbname) == in_clade
+    assert qlin.get_youngest_common_many(ql=query_lineage,
+                                         taxids=[7955, 9606, 6239],
+                                         dbname=dbname) == youngest_common
+
+
+def test_binary_taxonomy(tmp_path):
+    dbname = str(tmp_path / 'taxadb.sqlite')
+    shutil.copy(os.path.expanduser('/tmp/taxadb.sqlite'), dbname)
+    ncbitax.add_binary_taxonomy(dbname=dbname)
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname,
+                            snapshot=True)
+    assert isinstance(ncbi.parent, np.memmap)
+    assert ncbi.sci_name(7955) == 'Danio rerio'
+    assert qlin.get_lineages(taxids=[7955, 12345],
+                             ncbi=ncbi) == qlin.get_lineages(taxids=[7955, 12345],
+                                                             dbname=dbname)
+    assert ncbi.depth[7955] == len(qlin.ncbi_get_lineage(qt='7955', dbname=dbname)) - 1
+
+
+def test_taxonomy_handle():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    ncbi = qlin.load_taxadb(ncbi=None,
+                            dbname=dbname,
+                            threadsafe=True)
+    assert isinstance(ncbi, qlin.TaxonomyHandle)
+    # a merged taxID of the database resolves to its current taxID
+    con = sqlite3.connect(dbname)
+    old_taxid, new_taxid = con.execute('SELECT old_taxid, new_taxid FROM deprecatedtaxid LIMIT 1').fetchone()
+    con.close()
+    with ThreadPoolExecutor(4) as pool:
+        qtids = list(pool.map(lambda x: qlin.get_qlin(qt=x,
+                                                      quiet=True,
+                                                      ncbi=ncbi)[1], ['10090', '7955', str(old_taxid)]))
+    assert qtids == [10090, 7955, new_taxid]
+    ncbi_copy = pickle.loads(pickle.dumps(ncbi))
+    assert qlin.translate_taxids(taxids=[7955],
+                                 ncbi=ncbi_copy) == {7955: 'Danio rerio'}
+    with pytest.raises(sqlite3.OperationalError):
+        ncbi.database.execute_sql('DELETE FROM taxa')
+
+
+def test_diff_taxonomy(tmp_path):
+    old_dbname = str(tmp_path / 'taxadb.old.sqlite')
+    new_dbname = str(tmp_path / 'taxadb.sqlite')
+    shutil.copy(os.path.expanduser('/tmp/taxadb.sqlite'), old_dbname)
+    shutil.copy(os.path.expanduser('/tmp/taxadb.sqlite'), new_dbname)
+    con = sqlite3.connect(new_dbname)
+    con.execute('UPDATE taxa SET parent_taxid = 8287 WHERE ncbi_taxid = 7954')
+    con.execute("UPDATE taxa SET tax_name = 'Mammalia2' WHERE ncbi_taxid = 40674")
+    con.commit()
+    con.close()
+    changed = qlin.diff_taxonomy(old_dbname=old_dbname,
+                                 new_dbname=new_dbname)
+    changed = dict(zip(changed['taxID'], changed['change']))
+    assert changed[7954] == 'lineage'
+    assert changed[7955] == 'lineage'
+    assert changed[40674] == 'renamed'
+    assert changed[10090] == 'renamed'
+    assert 8287 not in changed
+
+
+def test_project_ranks():
+    dbname = os.path.expanduser('/tmp/taxadb.sqlite')
+    query_lineage = qlin.get_query_lineage(qt='7955',
+                                           quiet=True,
+                                           dbname=dbname)
+    projected = query_lineage.project(ranks='phylum,class,genus')
+    assert projected is query_lineage.project(ranks=['phylum', 'class', 'genus'])
+    assert projected.qlineage == [1, 7711, 7898, 7954, 7955]
+    assert list(projected.ranks) == ['no rank', 'phylum', 'class', 'genus', 'species']
+    # dropped nodes are merged into their nearest retained ancestor
+    assert projected.ps_map[117571] == 1
+    assert projected.ps_map[2759] == 0
+    assert projected.ps_map[7711] == 1
+    assert projected.ps_map[7955] == 4
+    lineages = qlin.get_lineages(taxids=[10090, 7956, 3702],
+                                 dbname=dbname)
+    assert query_lineage.youngest_common(lineages) == [117571, 7954, 2759]
+    assert projected.youngest_common(lineages) == [7711, 7954, 1]
+    assert qlin.get_qlin(qt='7955',
+                         quiet=True,
+                         dbname=dbname,
+                         ranks='class,genus')[2] == [1, 7898, 7954, 7955]
+    projected = query_lineage.project(ranks='class,genus')
+    assert projected.ps_map[7711] == 0
+    assert projected.ps_map[7898] == 1
+    assert projected.ps_map[117571] == 0
+    assert projected.youngest_common(lineages) == [1, 7954, 1]